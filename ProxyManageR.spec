@@ -1,38 +1,77 @@
 # -*- mode: python ; coding: utf-8 -*-
+# Build with `python tools/build.py` (one-dir) or `python tools/build.py onefile`,
+# which pin PYTHONHASHSEED and SOURCE_DATE_EPOCH for reproducible output.
+import os
 
+from PyInstaller.utils.hooks import collect_data_files
+
+# One-file executables unpack themselves to a temporary directory on every launch
+onefile = os.environ.get("PROXY_MANAGER_ONEFILE") == "1"
+
+# Only the customtkinter assets the app uses: the blue theme and the fonts
+# loaded on Linux (no other themes, no Windows icons, no copies of sources)
+datas = collect_data_files("customtkinter", includes=["assets/themes/blue.json", "assets/fonts/**/*.?tf"])
 
 a = Analysis(
     ['proxy.py'],
     pathex=[],
     binaries=[],
-    datas=[('/home/rixon.riverol/Imágenes/proxy_manager_env/lib/python3.13/site-packages/customtkinter', 'customtkinter')],
+    datas=datas,
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['unittest', 'doctest', 'lib2to3', 'pydoc_data', 'tkinter.test'],
     noarchive=False,
-    optimize=0,
+    optimize=2,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='ProxyManageR',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+if onefile:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='ProxyManageR',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='ProxyManageR',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='ProxyManageR',
+    )
@@ -0,0 +1,11 @@
+"""
+Benchmarks for Proxy Manager
+
+Each ``bench_*`` module can be run on its own, e.g.::
+
+    python -m benchmarks.bench_privileged --output results.json
+
+or all together, compared with an earlier run::
+
+    python -m benchmarks --output current.json --compare previous.json
+"""
@@ -0,0 +1,121 @@
+"""
+Run the benchmark suite and collect every result into one JSON document
+
+    python -m benchmarks --output release-1.4.json
+    python -m benchmarks startup status --compare release-1.3.json
+
+Each benchmark runs in its own interpreter, since several replace PATH and
+HOME. With --compare, timings (median and ``*_ms``/``*_s`` figures) are
+checked against a previous document and the run fails if any got slower
+by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+
+BENCHMARKS = ["startup", "status", "packaging", "bypass", "privileged", "prober", "tunnel", "fleet"]
+# Tail percentiles are too noisy between runs to gate on
+IGNORED_METRICS = ("p90_ms", "p95_ms", "max_ms", "mean_ms")
+# Differences below this are measurement noise whatever the ratio
+NOISE_FLOOR_MS = 0.5
+
+
+def run_benchmark(name, iterations=None):
+    """Run benchmarks.bench_<name> in a fresh interpreter; return its results or None"""
+    with tempfile.TemporaryDirectory() as workdir:
+        output = os.path.join(workdir, "result.json")
+        argv = [sys.executable, "-m", f"benchmarks.bench_{name}", "--output", output]
+        if iterations is not None:
+            argv += ["--iterations", str(iterations)]
+        start = time.perf_counter()
+        result = subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0 or not os.path.exists(output):
+            print(f"❌ {name} failed:\n{result.stderr.strip()}", file=sys.stderr)
+            return None
+        with open(output) as f:
+            document = json.load(f)
+    print(f"✓ {name} ({elapsed:.1f} s)", file=sys.stderr)
+    return document["results"]
+
+
+def timings(results, prefix=""):
+    """Flatten results into {dotted.path: milliseconds} for the metrics worth comparing"""
+    found = {}
+    for key, value in (results or {}).items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            found.update(timings(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key not in IGNORED_METRICS:
+            if key.endswith("_ms"):
+                found[path] = value
+            elif key.endswith("_s"):
+                found[path] = value * 1000
+    return found
+
+
+def compare(current, previous, threshold):
+    """List of (metric, previous ms, current ms) that got slower than threshold allows"""
+    regressions = []
+    for name, results in current["benchmarks"].items():
+        before = timings(previous.get("benchmarks", {}).get(name))
+        for metric, now in timings(results).items():
+            then = before.get(metric)
+            if then is None or then <= 0 or now - then < NOISE_FLOOR_MS:
+                continue
+            if now / then > threshold:
+                regressions.append((f"{name}.{metric}", then, now))
+    return regressions
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("names", nargs="*", metavar="NAME",
+                   help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    p.add_argument("--iterations", type=int, help="Override every benchmark's iteration count")
+    p.add_argument("--output", help="Write the combined results as JSON to this file")
+    p.add_argument("--compare", metavar="PREVIOUS", help="Results of an earlier run to check for regressions")
+    p.add_argument("--threshold", type=float, default=1.2,
+                   help="Slowdown ratio counted as a regression (default: 1.2)")
+    args = p.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        p.error(f"unknown benchmark: {', '.join(unknown)}")
+
+    document = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "benchmarks": {},
+    }
+    failed = False
+    for name in args.names or BENCHMARKS:
+        results = run_benchmark(name, args.iterations)
+        failed = failed or results is None
+        document["benchmarks"][name] = results
+
+    print(json.dumps(document, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(document, previous, args.threshold)
+        for metric, then, now in regressions:
+            print(f"❌ {metric}: {then:.2f} ms -> {now:.2f} ms ({now / then:.2f}x)", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"✓ No timing regressed by more than {args.threshold:.2f}x", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Shared helpers for the Proxy Manager benchmarks
+"""
+import argparse
+import json
+import os
+import platform
+import stat
+import statistics
+import sys
+import time
+
+
+def measure(fn, iterations, warmup=3):
+    """Call fn repeatedly and return latency statistics in milliseconds"""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    """Return mean/p50/p95/max for a list of millisecond samples"""
+    ordered = sorted(samples)
+    return {
+        "iterations": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 4),
+        "p50_ms": round(percentile(ordered, 50), 4),
+        "p95_ms": round(percentile(ordered, 95), 4),
+        "max_ms": round(ordered[-1], 4),
+    }
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def write_stub(directory, name, script):
+    """Write an executable shell stub into directory and return its path"""
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write("#!/bin/sh\n" + script)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def write_system_stubs(directory, proxy_mode="manual"):
+    """Instant gsettings/dconf/systemctl/sudo stand-ins in directory/bin, put first on PATH
+
+    gsettings reports proxy_mode, systemctl reports every unit active, and
+    sudo reads the password from stdin and runs the command unprivileged.
+    Returns the bin directory.
+    """
+    bin_dir = os.path.join(directory, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    write_stub(bin_dir, "gsettings", f'[ "$1" = "get" ] && echo "\'{proxy_mode}\'"\nexit 0\n')
+    write_stub(bin_dir, "dconf", "cat > /dev/null\nexit 0\n")
+    write_stub(bin_dir, "systemctl", '[ "$1" = "is-active" ] && shift && for unit; do echo active; done\nexit 0\n')
+    write_stub(bin_dir, "sudo", '[ "$1" = "-S" ] && shift\nread -r _password\nexec "$@"\n')
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+    return bin_dir
+
+
+def parser(description):
+    """Argument parser with the options every benchmark accepts"""
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("--iterations", type=int, default=200)
+    p.add_argument("--output", help="Write results as JSON to this file")
+    return p
+
+
+def report(name, results, output=None):
+    """Print results and optionally write them as JSON"""
+    document = {
+        "benchmark": name,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+    print(json.dumps(document, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(document, f, indent=2)
+    return document
@@ -0,0 +1,136 @@
+"""
+no_proxy matching: compiled BypassMatcher versus a linear scan
+
+Builds a synthetic bypass list (domains, wildcard domains, addresses and
+CIDR ranges), then times compilation and per-host lookups for a mix of
+hits and misses. The linear scan is the usual "for entry in no_proxy"
+loop with suffix and network checks, run on fewer hosts because it is slow.
+"""
+import ipaddress
+import random
+import sys
+import time
+
+from benchmarks._common import parser, report, summarize
+from proxy_manager.utils.bypass import BypassMatcher, normalize_host
+
+
+def build_entries(count, rng):
+    entries = []
+    for index in range(count):
+        kind = index % 10
+        if kind < 6:
+            entries.append(f"host{index}.dept{index % 97}.example{index % 13}.com")
+        elif kind < 8:
+            entries.append(f"*.zone{index}.internal")
+        elif kind == 8:
+            entries.append(str(ipaddress.IPv4Address(rng.getrandbits(32))))
+        else:
+            network = ipaddress.IPv4Network((rng.getrandbits(32), rng.choice((16, 20, 24, 28))), strict=False)
+            entries.append(str(network))
+    return entries
+
+
+def build_hosts(entries, count, rng):
+    hosts = []
+    for index in range(count):
+        entry = rng.choice(entries)
+        if index % 2:
+            hosts.append(f"miss{index}.nowhere{index % 31}.org")
+        elif entry.startswith("*."):
+            hosts.append("www" + entry[1:])
+        elif "/" in entry:
+            network = ipaddress.ip_network(entry)
+            hosts.append(str(network.network_address + rng.randrange(network.num_addresses)))
+        else:
+            hosts.append(entry)
+    return hosts
+
+
+def prepare_linear(entries):
+    """Pre-parse entries for the reference scan: networks or (exact, dotted suffix)"""
+    prepared = []
+    for entry in entries:
+        if entry[0].isdigit():
+            prepared.append(ipaddress.ip_network(entry, strict=False))
+        elif entry.startswith("*."):
+            prepared.append((None, entry[1:]))
+        else:
+            prepared.append((entry, "." + entry))
+    return prepared
+
+
+def linear_bypass(prepared, host):
+    """Reference implementation: check every entry in turn"""
+    host = normalize_host(host)
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        address = None
+    for entry in prepared:
+        if isinstance(entry, tuple):
+            exact, suffix = entry
+            if host == exact or host.endswith(suffix):
+                return True
+        elif address is not None and address in entry:
+            return True
+    return False
+
+
+def time_lookups(fn, hosts, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for host in hosts:
+            fn(host)
+        # Per-lookup latency in milliseconds, to reuse summarize()
+        samples.append((time.perf_counter() - start) * 1000 / len(hosts))
+    return samples
+
+
+def _microseconds(stats):
+    """Rename summarize() millisecond keys to microseconds"""
+    return {key.replace("_ms", "_us"): round(value * 1000, 3) if key.endswith("_ms") else value
+            for key, value in stats.items()}
+
+
+def main(argv=None):
+    p = parser(__doc__)
+    p.set_defaults(iterations=20)
+    p.add_argument("--entries", type=int, default=100_000)
+    p.add_argument("--hosts", type=int, default=10_000)
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    entries = build_entries(args.entries, rng)
+    hosts = build_hosts(entries, args.hosts, rng)
+    no_proxy = ",".join(entries)
+
+    start = time.perf_counter()
+    matcher = BypassMatcher.from_string(no_proxy)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    compiled = summarize(time_lookups(matcher.bypass, hosts, args.iterations))
+    prepared = prepare_linear(entries)
+    linear_hosts = hosts[:200]
+    linear = summarize(time_lookups(lambda host: linear_bypass(prepared, host), linear_hosts, 1))
+
+    # Both implementations must agree on what they are timed on
+    mismatches = sum(matcher.bypass(host) != linear_bypass(prepared, host) for host in linear_hosts)
+
+    report("bypass_matcher", {
+        "entries": args.entries,
+        "hosts": args.hosts,
+        "hit_ratio": round(sum(map(matcher.bypass, hosts)) / len(hosts), 3),
+        "compile_ms": round(compile_ms, 1),
+        "compiled_lookup": _microseconds(compiled),
+        "linear_lookup": _microseconds(linear),
+        "speedup": round(linear["mean_ms"] / compiled["mean_ms"]),
+        "mismatches": mismatches,
+    }, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Fleet rollout time against simulated hosts
+
+A FakeExecutor stands in for ssh: every host answers after --latency-ms,
+some hosts refuse the first connection, one never answers and one
+reports a wrong sudo password. The rollout is timed at several
+concurrency limits; with N hosts and limit C it should take about
+N / C times the latency, plus the per-attempt timeout for the hung host
+and the backoff for the retried ones.
+"""
+import sys
+import time
+
+from benchmarks._common import parser, report
+from proxy_manager.models.fleet import FakeExecutor, FleetRunner, summarize
+
+
+def fleet(hosts, latency):
+    executor = FakeExecutor().on("*", stdout="=== PROXY ACTIVATED SUCCESSFULLY ===\n", delay=latency)
+    # One host in ten refuses its first connection
+    for index in range(0, hosts, 10):
+        executor.on(f"host-{index}", stdout="=== PROXY ACTIVATED SUCCESSFULLY ===\n", delay=latency, unreachable=1)
+    executor.on("host-1", returncode=1, stderr="sudo: 1 incorrect password attempt\n", delay=latency)
+    executor.on("host-2", delay=3600)
+    return executor
+
+
+def main(argv=None):
+    p = parser(__doc__)
+    p.add_argument("--hosts", type=int, default=200, help="number of simulated hosts")
+    p.add_argument("--latency-ms", type=int, default=50, help="time each host takes to answer")
+    p.add_argument("--concurrency", default="1,10,50", help="comma separated concurrency limits")
+    p.add_argument("--timeout", type=float, default=1.0, help="per-attempt timeout in seconds")
+    args = p.parse_args(argv)
+
+    hosts = [f"host-{index}" for index in range(args.hosts)]
+    runs = {}
+    for limit in (int(value) for value in args.concurrency.split(",")):
+        runner = FleetRunner(fleet(args.hosts, args.latency_ms / 1000), concurrency=limit,
+                             timeout=args.timeout, retries=2, backoff=0.1)
+        start = time.perf_counter()
+        results = runner.run(hosts, ["enable"], ["bench"])
+        summary = summarize(results, time.perf_counter() - start)
+        del summary["failures"]
+        runs[f"concurrency_{limit}"] = summary
+
+    report("fleet", {
+        "hosts": args.hosts,
+        "latency_ms": args.latency_ms,
+        "timeout_s": args.timeout,
+        "runs": runs,
+    }, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Launch time of each packaging mode
+
+Runs ``--version`` (argument parsing only) and ``status`` (configuration,
+gsettings and systemctl, replaced by instant stubs) through every entry
+point that exists: the source tree, the proxy.py launcher, and whatever
+``tools/build.py`` left in dist/ (zipapp, one-dir, one-file). Modes that
+have not been built are reported as null, so build them first, e.g.::
+
+    python tools/build.py zipapp && python tools/build.py onedir
+    python -m benchmarks.bench_packaging --output packaging.json
+
+With --drop-caches (root only) the page cache is dropped before every
+run, which approximates a cold start from disk.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks._common import parser, report, summarize, write_system_stubs
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def entry_points(dist):
+    """{mode: argv prefix} for every mode present"""
+    modes = {
+        "source": [sys.executable, "-m", "proxy_manager"],
+        "launcher": [sys.executable, os.path.join(ROOT, "proxy.py")],
+        "zipapp": [sys.executable, os.path.join(dist, "proxy-manager.pyz")],
+        "onedir": [os.path.join(dist, "ProxyManageR", "ProxyManageR")],
+        "onefile": [os.path.join(dist, "ProxyManageR")],
+    }
+    return {mode: argv for mode, argv in modes.items() if mode == "source" or os.path.isfile(argv[-1])}
+
+
+def artifact_size(path):
+    """Bytes on disk of a file, or of a one-dir build's whole directory"""
+    if os.path.basename(os.path.dirname(path)) == os.path.basename(path):
+        path = os.path.dirname(path)
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(path) for name in names)
+
+
+def drop_caches():
+    subprocess.run(["sync"], check=True)
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def time_launch(argv, runs, env, cold):
+    samples = []
+    for _ in range(runs):
+        if cold:
+            drop_caches()
+        start = time.perf_counter()
+        result = subprocess.run(argv, env=env, cwd=ROOT, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL, check=False)
+        samples.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            return None
+    return summarize(samples)
+
+
+def main(argv=None):
+    p = parser(__doc__)
+    p.set_defaults(iterations=10)
+    p.add_argument("--dist", default=os.path.join(ROOT, "dist"), help="Directory holding the builds")
+    p.add_argument("--drop-caches", action="store_true", help="Drop the page cache before every run (root)")
+    args = p.parse_args(argv)
+
+    modes = entry_points(args.dist)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        write_system_stubs(workdir)
+        home = os.path.join(workdir, "home")
+        os.mkdir(home)
+        env = dict(os.environ, HOME=home, PYTHONPATH=ROOT)
+
+        for mode in ("source", "launcher", "zipapp", "onedir", "onefile"):
+            if mode not in modes:
+                results[mode] = None
+                continue
+            results[mode] = {
+                "size_bytes": artifact_size(modes[mode][-1]) if mode not in ("source", "launcher") else None,
+                "version": time_launch(modes[mode] + ["--version"], args.iterations, env, args.drop_caches),
+                "status": time_launch(modes[mode] + ["status"], args.iterations, env, args.drop_caches),
+            }
+
+    report("packaging", {"cold": args.drop_caches, "modes": results}, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
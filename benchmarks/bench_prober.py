@@ -0,0 +1,93 @@
+"""
+Proxy health check: parallel prober versus probing one proxy after another
+
+Starts several stub upstreams on localhost, each answering after its own
+delay (407 without credentials, 200 with them, and CONNECT with 200).
+A parallel check should take about as long as the slowest stub; the
+sequential check, like the old one-curl-per-proxy test, takes the sum.
+"""
+import asyncio
+import sys
+import time
+
+from benchmarks._common import parser, report
+from proxy_manager.models.prober import ProbeTarget, ProxyProber
+from proxy_manager.utils.http_wire import parse_head, read_head
+from proxy_manager.utils.proxy_url import basic_proxy_authorization
+
+
+AUTHORIZATION = basic_proxy_authorization("bench", "secret")
+
+
+async def start_stub(delay):
+    """Stub upstream answering every request head after delay seconds"""
+    async def handle(reader, writer):
+        try:
+            head = await read_head(reader)
+            if head is None:
+                return
+            start_line, headers = parse_head(head)
+            await asyncio.sleep(delay)
+            authorized = any(key.lower() == "proxy-authorization" and value == AUTHORIZATION
+                             for key, value in headers)
+            if not authorized:
+                writer.write(b"HTTP/1.1 407 Proxy Authentication Required\r\n"
+                             b"Proxy-Authenticate: Basic realm=\"stub\"\r\nContent-Length: 0\r\n\r\n")
+            elif start_line.startswith("CONNECT "):
+                writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            else:
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def run(delays, samples):
+    servers = [await start_stub(delay) for delay in delays]
+    try:
+        targets = [ProbeTarget("127.0.0.1", server.sockets[0].getsockname()[1], [f"stub{index}"], AUTHORIZATION)
+                   for index, server in enumerate(servers)]
+        prober = ProxyProber(targets, samples=samples)
+
+        start = time.perf_counter()
+        parallel = await prober.probe_all()
+        parallel_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for target in targets:
+            await prober.probe(target)
+        sequential_s = time.perf_counter() - start
+        return parallel, parallel_s, sequential_s
+    finally:
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+
+
+def main(argv=None):
+    p = parser(__doc__)
+    p.set_defaults(iterations=3)
+    p.add_argument("--delays-ms", default="20,40,80,160", help="comma separated stub response delays")
+    args = p.parse_args(argv)
+
+    delays = [int(value) / 1000 for value in args.delays_ms.split(",")]
+    results, parallel_s, sequential_s = asyncio.run(run(delays, args.iterations))
+
+    report("proxy_prober", {
+        "proxies": len(delays),
+        "samples_per_proxy": args.iterations,
+        "parallel_s": round(parallel_s, 3),
+        "sequential_s": round(sequential_s, 3),
+        # Each sample waits for the delay twice: GET and CONNECT
+        "slowest_probe_floor_s": round(max(delays) * 2 * args.iterations, 3),
+        "all_ok": all(result["ok"] for result in results),
+        "per_proxy": {result["names"][0]: {key: result[key] for key in ("tcp_connect", "first_response", "tunnel_setup")}
+                      for result in results},
+    }, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Start-up cost: module import times, CLI cold start and configuration load
+
+Import times are measured in a fresh interpreter per run, minus the time
+of an interpreter that imports nothing, so they include every dependency a
+module pulls in; modules that fail to import (customtkinter missing) are
+reported as null. Cold start runs ``python -m proxy_manager`` with
+``gsettings``/``systemctl`` replaced by instant stubs and HOME pointing at
+a temporary directory. ConfigManager() is timed in-process, with and
+without existing files.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks._common import measure, parser, report, summarize, write_system_stubs
+
+
+MODULES = [
+    "proxy_manager.cli",
+    "proxy_manager.config.settings",
+    "proxy_manager.models.proxy_manager",
+    "proxy_manager.models.local_proxy",
+    "proxy_manager.models.pac",
+    "proxy_manager.ui.app",
+    "customtkinter",
+]
+
+
+def time_process(argv, runs, env):
+    """Wall-clock milliseconds of running argv to completion"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def importable(module, env):
+    """Whether module imports cleanly, e.g. customtkinter may be missing"""
+    result = subprocess.run([sys.executable, "-c", f"import {module}"], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+    return result.returncode == 0
+
+
+def main(argv=None):
+    p = parser(__doc__)
+    p.set_defaults(iterations=20)
+    args = p.parse_args(argv)
+
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as workdir:
+        write_system_stubs(workdir)
+        home = os.path.join(workdir, "home")
+        os.mkdir(home)
+        env = dict(os.environ, HOME=home, PYTHONPATH=package_root, PYTHONDONTWRITEBYTECODE="")
+
+        bare = time_process([sys.executable, "-c", "pass"], args.iterations, env)
+        imports = {}
+        for module in MODULES:
+            if not importable(module, env):
+                imports[module] = None
+                continue
+            timing = time_process([sys.executable, "-c", f"import {module}"], args.iterations, env)
+            imports[module] = {"p50_ms": round(timing["p50_ms"] - bare["p50_ms"], 2),
+                               "mean_ms": round(timing["mean_ms"] - bare["mean_ms"], 2)}
+
+        cold_start = {
+            "version": time_process([sys.executable, "-m", "proxy_manager", "--version"], args.iterations, env),
+            "status": time_process([sys.executable, "-m", "proxy_manager", "status"], args.iterations, env),
+        }
+
+        # In-process configuration load, first run (files created) and later runs
+        os.environ["HOME"] = home
+        from proxy_manager.config.settings import ConfigManager
+
+        def first_load():
+            for name in (".proxy_manager_config.json", ".proxy_manager_credentials.json"):
+                try:
+                    os.unlink(os.path.join(home, name))
+                except FileNotFoundError:
+                    pass
+            ConfigManager().flush()
+
+        config_first = measure(first_load, args.iterations)
+        config_load = measure(ConfigManager, args.iterations)
+        manager = ConfigManager()
+        config_refresh = measure(manager.refresh, args.iterations)
+        config_read = measure(lambda: manager.proxy_settings["http_proxy"], args.iterations)
+
+    report("startup", {
+        "interpreter_ms": bare,
+        "import_ms_over_interpreter": imports,
+        "cold_start": cold_start,
+        "config_first_load": config_first,
+        "config_load": config_load,
+        "config_refresh_unchanged": config_refresh,
+        "config_read": config_read,
+    }, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Status checks and proxy toggle latency against stub system tools
+
+``gsettings``, ``dconf``, ``systemctl`` and ``sudo`` are replaced by
+instant stubs, GIO is disabled so the command-line paths are measured,
+/etc/environment and the APT file are redirected to a temporary
+directory and the git, pip and npm files live in a temporary HOME, so this
+runs without root or a desktop session. What remains
+is the cost of Proxy Manager itself: processes spawned, files compared
+and written.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+from benchmarks._common import measure, parser, report, write_stub, write_system_stubs
+
+
+def main(argv=None):
+    p = parser(__doc__)
+    p.set_defaults(iterations=50)
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        write_system_stubs(workdir)
+        # The per-user tool files are written under HOME; docker and snap would touch the system
+        for tool in ("git", "pip3", "npm"):
+            write_stub(os.path.join(workdir, "bin"), tool, "exit 0\n")
+        home = os.path.join(workdir, "home")
+        os.mkdir(home)
+        os.environ["HOME"] = home
+
+        from proxy_manager.config.settings import ConfigManager
+        from proxy_manager.models.managed_files import LEGACY_ENVIRONMENT_LINE, ManagedBlockFile
+        from proxy_manager.models.proxy_manager import ProxyModel
+
+        config_manager = ConfigManager()
+        config_manager.proxy_settings["tool_consumers"] = ["git", "pip", "npm"]
+        model = ProxyModel(config_manager)
+        model.gsettings._gio_checked = True
+        model.gsettings._gio = None
+        model.environment_file = ManagedBlockFile(os.path.join(workdir, "environment"),
+                                                  legacy_line=LEGACY_ENVIRONMENT_LINE)
+        model.apt_file = ManagedBlockFile(os.path.join(workdir, "99proxy"), whole_file=True)
+        # Per-command sudo, as on a first run before the helper is started
+        model._helper_failed_password = "bench"
+
+        # Every check forks, as when the cached answers have expired
+        ttl, model.runner.cache_ttl = model.runner.cache_ttl, 0
+        proxy_status = measure(model.check_proxy_status, args.iterations)
+        services_status = measure(model.check_services_status, args.iterations)
+        both_status = measure(model.check_status, args.iterations)
+        # Repeated checks within one user action share the cached answers
+        model.runner.cache_ttl = ttl
+        both_status_cached = measure(model.check_status, args.iterations)
+
+        quiet = io.StringIO()
+
+        def toggle():
+            with contextlib.redirect_stdout(quiet):
+                model._perform_enable_proxy("bench")
+                model._perform_disable_proxy("bench")
+            quiet.seek(0)
+            quiet.truncate()
+
+        def enable_unchanged():
+            with contextlib.redirect_stdout(quiet):
+                model._perform_enable_proxy("bench")
+            quiet.seek(0)
+            quiet.truncate()
+
+        toggle_round_trip = measure(toggle, args.iterations)
+        # Files already hold the right content: only the desktop setting is applied
+        enable_idempotent = measure(enable_unchanged, args.iterations)
+        model.shutdown()
+
+    report("status", {
+        "check_proxy_status": proxy_status,
+        "check_services_status": services_status,
+        "check_status_concurrent": both_status,
+        "check_status_cached": both_status_cached,
+        "toggle_enable_disable": toggle_round_trip,
+        "enable_already_enabled": enable_idempotent,
+    }, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
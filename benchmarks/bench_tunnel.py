@@ -0,0 +1,150 @@
+"""
+CONNECT tunnel throughput: os.splice versus a reused userspace buffer
+
+A stub upstream answers CONNECT with 200 and then sinks (upload) or sources
+(download) the payload. The tunnel runs in its own process so its peak RSS
+can be reported; a flat RSS means bytes are not accumulating in Python.
+"""
+import asyncio
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import threading
+import time
+
+from benchmarks._common import parser, report
+from proxy_manager.models.tunnel import SPLICE_SUPPORTED, TunnelProxy
+
+
+CHUNK = 1024 * 1024
+
+
+def _maxrss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _read_head(sock):
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ConnectionError("closed before the end of the head")
+        data += chunk
+    return data
+
+
+class StubUpstream:
+    """Answers CONNECT with 200, then discards or sends payload bytes"""
+
+    def __init__(self, payload_bytes):
+        self.payload_bytes = payload_bytes
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            conn, _ = self.sock.accept()
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            request = _read_head(conn)
+            conn.sendall(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            if b"download" in request.split(b"\r\n", 1)[0]:
+                block = b"\0" * CHUNK
+                remaining = self.payload_bytes
+                while remaining > 0:
+                    sent = conn.send(block[:min(remaining, CHUNK)])
+                    remaining -= sent
+                conn.shutdown(socket.SHUT_WR)
+            buffer = bytearray(CHUNK)
+            while conn.recv_into(buffer):
+                pass
+
+
+def _run_tunnel(upstream_port, use_splice, channel):
+    sys.stdout = open(os.devnull, "w")
+
+    async def main():
+        tunnel = TunnelProxy("127.0.0.1", upstream_port, listen_port=0, use_splice=use_splice)
+        await tunnel.start()
+        channel.send((tunnel.listen_port, _maxrss_kb()))
+        await asyncio.get_running_loop().run_in_executor(None, channel.recv)
+        while tunnel.active:
+            await asyncio.sleep(0.01)
+        channel.send((_maxrss_kb(), tunnel.stats()))
+        await tunnel.close()
+
+    asyncio.run(main())
+
+
+def _transfer(port, direction, payload_bytes):
+    """Push or pull payload_bytes through the tunnel; return Gbit/s"""
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        sock.sendall(f"CONNECT {direction}:443 HTTP/1.1\r\nHost: {direction}:443\r\n\r\n".encode())
+        leftover = _read_head(sock).split(b"\r\n\r\n", 1)[1]
+        start = time.perf_counter()
+        if direction == "upload":
+            block = b"\0" * CHUNK
+            remaining = payload_bytes
+            while remaining > 0:
+                remaining -= sock.send(block[:min(remaining, CHUNK)])
+            sock.shutdown(socket.SHUT_WR)
+            sock.recv(1)
+        else:
+            received = len(leftover)
+            buffer = bytearray(CHUNK)
+            while True:
+                count = sock.recv_into(buffer)
+                if not count:
+                    break
+                received += count
+            if received != payload_bytes:
+                raise ConnectionError(f"received {received} of {payload_bytes} bytes")
+        elapsed = time.perf_counter() - start
+    return payload_bytes * 8 / elapsed / 1e9
+
+
+def run_mode(use_splice, payload_bytes, repeats):
+    upstream = StubUpstream(payload_bytes)
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_run_tunnel, args=(upstream.port, use_splice, child), daemon=True)
+    process.start()
+    port, rss_start = parent.recv()
+
+    upload = max(_transfer(port, "upload", payload_bytes) for _ in range(repeats))
+    download = max(_transfer(port, "download", payload_bytes) for _ in range(repeats))
+
+    parent.send("stop")
+    rss_end, stats = parent.recv()
+    process.join(timeout=5)
+    return {
+        "upload_gbit_s": round(upload, 2),
+        "download_gbit_s": round(download, 2),
+        "maxrss_kb_after_start": rss_start,
+        "maxrss_kb_after_transfers": rss_end,
+        "bytes_tunnelled": stats["bytes_up"] + stats["bytes_down"],
+    }
+
+
+def main(argv=None):
+    p = parser(__doc__)
+    p.set_defaults(iterations=3)
+    p.add_argument("--megabytes", type=int, default=1024, help="payload per transfer")
+    args = p.parse_args(argv)
+
+    payload_bytes = args.megabytes * 1024 * 1024
+    results = {"payload_mb": args.megabytes, "repeats": args.iterations}
+    if SPLICE_SUPPORTED:
+        results["splice"] = run_mode(True, payload_bytes, args.iterations)
+    results["buffered"] = run_mode(False, payload_bytes, args.iterations)
+
+    report("connect_tunnel", results, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,22 @@
 # -*- mode: python ; coding: utf-8 -*-
+# Same build as ProxyManageR.spec (one-dir, -OO, trimmed customtkinter
+# assets, no UPX), started from the package entry point.
+from PyInstaller.utils.hooks import collect_data_files
+
+datas = collect_data_files("customtkinter", includes=["assets/themes/blue.json", "assets/fonts/**/*.?tf"])
 
 a = Analysis(
     ['proxy_manager/__main__.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=datas,
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['unittest', 'doctest', 'lib2to3', 'pydoc_data', 'tkinter.test'],
     noarchive=False,
-    optimize=0,
+    optimize=2,
 )
 
 pyz = PYZ(a.pure)
@@ -19,20 +24,27 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='ProxyManager',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
     target_arch=None,
     codesign_identity=None,
     entitlements_file=None,
-)
\ No newline at end of file
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='ProxyManager',
+)
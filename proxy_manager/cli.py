@@ -0,0 +1,444 @@
+"""
+Command line interface for Proxy Manager
+
+    proxy-manager [--startup-profile] [gui]
+    proxy-manager [--timings] [--trace-log FILE] COMMAND ...
+    proxy-manager status [--json]
+    proxy-manager enable | disable
+    proxy-manager set-password USERNAME [--dry-run [--json]]
+    proxy-manager services stop | start | status
+    proxy-manager serve [--port PORT] [--tunnel-port PORT] [--pac-port PORT] [--only proxy|pac]
+    proxy-manager route [--pac] HOST...
+    proxy-manager probe [--samples N] [--json]
+    proxy-manager fleet INVENTORY enable | disable | set-password USERNAME [--concurrency N] ...
+
+Headless commands drive ConfigManager and ProxyModel directly; Tk and
+customtkinter are only imported by the ``gui`` command.
+"""
+import argparse
+import sys
+
+
+def _read_secret(args, prompt):
+    """Read the next secret from stdin (--password-stdin) or prompt for it"""
+    if args.password_stdin:
+        line = sys.stdin.readline()
+        return line.rstrip("\n") or None
+    if not sys.stdin.isatty():
+        print("Error: no terminal to prompt on; use --password-stdin", file=sys.stderr)
+        return None
+    import getpass
+    return getpass.getpass(prompt) or None
+
+
+def _load(args):
+    from proxy_manager.config.settings import ConfigManager
+    from proxy_manager.models.proxy_manager import ProxyModel
+
+    config_manager = ConfigManager()
+    return config_manager, ProxyModel(config_manager)
+
+
+def cmd_gui(args):
+    profile = None
+    if args.startup_profile:
+        from proxy_manager.ui.startup import StartupProfile
+        profile = StartupProfile()
+    config_manager, proxy_model = _load(args)
+    from proxy_manager.ui.app import run_gui
+    if profile is not None:
+        profile.mark("gui imported")
+    return run_gui(config_manager, proxy_model, profile)
+
+
+def cmd_status(args):
+    config_manager, proxy_model = _load(args)
+    proxy_active, services = proxy_model.runner.gather(
+        proxy_model.check_proxy_status, lambda: proxy_model.services.status(proxy_model.usb_services)
+    )
+
+    if args.json:
+        import json
+        print(json.dumps({
+            "proxy_active": proxy_active,
+            "proxy_mode": proxy_model.status_monitor.mode,
+            "services": services,
+        }))
+    else:
+        print(f"Proxy: {'active' if proxy_active else 'inactive'} (mode: {proxy_model.status_monitor.mode})")
+        for unit, state in services.items():
+            print(f"Service {unit}: {state}")
+    return 0
+
+
+def cmd_enable(args):
+    config_manager, proxy_model = _load(args)
+    password = _read_secret(args, "Admin password: ")
+    if not password:
+        return 1
+    try:
+        credentials = config_manager.credentials
+        proxy_model.update_proxy_settings_with_credentials(
+            credentials.get("username", ""), credentials.get("password", "")
+        )
+        return 0 if proxy_model._perform_enable_proxy(password) else 1
+    finally:
+        proxy_model.shutdown()
+
+
+def cmd_disable(args):
+    config_manager, proxy_model = _load(args)
+    password = _read_secret(args, "Admin password: ")
+    if not password:
+        return 1
+    try:
+        return 0 if proxy_model._perform_disable_proxy(password) else 1
+    finally:
+        proxy_model.shutdown()
+
+
+def cmd_set_password(args):
+    config_manager, proxy_model = _load(args)
+    # A dry run writes nothing, so it needs no admin password
+    password = None if args.dry_run else _read_secret(args, "Admin password: ")
+    if not password and not args.dry_run:
+        return 1
+    proxy_password = _read_secret(args, f"New proxy password for {args.username}: ")
+    if not proxy_password:
+        print("Error: empty proxy password", file=sys.stderr)
+        return 1
+
+    try:
+        enabled = proxy_model.check_proxy_status()
+        if args.dry_run:
+            settings = proxy_model.settings_with_credentials(args.username, proxy_password)
+            entries = proxy_model.plan_consumers(enabled, settings)
+            if args.json:
+                import json
+                print(json.dumps(entries, indent=2))
+            else:
+                for entry in entries:
+                    if entry["changed"]:
+                        print(f"would update {entry['target']} ({entry['current'] or 'unknown'} -> {entry['desired']})")
+                    else:
+                        print(f"up to date   {entry['target']}")
+            return 0
+
+        proxy_model.update_proxy_settings_with_credentials(args.username, proxy_password)
+        entries = proxy_model.sync_consumers(password, enabled=enabled)
+        for entry in entries:
+            if not entry["success"]:
+                print(f"Error: {entry['target']}: {entry['error']}", file=sys.stderr)
+        return 0 if all(entry["success"] for entry in entries) else 1
+    finally:
+        proxy_model.shutdown()
+
+
+def cmd_services(args):
+    config_manager, proxy_model = _load(args)
+    if args.action == "status":
+        services = proxy_model.services.status(proxy_model.usb_services)
+        for unit, state in services.items():
+            print(f"Service {unit}: {state}")
+        return 0 if all(state == "active" for state in services.values()) else 3
+
+    password = _read_secret(args, "Admin password: ")
+    if not password:
+        return 1
+    try:
+        if args.action == "stop":
+            return 0 if proxy_model.stop_usb_services(password) else 1
+        return 0 if proxy_model.start_usb_services(password) else 1
+    finally:
+        proxy_model.shutdown()
+
+
+def cmd_serve(args):
+    import asyncio
+    import os
+    import signal
+    from proxy_manager.config.settings import ConfigManager
+    from proxy_manager.utils.bypass import BypassMatcher
+    from proxy_manager.utils.proxy_url import split_host_port
+
+    config_manager = ConfigManager()
+    settings = config_manager.proxy_settings
+    servers = []
+    proxy = tunnel = None
+
+    if args.only in (None, "proxy"):
+        from proxy_manager.models.local_proxy import LocalForwardingProxy
+        from proxy_manager.models.tunnel import TunnelProxy
+
+        upstream_host, upstream_port = split_host_port(settings["http_proxy"])
+        username = config_manager.credentials.get("username")
+        password = config_manager.credentials.get("password")
+        bypass = BypassMatcher.from_string(settings["no_proxy"])
+        proxy = LocalForwardingProxy(
+            upstream_host, upstream_port,
+            listen_port=args.port or int(settings["local_proxy_port"]),
+            pool_size=int(settings["local_proxy_pool_size"]),
+            username=username, password=password, bypass=bypass,
+        )
+        tunnel = TunnelProxy(
+            upstream_host, upstream_port,
+            listen_port=args.tunnel_port or int(settings["local_tunnel_port"]),
+            username=username, password=password, bypass=bypass,
+        )
+        servers += [proxy, tunnel]
+
+    failover = None
+    if proxy is not None and settings.get("failover_enabled"):
+        from proxy_manager.models.failover import DEFAULT_FAILOVER_INTERVAL, FailoverMonitor
+
+        def load_settings():
+            config_manager.refresh()
+            return config_manager.proxy_settings, config_manager.credentials
+
+        def switch_upstream(target):
+            for server in (proxy, tunnel):
+                server.set_upstream(target.host, target.port)
+
+        failover = FailoverMonitor(
+            load_settings, switch_upstream,
+            interval=int(settings.get("failover_interval", DEFAULT_FAILOVER_INTERVAL)),
+        )
+
+    if args.only == "pac" or (args.only is None and settings.get("pac_enabled")):
+        from proxy_manager.models.pac import PacServer, default_pac_file
+        servers.append(PacServer(default_pac_file(), listen_port=args.pac_port or int(settings["pac_port"])))
+
+    def apply_config(section, data):
+        credentials = config_manager.credentials
+        bypass = BypassMatcher.from_string(config_manager.proxy_settings["no_proxy"])
+        for server in (proxy, tunnel):
+            server.set_credentials(credentials.get("username"), credentials.get("password"))
+            server.bypass = bypass
+        print(f"Configuration reloaded: credentials {'injected' if proxy.proxy_authorization else 'pass-through'}, "
+              f"{len(bypass)} no_proxy entries")
+
+    def reload_config():
+        if not config_manager.refresh():
+            print("Configuration unchanged")
+
+    if proxy is not None:
+        config_manager.add_listener(apply_config)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        if proxy is not None:
+            loop.add_signal_handler(signal.SIGHUP, reload_config)
+        try:
+            # Bind every listener before serving, so a busy port fails the whole command
+            for server in servers:
+                await server.start()
+            tasks = [server.serve_forever() for server in servers]
+            if failover is not None:
+                tasks.append(failover.run())
+            await asyncio.gather(*tasks)
+        finally:
+            for server in servers:
+                await server.close()
+
+    # Only the process running the proxy receives credential reloads
+    pid_path = None
+    if proxy is not None:
+        from proxy_manager.models.local_proxy import pid_file
+        pid_path = pid_file()
+        pid_path.write_text(f"{os.getpid()}\n")
+    try:
+        asyncio.run(run())
+    except OSError as e:
+        print(f"Error: cannot start local services: {e}", file=sys.stderr)
+        return 1
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        if pid_path is not None:
+            pid_path.unlink(missing_ok=True)
+    for server in servers:
+        print(f"{type(server).__name__} stopped: {server.stats()}")
+    return 0
+
+
+def cmd_route(args):
+    from proxy_manager.config.settings import ConfigManager
+    from proxy_manager.models.proxy_manager import ProxyModel
+
+    proxy_model = ProxyModel(ConfigManager())
+    if args.pac:
+        from proxy_manager.models.pac import PacEvaluator
+        evaluator = PacEvaluator(proxy_model.build_pac())
+        for host in args.hosts:
+            print(f"{host}: {evaluator.find_proxy(f'http://{host}/')}")
+        return 0
+    for host in args.hosts:
+        route = proxy_model.route_for(host)
+        print(f"{host}: direct" if route is None else f"{host}: proxy {route[0]}:{route[1]}")
+    return 0
+
+
+def cmd_probe(args):
+    config_manager, proxy_model = _load(args)
+    results = proxy_model.probe_proxies(samples=args.samples)
+    if args.json:
+        import json
+        print(json.dumps(results, indent=2))
+    else:
+        from proxy_manager.models.prober import format_result
+        for result in results:
+            print(("OK   " if result["ok"] else "FAIL ") + format_result(result))
+    return 0 if results and all(result["ok"] for result in results) else 3
+
+
+def cmd_fleet(args):
+    import time
+    from proxy_manager.models import fleet
+
+    if args.action == "set-password" and not args.username:
+        print("Error: set-password needs a USERNAME", file=sys.stderr)
+        return 2
+    try:
+        hosts = fleet.load_inventory(args.inventory)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if not hosts:
+        print(f"Error: no hosts in {args.inventory}", file=sys.stderr)
+        return 1
+
+    # The same secrets go to every host, on the remote command's stdin
+    secrets = [_read_secret(args, "Admin password (remote hosts): ")]
+    if args.action == "set-password":
+        secrets.append(_read_secret(args, f"New proxy password for {args.username}: "))
+    if not all(secrets):
+        return 1
+
+    if args.local:
+        executor = fleet.LocalExecutor(args.local)
+    else:
+        executor = fleet.SSHExecutor(args.remote_command or fleet.DEFAULT_REMOTE_COMMAND, args.ssh_option)
+
+    def progress(result):
+        mark = "✓" if result["ok"] else "❌"
+        detail = result["output"] if result["ok"] else result["error"]
+        print(f"{mark} {result['host']}: {detail} ({result['duration_ms']:.0f} ms, "
+              f"{result['attempts']} attempt{'s' if result['attempts'] > 1 else ''})", file=sys.stderr)
+
+    options = {name: getattr(args, name) for name in ("concurrency", "timeout", "retries")
+               if getattr(args, name) is not None}
+    runner = fleet.FleetRunner(executor, on_result=None if args.json else progress, **options)
+    command = [args.action] + ([args.username] if args.action == "set-password" else [])
+    start = time.perf_counter()
+    results = runner.run(hosts, command, secrets)
+    summary = fleet.summarize(results, time.perf_counter() - start)
+
+    if args.json:
+        import json
+        print(json.dumps({"summary": summary, "hosts": results}, indent=2))
+    else:
+        print(fleet.format_summary(summary))
+    return 0 if summary["failed"] == 0 else 1
+
+
+def build_parser():
+    from proxy_manager import __version__
+
+    parser = argparse.ArgumentParser(
+        prog="proxy-manager",
+        description="Manage system proxy settings and USB services on Ubuntu",
+    )
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print GUI start-up timings (first paint, status shown) to stderr")
+    parser.add_argument("--timings", action="store_true",
+                        help="print how long each step, subprocess and privileged request took to stderr")
+    parser.add_argument("--trace-log", metavar="FILE",
+                        help="append the timing of every operation to FILE as JSON lines")
+    parser.add_argument("--password-stdin", action="store_true",
+                        help="read the admin password (then any other secret) from stdin, one per line")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("gui", help="open the graphical interface (default)").set_defaults(func=cmd_gui)
+
+    status = subparsers.add_parser("status", help="show proxy and services status")
+    status.add_argument("--json", action="store_true", help="machine readable output")
+    status.set_defaults(func=cmd_status)
+
+    subparsers.add_parser("enable", help="enable the system proxy").set_defaults(func=cmd_enable)
+    subparsers.add_parser("disable", help="disable the system proxy").set_defaults(func=cmd_disable)
+
+    set_password = subparsers.add_parser("set-password", help="update the proxy credentials everywhere")
+    set_password.add_argument("username")
+    set_password.add_argument("--dry-run", action="store_true",
+                              help="only report which consumers the new credentials would change")
+    set_password.add_argument("--json", action="store_true", help="machine readable --dry-run report")
+    set_password.set_defaults(func=cmd_set_password)
+
+    services = subparsers.add_parser("services", help="control the USB-blocking services")
+    services.add_argument("action", choices=["stop", "start", "status"])
+    services.set_defaults(func=cmd_services)
+
+    serve = subparsers.add_parser("serve", help="run the local proxy, tunnel and PAC endpoint in the foreground")
+    serve.add_argument("--port", type=int, help="listen port (default: local_proxy_port from the config)")
+    serve.add_argument("--tunnel-port", type=int,
+                       help="CONNECT tunnel listen port (default: local_tunnel_port from the config)")
+    serve.add_argument("--pac-port", type=int, help="PAC file port (default: pac_port from the config)")
+    serve.add_argument("--only", choices=["proxy", "pac"],
+                       help="run only the proxy and tunnel, or only the PAC endpoint")
+    serve.set_defaults(func=cmd_serve)
+
+    route = subparsers.add_parser("route", help="show whether hosts go direct or through the proxy (no_proxy)")
+    route.add_argument("--pac", action="store_true",
+                       help="evaluate the generated PAC file instead of the compiled no_proxy rules")
+    route.add_argument("hosts", nargs="+", metavar="HOST")
+    route.set_defaults(func=cmd_route)
+
+    probe = subparsers.add_parser("probe", help="check every configured upstream proxy in parallel")
+    probe.add_argument("--samples", type=int, help="samples per proxy (default: 3)")
+    probe.add_argument("--json", action="store_true", help="machine readable output")
+    probe.set_defaults(func=cmd_probe)
+
+    fleet = subparsers.add_parser("fleet", help="run enable, disable or set-password on many hosts over SSH")
+    fleet.add_argument("inventory", help="file with one [user@]host per line")
+    fleet.add_argument("action", choices=["enable", "disable", "set-password"])
+    fleet.add_argument("username", nargs="?", help="proxy user name (set-password)")
+    fleet.add_argument("--concurrency", type=int, help="hosts in progress at once (default: 20)")
+    fleet.add_argument("--timeout", type=float, help="seconds allowed per attempt on one host (default: 60)")
+    fleet.add_argument("--retries", type=int, help="extra attempts for hosts that could not be reached (default: 2)")
+    fleet.add_argument("--ssh-option", action="append", default=[], metavar="OPTION",
+                       help="extra ssh -o option, e.g. User=admin (repeatable)")
+    fleet.add_argument("--remote-command", help="Proxy Manager command on the hosts (default: proxy-manager)")
+    fleet.add_argument("--local", metavar="DIR",
+                       help="run on this machine instead, with HOME=DIR/<host> for each host (rehearsal)")
+    fleet.add_argument("--json", action="store_true", help="machine readable output")
+    fleet.set_defaults(func=cmd_fleet)
+
+    return parser
+
+
+def main(argv=None):
+    """Console entry point"""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["--privileged-helper"]:
+        # Not in --help: how frozen builds and the zipapp start the helper as root
+        from proxy_manager.models.privileged_helper import main as helper_main
+        helper_main(argv[1:])
+        return 0
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args.func = cmd_gui
+    if not (args.timings or args.trace_log):
+        return args.func(args)
+
+    from proxy_manager.utils.tracing import format_breakdown, tracer
+    tracer.log_path = args.trace_log
+    try:
+        return args.func(args)
+    finally:
+        if args.timings:
+            print("Timings:", file=sys.stderr)
+            for record in tracer.recent():
+                print("\n".join(format_breakdown(record, indent=1)), file=sys.stderr)
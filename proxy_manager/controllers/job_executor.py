@@ -0,0 +1,150 @@
+"""
+Background job executor for Proxy Manager
+
+Runs blocking work (subprocesses, privileged operations) on worker threads
+and marshals every callback back onto the Tk main loop through a queue, so
+the window keeps redrawing while jobs run.
+"""
+import queue
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+
+# Drain the UI queue once per frame at 60 fps
+UI_POLL_INTERVAL_MS = 16
+
+
+class JobCancelled(BaseException):
+    """Raised inside a job when it has been cancelled
+
+    Derives from BaseException, like asyncio.CancelledError, so the broad
+    ``except Exception`` blocks in the model do not swallow it.
+    """
+
+
+class Job:
+    """Handle for a submitted job"""
+
+    def __init__(self, executor, name, on_progress=None):
+        self.name = name
+        self.future = None
+        self._executor = executor
+        self._on_progress = on_progress
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Cancel the job: immediately if not started, at its next checkpoint otherwise"""
+        self._cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check_cancelled(self):
+        """Checkpoint for the worker: raise JobCancelled if cancel() was called"""
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.name)
+
+    def report_progress(self, *args):
+        """Called from the worker; also acts as a cancellation checkpoint"""
+        self.check_cancelled()
+        if self._on_progress is not None:
+            self._executor.call_soon(self._on_progress, *args)
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+
+class JobExecutor:
+    """Thread pool whose completion and progress callbacks run on the UI thread"""
+
+    def __init__(self, root, max_workers=2):
+        self.root = root
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="proxy-manager-job")
+        self._ui_queue = queue.Queue()
+        self._jobs = {}
+        self._closed = False
+        self._pump_id = self.root.after(UI_POLL_INTERVAL_MS, self._pump)
+
+    def call_soon(self, callback, *args):
+        """Schedule callback(*args) on the UI thread; safe to call from any thread"""
+        self._ui_queue.put((callback, args))
+
+    def is_running(self, name):
+        """True if a job with this name is queued or running"""
+        job = self._jobs.get(name)
+        return job is not None and not job.done()
+
+    def submit(self, fn, *args, name=None, on_success=None, on_error=None,
+               on_progress=None, on_finally=None):
+        """Run fn(job, *args) on a worker thread; callbacks run on the UI thread
+
+        Jobs are only cancelled by shutdown(), after which the UI queue is
+        no longer pumped, so a cancelled job reports nothing.
+        """
+        if self._closed:
+            raise RuntimeError("Executor is shut down")
+
+        job = Job(self, name or getattr(fn, "__name__", "job"), on_progress)
+
+        def run():
+            job.check_cancelled()
+            return fn(job, *args)
+
+        def on_done(future):
+            if self._jobs.get(job.name) is job:
+                del self._jobs[job.name]
+            try:
+                result = future.result()
+            except (CancelledError, JobCancelled):
+                return
+            except Exception as e:
+                print(f"Error in background job {job.name}: {e}")
+                self._dispatch(on_error, e)
+            else:
+                self._dispatch(on_success, result)
+            self._dispatch(on_finally)
+
+        self._jobs[job.name] = job
+        job.future = self._pool.submit(run)
+        job.future.add_done_callback(on_done)
+        return job
+
+    def _dispatch(self, callback, *args):
+        if callback is not None:
+            self.call_soon(callback, *args)
+
+    def cancel_all(self):
+        for job in list(self._jobs.values()):
+            job.cancel()
+
+    def shutdown(self, wait=False):
+        """Cancel outstanding jobs and stop pumping the UI queue"""
+        self._closed = True
+        self.cancel_all()
+        if self._pump_id is not None:
+            try:
+                self.root.after_cancel(self._pump_id)
+            except Exception:
+                pass
+            self._pump_id = None
+        self._pool.shutdown(wait=wait)
+
+    def _pump(self):
+        """Run queued UI callbacks, then reschedule for the next frame"""
+        while True:
+            try:
+                callback, args = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in UI callback: {e}")
+                import traceback
+                traceback.print_exc()
+
+        if not self._closed:
+            self._pump_id = self.root.after(UI_POLL_INTERVAL_MS, self._pump)
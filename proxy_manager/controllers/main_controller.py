@@ -1,29 +1,89 @@
 """
 Main controller for Proxy Manager
 """
-import customtkinter as ctk
-import time
-from pathlib import Path
-import tempfile
-import subprocess
+from proxy_manager.controllers.job_executor import JobExecutor
+from proxy_manager.utils.tracing import format_breakdown, tracer
 
 
 class MainController:
     """Main application controller"""
     
-    def __init__(self, config_manager, proxy_model, view):
+    def __init__(self, config_manager, proxy_model, view=None):
         self.config = config_manager
         self.model = proxy_model
-        self.view = view
+        self.view = None
+        self.executor = None
         
         # Admin password cache
         self.admin_password_cache = None
+        
+        if view is not None:
+            self.attach_view(view)
+    
+    def attach_view(self, view):
+        """Bind the controller to a window once its Tk root exists"""
+        self.view = view
+        # Blocking work runs here so the Tk loop keeps drawing
+        self.executor = JobExecutor(view.root)
+        self.config.add_listener(self._on_config_changed)
+    
+    def _on_config_changed(self, section, data):
+        """Configuration listener; may run on a worker thread"""
+        if section == "credentials":
+            self.executor.call_soon(
+                self.view.update_credentials_display, data.get("username", ""), data.get("password", "")
+            )
+    
+    def refresh_config(self):
+        """Re-read configuration files only if another process changed them"""
+        self.config.refresh()
     
     def check_proxy_status(self):
         """Check current proxy status and update UI"""
         is_active = self.model.check_proxy_status()
         self.view.update_proxy_status_display(is_active)
     
+    def load_initial_status(self, on_ready=None):
+        """Run the startup status checks concurrently on worker threads
+        
+        Each label is filled in as soon as its check finishes; on_ready() runs
+        on the UI thread once both are shown.
+        """
+        pending = {"proxy", "services"}
+        
+        def finished(name):
+            pending.discard(name)
+            if not pending and on_ready is not None:
+                on_ready()
+        
+        def proxy_work(job):
+            # The monitor reads the mode once, then follows changes without forking gsettings
+            self.model.start_status_monitor(self._on_proxy_status_change)
+            return self.model.check_proxy_status()
+        
+        self.executor.submit(proxy_work, name="startup-proxy-status",
+                             on_success=self.view.update_proxy_status_display, on_error=self._on_job_error,
+                             on_finally=lambda: finished("proxy"))
+        self.executor.submit(lambda job: self.model.check_services_status(), name="startup-services-status",
+                             on_success=self.view.update_services_status_display, on_error=self._on_job_error,
+                             on_finally=lambda: finished("services"))
+        self.start_failover()
+    
+    def _on_proxy_status_change(self, is_active):
+        # Called from the monitor thread: hand the update over to the Tk loop
+        self.executor.call_soon(self.view.update_proxy_status_display, is_active)
+    
+    def start_status_monitor(self):
+        """Reflect proxy changes made outside the app (e.g. GNOME Settings) instantly"""
+        self.model.start_status_monitor(self._on_proxy_status_change)
+    
+    def start_failover(self):
+        """Switch to the fastest healthy upstream automatically when failover is enabled"""
+        def on_switch(address):
+            self.executor.call_soon(self.view.show_success, f"🔀 Proxy cambiado a {address}")
+        
+        self.model.start_failover(on_switch)
+    
     def check_services_status(self):
         """Check current services status and update UI"""
         is_active = self.model.check_services_status()
@@ -38,112 +98,76 @@ class MainController:
         return self.config.credentials.get("password", "")
     
     def save_credentials(self, username, password):
-        """Save credentials to config"""
-        self.config.credentials["username"] = username
-        self.config.credentials["password"] = password
-        self.config.save_credentials()
+        """Save credentials to config once no other job is changing the settings"""
+        self.executor.submit(lambda job: self.model.save_credentials(username, password), name="save-credentials",
+                             on_success=lambda _: self.view.show_success("✅ Credenciales guardadas correctamente"),
+                             on_error=self._on_job_error)
+    
+    def _on_job_error(self, error):
+        """Report an unexpected exception raised by a background job"""
+        self.view.show_error(f"❌ Error crítico: {str(error)}")
+    
+    def _refresh_status_async(self):
+        """Re-read proxy and services status off the UI thread and update the labels"""
+        def work(job):
+            return self.model.check_status()
+        
+        def done(result):
+            proxy_active, services_active = result
+            self.view.update_proxy_status_display(proxy_active)
+            self.view.update_services_status_display(services_active)
+        
+        self.executor.submit(work, name="status", on_success=done)
     
     def update_all_proxies_password(self, username, password):
         """Update password in all system proxies without restart"""
-        try:
-            self.view.usb_status_label.configure(text="Estado: ⏳ Actualizando contraseñas...", text_color="#f39c12")
-            self.view.root.update_idletasks()
-            time.sleep(0.1)
-            
-            # Use cached password or ask for it
-            password = self.admin_password_cache
-            if not password:
-                password = self.ask_sudo_password()
-                if password:
-                    self.admin_password_cache = password  # Cache it
-            
-            if not password:
-                self.view.show_error("❌ Operación cancelada por el usuario")
-                return
-            
-            if not username or not password:
-                self.view.show_error("❌ Usuario y contraseña no pueden estar vacíos")
-                return
-            
+        if self.executor.is_running("credentials"):
+            return
+        
+        if not username or not password:
+            self.view.show_error("❌ Usuario y contraseña no pueden estar vacíos")
+            return
+        
+        self.view.usb_status_label.configure(text="Estado: ⏳ Actualizando contraseñas...", text_color="#f39c12")
+        
+        admin_password = self.ask_sudo_password()
+        if not admin_password:
+            self.view.show_error("❌ Operación cancelada por el usuario")
+            self._refresh_status_async()
+            return
+        
+        def work(job):
+            with tracer.operation("update_credentials"):
+                return update(job)
+        
+        def update(job):
             # Update proxy settings with new credentials
             self.model.update_proxy_settings_with_credentials(username, password)
-            
-            # Update /etc/environment
-            env_content = f"""
-# Proxy Settings - Actualizado por Proxy Manager
-\thttp_proxy="{self.config.proxy_settings['http_proxy']}"
-\thttps_proxy="{self.config.proxy_settings['https_proxy']}"
-\tftp_proxy="{self.config.proxy_settings['ftp_proxy']}"
-\tno_proxy="{self.config.proxy_settings['no_proxy']}"
-\tHTTP_PROXY="{self.config.proxy_settings['http_proxy']}"
-\tHTTPS_PROXY="{self.config.proxy_settings['https_proxy']}"
-\tFTP_PROXY="{self.config.proxy_settings['ftp_proxy']}"
-\tNO_PROXY="{self.config.proxy_settings['no_proxy']}"
-"""
-            # Write to temporary file and move with sudo (avoids redirection issues)
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.env') as tmp_env_file:
-                tmp_env_file.write(env_content)
-                tmp_env_path = tmp_env_file.name
-
-            success_env, stdout_env, stderr_env = self.model.run_command_with_sudo(
-                f"mv {tmp_env_path} /etc/environment && chmod 644 /etc/environment",
-                password
-            )
-            
-            # Update proxy for apt
-            apt_config = f"""
-# Proxy Settings - Actualizado por Proxy Manager
-Acquire::http::proxy "{self.config.proxy_settings['apt_proxy']}/";
-Acquire::https::proxy "{self.config.proxy_settings['apt_proxy']}/";
-Acquire::ftp::proxy "{self.config.proxy_settings['apt_proxy']}/";
-"""
-            # Write to temporary file and move with sudo
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.apt') as tmp_apt_file:
-                tmp_apt_file.write(apt_config)
-                tmp_apt_path = tmp_apt_file.name
-
-            success_apt, stdout_apt, stderr_apt = self.model.run_command_with_sudo(
-                f"mv {tmp_apt_path} /etc/apt/apt.conf.d/99proxy && chmod 644 /etc/apt/apt.conf.d/99proxy",
-                password
-            )
-            
-            if success_env and success_apt:
-                # Show updated environment variables in current session
-                env_commands = [
-                    f'export http_proxy="{self.config.proxy_settings["http_proxy"]}"',
-                    f'export https_proxy="{self.config.proxy_settings["https_proxy"]}"',
-                    f'export ftp_proxy="{self.config.proxy_settings["ftp_proxy"]}"',
-                    f'export no_proxy="{self.config.proxy_settings["no_proxy"]}"',
-                    f'export HTTP_PROXY="{self.config.proxy_settings["http_proxy"]}"',
-                    f'export HTTPS_PROXY="{self.config.proxy_settings["https_proxy"]}"',
-                    f'export FTP_PROXY="{self.config.proxy_settings["ftp_proxy"]}"',
-                    f'export NO_PROXY="{self.config.proxy_settings["no_proxy"]}"'
-                ]
-                
-                for cmd in env_commands:
-                    try:
-                        subprocess.run(cmd, shell=True, executable='/bin/bash', timeout=5)
-                    except Exception as e:
-                        print(f"Warning updating environment variable: {e}")
-                
-                self.view.show_success(f"✅ ¡Contraseñas actualizadas correctamente en {len(['http_proxy', 'https_proxy', 'ftp_proxy', 'apt_proxy'])} proxies!\nNo es necesario reiniciar el proxy")
-            else:
-                error_msg = "❌ Error al actualizar archivos de configuración"
-                if not success_env:
-                    error_msg += f"\n/etc/environment: {stderr_env}"
-                if not success_apt:
-                    error_msg += f"\nAPT config: {stderr_apt}"
+            job.check_cancelled()
+            
+            # Rewrite only the consumers the new credentials change, in parallel
+            enabled = self.model.check_proxy_status()
+            entries = self.model.sync_consumers(admin_password, enabled=enabled)
+            failed = [entry for entry in entries if not entry["success"]]
+            if not failed:
+                return None, entries
+            
+            error_msg = "❌ Error al actualizar archivos de configuración"
+            for entry in failed:
+                error_msg += f"\n{entry['target']}: {entry['error']}"
+            return error_msg, entries
+        
+        def done(result):
+            error_msg, entries = result
+            if error_msg:
                 self.view.show_error(error_msg)
-                
-        except Exception as e:
-            error_msg = f"❌ Error crítico: {str(e)}"
-            print(f"Critical error: {e}")
-            import traceback
-            traceback.print_exc()
-            self.view.show_error(error_msg)
-        finally:
-            # Restore original status after operation
-            self.check_services_status()
+            else:
+                updated = sum(1 for entry in entries if entry["changed"])
+                self.view.show_success(f"✅ ¡Contraseñas actualizadas correctamente!\n{updated} de {len(entries)} configuraciones necesitaban cambios\nNo es necesario reiniciar el proxy")
+        
+        # Restore original status after operation
+        self.executor.submit(work, name="credentials", on_success=done, on_error=self._on_job_error,
+                             on_finally=self._refresh_status_async)
     
     def toggle_proxy(self):
         """Toggle proxy between active/inactive"""
@@ -154,87 +178,68 @@ Acquire::ftp::proxy "{self.config.proxy_settings['apt_proxy']}/";
     
     def enable_proxy(self):
         """Enable proxy"""
-        try:
-            self.view.proxy_status_label.configure(text="Estado Proxy: ⏳ Activando...", text_color="#f39c12")
-            self.view.proxy_btn.configure(state="disabled")
-            self.view.root.update_idletasks()
-            time.sleep(0.1)
-            
-            password = self.admin_password_cache
-            if not password:
-                password = self.ask_sudo_password()
-                if password:
-                    self.admin_password_cache = password
-            
-            if not password:
-                self.view.show_error("❌ Operación cancelada por el usuario")
-                self.check_proxy_status()
-                return
-            
+        # Read widget values here: Tk must only be touched from the UI thread
+        username = self.view.user_entry.get()
+        proxy_password = self.view.pass_entry.get()
+        
+        def operation(job, password):
             # Update proxy settings with current credentials
-            self.model.update_proxy_settings_with_credentials(
-                self.view.user_entry.get(), 
-                self.view.pass_entry.get()
-            )
-            
-            success = self.model._perform_enable_proxy(password)
-            
-            if success:
-                self.model.proxy_active = True
-                self.check_proxy_status()
-                self.view.show_success("✅ ¡Proxy activado correctamente!")
-            else:
-                self.view.show_error("❌ Error al activar el proxy. Revisa la terminal para más detalles.")
-                self.check_proxy_status()
-                
-        except Exception as e:
-            error_msg = f"❌ Error crítico: {str(e)}"
-            print(f"Critical error: {e}")
-            import traceback
-            traceback.print_exc()
-            self.view.show_error(error_msg)
-            self.check_proxy_status()
-        finally:
-            self.view.proxy_btn.configure(state="normal")
+            self.model.update_proxy_settings_with_credentials(username, proxy_password)
+            return self.model._perform_enable_proxy(password, progress=job.report_progress)
+        
+        self._run_proxy_job(
+            "Activando",
+            operation,
+            "✅ ¡Proxy activado correctamente!",
+            "❌ Error al activar el proxy. Revisa la terminal para más detalles."
+        )
     
     def disable_proxy(self):
         """Disable proxy"""
-        try:
-            self.view.proxy_status_label.configure(text="Estado Proxy: ⏳ Desactivando...", text_color="#f39c12")
-            self.view.proxy_btn.configure(state="disabled")
-            self.view.root.update_idletasks()
-            time.sleep(0.1)
-            
-            password = self.admin_password_cache
-            if not password:
-                password = self.ask_sudo_password()
-                if password:
-                    self.admin_password_cache = password
-            
-            if not password:
-                self.view.show_error("❌ Operación cancelada por el usuario")
-                self.check_proxy_status()
-                return
-            
-            success = self.model._perform_disable_proxy(password)
-            
+        self._run_proxy_job(
+            "Desactivando",
+            lambda job, password: self.model._perform_disable_proxy(password, progress=job.report_progress),
+            "✅ ¡Proxy desactivado correctamente!",
+            "❌ Error al desactivar el proxy. Revisa la terminal para más detalles."
+        )
+    
+    def _run_proxy_job(self, verb, operation, success_msg, error_msg):
+        """Ask for the admin password, then run a proxy operation in the background"""
+        if self.executor.is_running("proxy"):
+            return
+        
+        self.view.proxy_status_label.configure(text=f"Estado Proxy: ⏳ {verb}...", text_color="#f39c12")
+        
+        password = self.ask_sudo_password()
+        if not password:
+            self.view.show_error("❌ Operación cancelada por el usuario")
+            self.check_proxy_status()
+            return
+        
+        def work(job):
+            success = operation(job, password)
+            return success, self.model.check_proxy_status()
+        
+        def progress(step, total, message):
+            self.view.proxy_status_label.configure(text=f"Estado Proxy: ⏳ {verb}... ({step}/{total})")
+        
+        def done(result):
+            success, is_active = result
+            self.view.update_proxy_status_display(is_active)
             if success:
-                self.model.proxy_active = False
-                self.check_proxy_status()
-                self.view.show_success("✅ ¡Proxy desactivado correctamente!")
+                self.view.show_success(success_msg)
             else:
-                self.view.show_error("❌ Error al desactivar el proxy. Revisa la terminal para más detalles.")
-                self.check_proxy_status()
-                
-        except Exception as e:
-            error_msg = f"❌ Error crítico: {str(e)}"
-            print(f"Critical error: {e}")
-            import traceback
-            traceback.print_exc()
-            self.view.show_error(error_msg)
-            self.check_proxy_status()
-        finally:
+                self.view.show_error(error_msg)
+        
+        # Disabled only once a job will be there to enable it again
+        self.view.proxy_btn.configure(state="disabled")
+        try:
+            self.executor.submit(work, name="proxy", on_success=done, on_error=self._on_job_error,
+                                 on_progress=progress,
+                                 on_finally=lambda: self.view.proxy_btn.configure(state="normal"))
+        except Exception:
             self.view.proxy_btn.configure(state="normal")
+            raise
     
     def toggle_usb_services(self):
         """Toggle USB services between active/inactive"""
@@ -245,79 +250,68 @@ Acquire::ftp::proxy "{self.config.proxy_settings['apt_proxy']}/";
     
     def stop_usb_services(self):
         """Stop USB services"""
-        try:
-            self.view.usb_status_label.configure(text="Estado Servicios: ⏳ Deteniendo...", text_color="#f39c12")
-            self.view.usb_btn.configure(state="disabled")
-            self.view.root.update_idletasks()
-            time.sleep(0.1)
-            
-            password = self.admin_password_cache
-            if not password:
-                password = self.ask_sudo_password()
-                if password:
-                    self.admin_password_cache = password
-            
-            if not password:
-                self.view.show_error("❌ Operación cancelada por el usuario")
-                self.check_services_status()
-                return
-            
-            success = self.model.stop_usb_services(password)
-            
-            if success:
-                self.check_services_status()
-                self.view.show_success("✅ ¡Servicios detenidos correctamente!\nAhora puedes conectar memorias USB")
-            else:
-                self.view.show_error("❌ Error al detener servicios. Revisa la terminal para detalles.")
-                self.check_services_status()
-                
-        except Exception as e:
-            error_msg = f"❌ Error crítico: {str(e)}"
-            print(f"Critical error: {e}")
-            import traceback
-            traceback.print_exc()
-            self.view.show_error(error_msg)
-        finally:
-            self.view.usb_btn.configure(state="normal")
-            self.check_services_status()
+        self._run_services_job(
+            "Deteniendo",
+            self.model.stop_usb_services,
+            "✅ ¡Servicios detenidos correctamente!\nAhora puedes conectar memorias USB",
+            "❌ Error al detener servicios. Revisa la terminal para detalles."
+        )
     
     def start_usb_services(self):
         """Start USB services"""
-        try:
-            self.view.usb_status_label.configure(text="Estado Servicios: ⏳ Activando...", text_color="#f39c12")
-            self.view.usb_btn.configure(state="disabled")
-            self.view.root.update_idletasks()
-            time.sleep(0.1)
-            
-            password = self.admin_password_cache
-            if not password:
-                password = self.ask_sudo_password()
-                if password:
-                    self.admin_password_cache = password
-            
-            if not password:
-                self.view.show_error("❌ Operación cancelada por el usuario")
-                self.check_services_status()
-                return
-            
-            success = self.model.start_usb_services(password)
-            
+        self._run_services_job(
+            "Activando",
+            self.model.start_usb_services,
+            "✅ ¡Servicios activados correctamente!\nProtección restaurada",
+            "❌ Error al activar servicios. Revisa la terminal para detalles."
+        )
+    
+    def _run_services_job(self, verb, operation, success_msg, error_msg):
+        """Ask for the admin password, then change USB services in the background"""
+        if self.executor.is_running("services"):
+            return
+        
+        self.view.usb_status_label.configure(text=f"Estado Servicios: ⏳ {verb}...", text_color="#f39c12")
+        
+        password = self.ask_sudo_password()
+        if not password:
+            self.view.show_error("❌ Operación cancelada por el usuario")
+            self._refresh_status_async()
+            return
+        
+        def work(job):
+            success = operation(password)
+            return success, self.model.services_active
+        
+        def done(result):
+            success, is_active = result
+            self.view.update_services_status_display(is_active)
             if success:
-                self.check_services_status()
-                self.view.show_success("✅ ¡Servicios activados correctamente!\nProtección restaurada")
+                self.view.show_success(success_msg)
             else:
-                self.view.show_error("❌ Error al activar servicios. Revisa la terminal para detalles.")
-                self.check_services_status()
-                
-        except Exception as e:
-            error_msg = f"❌ Error crítico: {str(e)}"
-            print(f"Critical error: {e}")
-            import traceback
-            traceback.print_exc()
-            self.view.show_error(error_msg)
-        finally:
+                self.view.show_error(error_msg)
+        
+        self.view.usb_btn.configure(state="disabled")
+        try:
+            self.executor.submit(work, name="services", on_success=done, on_error=self._on_job_error,
+                                 on_finally=lambda: self.view.usb_btn.configure(state="normal"))
+        except Exception:
             self.view.usb_btn.configure(state="normal")
-            self.check_services_status()
+            raise
+    
+    def shutdown(self):
+        """Cancel background work and release model resources"""
+        if self.executor is not None:
+            self.executor.shutdown()
+        self.model.shutdown()
+    
+    def show_last_timings(self):
+        """Show how long each step of the last proxy, services or password operation took"""
+        record = tracer.last_operation()
+        if record is None:
+            self.view.show_timings("Todavía no se ha realizado ninguna operación")
+            return
+        self.view.show_timings("\n".join(format_breakdown(record)))
     
     def ask_sudo_password(self):
         """Securely ask for admin password"""
@@ -326,61 +320,13 @@ Acquire::ftp::proxy "{self.config.proxy_settings['apt_proxy']}/";
             if self.admin_password_cache:
                 return self.admin_password_cache
             
-            dialog = ctk.CTkToplevel(self.view.root)
-            dialog.title("Contraseña de administrador")
-            dialog.geometry("500x300")
-            
-            # Center the dialog
-            screen_width = self.view.root.winfo_screenwidth()
-            screen_height = self.view.root.winfo_screenheight()
-            x = (screen_width - 350) // 2
-            y = (screen_height - 180) // 2
-            dialog.geometry(f"+{x}+{y}")
-            
-            dialog.update_idletasks()
-            time.sleep(0.1)
-            
-            dialog.transient(self.view.root)
-            dialog.grab_set()
-            dialog.focus_force()
-            
-            frame = ctk.CTkFrame(dialog)
-            frame.pack(padx=20, pady=20, fill="both", expand=True)
-            
-            ctk.CTkLabel(frame, text="Introduce tu contraseña de administrador:", 
-                        font=("Arial", 12)).pack(pady=10)
-            
-            password_entry = ctk.CTkEntry(frame, show="*", width=300)
-            password_entry.pack(pady=10)
-            password_entry.focus()
-            
-            result = [None]
-            
-            def confirm():
-                result[0] = password_entry.get()
-                dialog.destroy()
-            
-            def cancel():
-                result[0] = None
-                dialog.destroy()
-            
-            btn_frame = ctk.CTkFrame(frame)
-            btn_frame.pack(pady=10)
-            
-            ctk.CTkButton(btn_frame, text="Aceptar", command=confirm, 
-                         fg_color="#2ecc71", width=100).pack(side="left", padx=5)
-            ctk.CTkButton(btn_frame, text="Cancelar", command=cancel, 
-                         fg_color="#e74c3c", width=100).pack(side="left", padx=5)
-            
-            password_entry.bind('<Return>', lambda e: confirm())
-            
-            self.view.root.wait_window(dialog)
+            password = self.view.dialogs.password.ask()
             
             # Cache the password if a valid one is provided
-            if result[0]:
-                self.admin_password_cache = result[0]
+            if password:
+                self.admin_password_cache = password
             
-            return result[0]
+            return password
             
         except Exception as e:
             print(f"Error creating password dialog: {e}")
@@ -391,94 +337,38 @@ Acquire::ftp::proxy "{self.config.proxy_settings['apt_proxy']}/";
     def open_config_window(self):
         """Open configuration window"""
         try:
-            config_window = ctk.CTkToplevel(self.view.root)
-            config_window.title("Configuración de Proxy")
-            config_window.geometry("600x550")
-            
-            # Center the dialog
-            screen_width = self.view.root.winfo_screenwidth()
-            screen_height = self.view.root.winfo_screenheight()
-            x = (screen_width - 550) // 2
-            y = (screen_height - 500) // 2
-            config_window.geometry(f"+{x}+{y}")
-            
-            config_window.update_idletasks()
-            time.sleep(0.1)
-            
-            config_window.transient(self.view.root)
-            config_window.grab_set()
-            config_window.focus_force()
-            
-            main_frame = ctk.CTkFrame(config_window)
-            main_frame.pack(padx=20, pady=20, fill="both", expand=True)
-            
-            ctk.CTkLabel(main_frame, text="CONFIGURACIÓN DE PROXY", 
-                        font=("Arial", 18, "bold")).pack(pady=10)
-            
-            # Create entry fields
-            fields = [
-                ("HTTP Proxy:", "http_proxy"),
-                ("HTTPS Proxy:", "https_proxy"),
-                ("FTP Proxy:", "ftp_proxy"),
-                ("No Proxy:", "no_proxy"),
-                ("APT Proxy:", "apt_proxy")
-            ]
-            
-            entries = {}
-            
-            for label_text, key in fields:
-                frame = ctk.CTkFrame(main_frame)
-                frame.pack(fill="x", pady=5)
-                
-                ctk.CTkLabel(frame, text=label_text, width=100).pack(side="left", padx=5)
-                entry = ctk.CTkEntry(frame, width=400)
-                entry.insert(0, self.config.proxy_settings.get(key, ""))
-                entry.pack(side="left", padx=5)
-                entries[key] = entry
-            
-            def save_config():
-                for key, entry in entries.items():
-                    self.config.proxy_settings[key] = entry.get()
-                self.config.save_config(self.config.proxy_settings)
-                self.view.show_success("✅ Configuración guardada")
-                config_window.destroy()
-            
-            def test_connection():
-                proxy = entries["http_proxy"].get()
-                try:
-                    print(f"Testing connection with proxy: {proxy}")
-                    result = subprocess.run([
-                        'curl', '-x', proxy, 'http://www.google.com', '--max-time', '10', '-I'
-                    ], capture_output=True, text=True, timeout=15)
-                    
-                    print(f"curl result: {result.stdout}")
-                    print(f"Error: {result.stderr}")
-                    print(f"Return code: {result.returncode}")
-                    
-                    if result.returncode == 0 and "200 OK" in result.stdout:
-                        self.view.show_success("✅ Conexión exitosa")
-                    else:
-                        error_msg = "❌ Error en la conexión"
-                        if result.stderr:
-                            error_msg += f"\nDetalles: {result.stderr[:100]}"
-                        self.view.show_error(error_msg)
-                except Exception as e:
-                    self.view.show_error(f"❌ Error: {str(e)}")
-            
-            btn_frame = ctk.CTkFrame(main_frame)
-            btn_frame.pack(pady=20)
-            
-            ctk.CTkButton(btn_frame, text="💾 Guardar", command=save_config,
-                         fg_color="#2ecc71", width=120).pack(side="left", padx=10)
-            
-            ctk.CTkButton(btn_frame, text="🔍 Probar Conexion", command=test_connection,
-                         fg_color="#3498db", width=120).pack(side="left", padx=10)
-            
-            ctk.CTkButton(btn_frame, text="❌ Cancelar", command=config_window.destroy,
-                         fg_color="#e74c3c", width=120).pack(side="left", padx=10)
-            
+            dialog = self.view.dialogs.config(self._save_config_form, self._test_config_form)
+            dialog.open(self.config.proxy_settings)
         except Exception as e:
             print(f"Error opening config window: {e}")
             import traceback
             traceback.print_exc()
-            self.view.show_error(f"❌ Error al abrir configuración: {str(e)}")
\ No newline at end of file
+            self.view.show_error(f"❌ Error al abrir configuración: {str(e)}")
+    
+    def _save_config_form(self, values):
+        # Waits for a running proxy or password job instead of changing the settings under it
+        self.executor.submit(lambda job: self.model.save_proxy_settings(values), name="save-config",
+                             on_success=lambda _: self.view.show_success("✅ Configuración guardada"),
+                             on_error=self._on_job_error)
+    
+    def _test_config_form(self, values):
+        if self.executor.is_running("probe"):
+            return
+        # Probe what is typed in the window, saved or not
+        settings = dict(self.config.proxy_settings)
+        settings.update(values)
+        
+        def work(job):
+            return self.model.probe_proxies(settings)
+        
+        def done(results):
+            from proxy_manager.models.prober import format_result
+            for result in results:
+                print(f"Probe: {format_result(result)}")
+            lines = [("✅ " if result["ok"] else "❌ ") + format_result(result) for result in results]
+            if results and all(result["ok"] for result in results):
+                self.view.show_success("Conexión exitosa\n" + "\n".join(lines))
+            else:
+                self.view.show_error("Error en la conexión\n" + "\n".join(lines or ["No hay proxies configurados"]))
+        
+        self.executor.submit(work, name="probe", on_success=done, on_error=self._on_job_error)
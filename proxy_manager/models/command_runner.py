@@ -0,0 +1,240 @@
+"""
+Command runner for Proxy Manager
+
+Every external command the model runs goes through CommandRunner, which
+gives them the same timeout and error handling and a CommandResult
+instead of an exception:
+
+- ``run_many()`` runs independent commands concurrently on a small
+  thread pool, under one shared deadline;
+- read-only queries (``gsettings get``, ``systemctl is-active``) can be
+  cached for ``DEFAULT_CACHE_TTL`` seconds with ``cache=True``; identical
+  queries running at the same time share one process, and writers call
+  ``invalidate()`` so a status read after a change is always fresh;
+- the process backend is pluggable: FakeBackend answers from a table
+  instead of forking, for tests and benchmarks.
+
+Each command is timed as a span (see proxy_manager.utils.tracing).
+"""
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from proxy_manager.utils.tracing import tracer
+
+
+DEFAULT_TIMEOUT = 10
+# Long enough to cover one user action, short enough to see outside changes
+DEFAULT_CACHE_TTL = 2.0
+MAX_WORKERS = 4
+
+
+class CommandResult:
+    """Outcome of one command; error is set when it could not run or timed out"""
+
+    def __init__(self, returncode=None, stdout="", stderr="", error=None, cached=False):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.error = error
+        self.cached = cached
+
+    @property
+    def ok(self):
+        return self.error is None and self.returncode == 0
+
+    @property
+    def message(self):
+        """Why the command failed, for error reports"""
+        return self.error if self.error is not None else self.stderr
+
+    def as_cached(self):
+        return CommandResult(self.returncode, self.stdout, self.stderr, self.error, cached=True)
+
+    def __repr__(self):
+        return f"CommandResult(returncode={self.returncode}, error={self.error!r}, cached={self.cached})"
+
+
+class Deadline:
+    """A point in time shared by several commands"""
+
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+
+class SubprocessBackend:
+    """Runs commands with subprocess.run"""
+
+    def run(self, command, input=None, timeout=None, shell=False):
+        try:
+            result = subprocess.run(
+                command, input=input, capture_output=True, text=True, timeout=timeout,
+                shell=shell, executable="/bin/bash" if shell else None,
+            )
+        except subprocess.TimeoutExpired:
+            return CommandResult(error=f"timed out after {timeout:.1f} s")
+        except OSError as e:
+            return CommandResult(error=str(e))
+        return CommandResult(result.returncode, result.stdout, result.stderr)
+
+
+class FakeBackend:
+    """Answers commands from rules instead of running them
+
+        backend = FakeBackend()
+        backend.on(["gsettings", "get"], stdout="'manual'\\n")
+        backend.on(["systemctl", "is-active"], stdout="inactive\\n", returncode=3)
+        model = ProxyModel(config_manager, runner=CommandRunner(backend))
+
+    Rules match on a prefix of the arguments (of the words, for shell
+    commands); the latest matching rule wins. Unmatched commands fail like
+    a missing program. Every command is appended to ``calls``.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self._rules = []
+        self._lock = threading.Lock()
+
+    def on(self, prefix, returncode=0, stdout="", stderr="", error=None, delay=0.0):
+        """Answer commands starting with prefix; delay simulates a slow command"""
+        self._rules.append((list(prefix), CommandResult(returncode, stdout, stderr, error), delay))
+        return self
+
+    def run(self, command, input=None, timeout=None, shell=False):
+        argv = shlex.split(command) if isinstance(command, str) else list(command)
+        with self._lock:
+            self.calls.append(argv)
+        for prefix, result, delay in reversed(self._rules):
+            if argv[:len(prefix)] == prefix:
+                if timeout is not None and delay > timeout:
+                    time.sleep(timeout)
+                    return CommandResult(error=f"timed out after {timeout:.1f} s")
+                time.sleep(delay)
+                return CommandResult(result.returncode, result.stdout, result.stderr, result.error)
+        return CommandResult(127, "", f"{argv[0]}: command not found")
+
+
+def _label(command):
+    """Span name: the program and its first argument"""
+    words = shlex.split(command) if isinstance(command, str) else list(command)
+    return " ".join(words[:2])
+
+
+class CommandRunner:
+    """Runs external commands with timeouts, concurrency and a short-lived cache"""
+
+    def __init__(self, backend=None, cache_ttl=DEFAULT_CACHE_TTL, timeout=DEFAULT_TIMEOUT,
+                 max_workers=MAX_WORKERS):
+        self.backend = backend or SubprocessBackend()
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self._cache = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def run(self, command, timeout=None, input=None, cache=False, deadline=None, shell=False, label=None,
+            status_query=False):
+        """Run command (a list of arguments, or a string with shell=True); return a CommandResult
+
+        The timeout is cut short by deadline when one is given. With
+        cache=True an identical command that finished within cache_ttl is
+        not run again. status_query marks commands whose exit code is an
+        answer (``systemctl is-active``), so only failing to run counts as
+        an error in the span.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline.remaining())
+        with tracer.span(label or _label(command)) as span:
+            if timeout <= 0:
+                result = CommandResult(error="deadline exceeded")
+            elif cache:
+                result = self._run_cached(command, input, timeout, shell)
+            else:
+                result = self.backend.run(command, input=input, timeout=timeout, shell=shell)
+            if result.cached:
+                span.set(cached=True)
+            success = result.error is None if status_query else result.ok
+            span.finish(success, returncode=result.returncode, error=result.message)
+        return result
+
+    def _run_cached(self, command, input, timeout, shell):
+        key = (tuple(command) if not isinstance(command, str) else command, input)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1].as_cached()
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            # The same query is running on another thread: share its answer
+            return future.result().as_cached()
+
+        result = CommandResult(error="command runner failed")
+        try:
+            result = self.backend.run(command, input=input, timeout=timeout, shell=shell)
+        finally:
+            with self._lock:
+                if result.error is None:
+                    self._cache[key] = (time.monotonic() + self.cache_ttl, result)
+                del self._inflight[key]
+            future.set_result(result)
+        return result
+
+    def run_many(self, commands, timeout=None, **kwargs):
+        """Run independent commands concurrently within one shared timeout; results in order"""
+        deadline = Deadline(self.timeout if timeout is None else timeout)
+        return self.gather(*(lambda command=command: self.run(command, deadline=deadline, **kwargs)
+                             for command in commands))
+
+    def gather(self, *calls):
+        """Call each zero-argument function concurrently; return their results in order
+
+        Spans opened by the calls nest under the caller's current span.
+        """
+        if len(calls) <= 1:
+            return [fn() for fn in calls]
+        parent = tracer.current()
+
+        def call(fn):
+            with tracer.adopt(parent):
+                return fn()
+
+        futures = [self._executor().submit(call, fn) for fn in calls]
+        return [future.result() for future in futures]
+
+    def invalidate(self, prefix=None):
+        """Forget cached results of commands starting with prefix (all if None)"""
+        with self._lock:
+            if prefix is None:
+                self._cache.clear()
+                return
+            prefix = tuple(prefix)
+            for key in [key for key in self._cache if isinstance(key[0], tuple) and key[0][:len(prefix)] == prefix]:
+                del self._cache[key]
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="proxy-manager-cmd")
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
@@ -0,0 +1,241 @@
+"""
+Consumers of the proxy settings
+
+Everything that ends up holding the proxy address or credentials is a
+consumer: the GNOME proxy settings, /etc/environment and the APT
+configuration, plus any other consumer registered with the pipeline. For
+given settings each consumer renders the content it should hold, and
+fingerprints what it holds now. Only consumers whose hashes differ are
+written, and those are written concurrently. What ``prepare()`` returns
+next to the content is handed back to ``write()``, so nothing from a
+render is kept on the consumer between plan and write. ``plan()`` does the
+comparison without writing anything, for dry runs.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from proxy_manager.models.gsettings_backend import ROOT_SCHEMA
+from proxy_manager.models.privileged_helper import proxy_values
+from proxy_manager.utils.tracing import tracer
+
+
+# Fingerprint of a consumer that holds nothing (file absent, block removed)
+ABSENT = "absent"
+
+# Kept in the home directory of the user running the application
+STATE_FILE = ".proxy_manager_state.json"
+
+# Consumers are written concurrently and share the state file
+_state_lock = threading.Lock()
+
+
+def load_state(path):
+    """Records consumers keep between runs, by consumer name"""
+    try:
+        return json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def update_state(path, name, record):
+    """Replace the record of consumer name (None drops it) in the state file at path"""
+    path = Path(path)
+    with _state_lock:
+        state = load_state(path)
+        if record is None:
+            state.pop(name, None)
+        else:
+            state[name] = record
+        staged = path.with_name(path.name + ".tmp")
+        # Records may hold values that carry credentials
+        fd = os.open(staged, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            os.fchmod(f.fileno(), 0o600)
+            f.write(json.dumps(state, indent=2))
+        staged.replace(path)
+
+
+def content_hash(content):
+    """Short SHA-256 of content, or ABSENT for None"""
+    if content is None:
+        return ABSENT
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+class Consumer:
+    """Something that holds proxy settings; subclasses set name and implement the methods"""
+
+    name = ""
+
+    def available(self):
+        """Whether what this consumer configures is installed"""
+        return True
+
+    def target(self):
+        """What the consumer writes, for reports"""
+        return self.name
+
+    def render(self, settings, enabled):
+        """Content to hold for the effective settings; None when the proxy is disabled and it should hold nothing"""
+        raise NotImplementedError
+
+    def prepare(self, settings, enabled):
+        """(content, data) for write(): the rendered content and whatever else writing it needs"""
+        return self.render(settings, enabled), None
+
+    def read(self):
+        """Content held now, or None"""
+        raise NotImplementedError
+
+    def fingerprint(self):
+        """Hash of what the consumer holds now; None when it cannot be told"""
+        return content_hash(self.read())
+
+    def write(self, content, password, data=None):
+        """Store rendered content (None removes it) with the data from prepare(); return (success, error)"""
+        raise NotImplementedError
+
+
+class ManagedFileConsumer(Consumer):
+    """A root-owned file kept with ManagedBlockFile and written through the model's privileged primitives
+
+    name is the privileged helper's proxy-file target, and block renders
+    that target's template from proxy_values().
+    """
+
+    def __init__(self, name, managed, block, model):
+        self.name = name
+        self.managed = managed
+        self.block = block
+        self.model = model
+
+    def target(self):
+        return str(self.managed.path)
+
+    def render(self, settings, enabled):
+        return self.prepare(settings, enabled)[0]
+
+    def prepare(self, settings, enabled):
+        # The helper only takes these values and renders the file itself
+        values = proxy_values(settings) if enabled else None
+        # Unrelated lines of shared files are part of the content, so they are kept as they are
+        content = self.managed.render(self.managed.read(), self.block(values) if enabled else None)
+        return content, values
+
+    def read(self):
+        return self.managed.read()
+
+    def write(self, content, password, data=None):
+        success, _, stderr = self.model.write_proxy_file(self.name, self.target(), content, data, password)
+        return success, stderr
+
+
+class GnomeConsumer(Consumer):
+    """GNOME proxy settings
+
+    Reading the whole profile back takes one process per key without
+    GIO, so the hash of the last profile written is recorded instead.
+    The record is trusted only while GNOME still has the mode it set.
+    """
+
+    name = "gnome"
+
+    def __init__(self, model, state_path=None):
+        self.model = model
+        self.state_path = Path(state_path) if state_path else Path.home() / STATE_FILE
+
+    def target(self):
+        return ROOT_SCHEMA
+
+    def render(self, settings, enabled):
+        profile = self.model.build_gnome_profile(settings) if enabled else {ROOT_SCHEMA: {"mode": "none"}}
+        return json.dumps(profile, sort_keys=True)
+
+    def _live_mode(self):
+        monitor = self.model.status_monitor
+        return monitor.mode if monitor.running else monitor.refresh()
+
+    def fingerprint(self):
+        record = load_state(self.state_path).get(self.name)
+        if record and record.get("mode") == self._live_mode():
+            return record.get("hash")
+        return None
+
+    def write(self, content, password, data=None):
+        profile = json.loads(content)
+        success, error = self.model.gsettings.apply(profile)
+        if not success:
+            return False, error
+        mode = profile[ROOT_SCHEMA]["mode"]
+        self.model.status_monitor.set_mode(mode)
+        update_state(self.state_path, self.name, {"hash": content_hash(content), "mode": mode})
+        return True, ""
+
+
+class ConsumerPipeline:
+    """Brings every registered consumer in line with the settings, writing only those out of date"""
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.consumers = []
+
+    def register(self, consumer):
+        self.consumers.append(consumer)
+        return consumer
+
+    def _check(self, consumer, settings, enabled, force=False):
+        content, data = consumer.prepare(settings, enabled)
+        # A forced write does not need to know what is there
+        current = None if force else consumer.fingerprint()
+        desired = content_hash(content)
+        entry = {
+            "name": consumer.name,
+            "target": consumer.target(),
+            "changed": current != desired,
+            "current": current,
+            "desired": desired,
+        }
+        return entry, content, data
+
+    def _selected(self, only):
+        return [consumer for consumer in self.consumers if only is None or consumer.name in only]
+
+    def _plan(self, consumers, settings, enabled, force=False):
+        return self.runner.gather(*(lambda consumer=consumer: self._check(consumer, settings, enabled, force)
+                                    for consumer in consumers))
+
+    def plan(self, settings, enabled=True, only=None):
+        """One entry per consumer: name, target, changed and the current and desired hashes"""
+        return [entry for entry, _, _ in self._plan(self._selected(only), settings, enabled)]
+
+    def apply(self, settings, enabled, password, only=None, force=False):
+        """Write the consumers that are out of date (all of them with force), concurrently
+
+        only limits the pass to the named consumers. Entries also get
+        success and error.
+        """
+        with tracer.span("sync consumers") as span:
+            consumers = self._selected(only)
+            planned = self._plan(consumers, settings, enabled, force)
+            pending = []
+            for consumer, (entry, content, data) in zip(consumers, planned):
+                entry.update(success=True, error=None)
+                if entry["changed"]:
+                    pending.append((consumer, entry, content, data))
+            span.set(changed=len(pending))
+
+            def write(consumer, entry, content, data):
+                with tracer.span(f"write {consumer.name}", target=entry["target"]) as write_span:
+                    try:
+                        success, error = consumer.write(content, password, data)
+                    except Exception as e:
+                        success, error = False, str(e)
+                    write_span.finish(success, error=error)
+                entry.update(success=success, error=None if success else error)
+
+            self.runner.gather(*(lambda item=item: write(*item) for item in pending))
+            span.finish(all(entry["success"] for entry, _, _ in planned))
+        return [entry for entry, _, _ in planned]
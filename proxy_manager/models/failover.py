@@ -0,0 +1,215 @@
+"""
+Automatic failover across a ranked list of upstream proxies
+
+The ranked list is the ``http_proxy`` upstream followed by
+``fallback_proxies``. FailoverMonitor probes all of them periodically with
+ProxyProber and feeds the results to UpstreamScorer, which keeps an
+exponentially weighted moving average (EWMA) of latency and error rate per
+upstream and picks the active one:
+
+- an upstream is healthy while its error rate stays under
+  ``UNHEALTHY_ERROR_RATE``; a failing active upstream is replaced by the
+  best healthy one as soon as it crosses that line;
+- a healthy active upstream is only replaced by one whose score is at least
+  ``SWITCH_MARGIN`` better for ``SWITCH_ROUNDS`` rounds in a row, so two
+  proxies with similar latency do not make the selection flap;
+- ties go to the better ranked upstream.
+"""
+import asyncio
+import threading
+
+from proxy_manager.models.prober import ProxyProber, collect_targets
+
+
+DEFAULT_FAILOVER_INTERVAL = 30
+EWMA_ALPHA = 0.3
+UNHEALTHY_ERROR_RATE = 0.5
+# Scores are latencies inflated by the error rate
+ERROR_PENALTY = 4
+SWITCH_MARGIN = 0.2
+SWITCH_ROUNDS = 2
+
+
+class UpstreamStats:
+    """Rolling latency and error rate of one upstream"""
+
+    def __init__(self):
+        self.latency_ms = None
+        self.error_rate = 0.0
+        self.samples = 0
+
+    def record(self, latency_ms, alpha=EWMA_ALPHA):
+        """Add one observation: a latency, or None for a failure"""
+        self.samples += 1
+        failed = latency_ms is None
+        self.error_rate += alpha * ((1.0 if failed else 0.0) - self.error_rate)
+        if not failed:
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += alpha * (latency_ms - self.latency_ms)
+
+    @property
+    def healthy(self):
+        return self.latency_ms is not None and self.error_rate < UNHEALTHY_ERROR_RATE
+
+    @property
+    def score(self):
+        """Lower is better; None until a probe succeeded"""
+        if self.latency_ms is None:
+            return None
+        return self.latency_ms * (1 + ERROR_PENALTY * self.error_rate)
+
+    def as_dict(self):
+        return {
+            "latency_ms": None if self.latency_ms is None else round(self.latency_ms, 2),
+            "error_rate": round(self.error_rate, 3),
+            "samples": self.samples,
+            "healthy": self.healthy,
+        }
+
+
+def result_latency(result):
+    """Latency in ms to score a probe result by, or None if the probe failed"""
+    if not result["ok"]:
+        return None
+    timing = result["tunnel_setup"] or result["first_response"]
+    return timing["p50_ms"] if timing else None
+
+
+class UpstreamScorer:
+    """Chooses the active upstream from EWMA statistics, with hysteresis"""
+
+    def __init__(self, active=None, alpha=EWMA_ALPHA, margin=SWITCH_MARGIN, rounds=SWITCH_ROUNDS):
+        self.active = active
+        self.alpha = alpha
+        self.margin = margin
+        self.rounds = rounds
+        self.stats = {}
+        self._challenger = None
+        self._streak = 0
+
+    def record(self, address, latency_ms):
+        self.stats.setdefault(address, UpstreamStats()).record(latency_ms, self.alpha)
+
+    def record_results(self, results):
+        for result in results:
+            self.record(result["proxy"], result_latency(result))
+
+    def select(self, ranked):
+        """Update and return the active address among ranked (best rank first)"""
+        if not ranked:
+            return self.active
+        if self.active not in ranked:
+            self.active = ranked[0]
+            self._streak = 0
+
+        healthy = [address for address in ranked
+                   if address in self.stats and self.stats[address].healthy]
+        if not healthy:
+            # Nothing better to go to: keep the current upstream
+            return self.active
+        best = min(healthy, key=lambda address: (self.stats[address].score, ranked.index(address)))
+        current = self.stats.get(self.active)
+
+        if current is None or not current.healthy:
+            self._switch(best)
+        elif best == self.active or self.stats[best].score > current.score * (1 - self.margin):
+            self._challenger, self._streak = None, 0
+        else:
+            # Clearly better: switch once it has stayed so for enough rounds in a row
+            if best != self._challenger:
+                self._challenger, self._streak = best, 0
+            self._streak += 1
+            if self._streak >= self.rounds:
+                self._switch(best)
+        return self.active
+
+    def _switch(self, address):
+        self.active = address
+        self._challenger, self._streak = None, 0
+
+    def snapshot(self):
+        return {address: stats.as_dict() for address, stats in self.stats.items()}
+
+
+def ranked_targets(settings, credentials=None):
+    """ProbeTargets for http_proxy's upstream, then fallback_proxies, best rank first"""
+    return collect_targets(settings, credentials, keys=("http_proxy",))
+
+
+class FailoverMonitor:
+    """Probes the ranked upstreams periodically and reports switches
+
+    load_settings() returns (proxy settings, credentials) for each round so
+    edits to the configuration are picked up. on_switch(target) is called
+    with the newly selected ProbeTarget, from the monitor thread (start())
+    or from the event loop (run()).
+    """
+
+    def __init__(self, load_settings, on_switch, interval=DEFAULT_FAILOVER_INTERVAL, active=None, samples=1):
+        self.load_settings = load_settings
+        self.on_switch = on_switch
+        self.interval = interval
+        self.samples = samples
+        self.scorer = UpstreamScorer(active)
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    async def run_round(self):
+        """Probe every ranked upstream once; return the selected ProbeTarget if it changed"""
+        settings, credentials = self.load_settings()
+        targets = ranked_targets(settings, credentials)
+        if not targets:
+            return None
+        if self.scorer.active is None:
+            self.scorer.active = targets[0].address
+        results = await ProxyProber(targets, samples=self.samples).probe_all()
+        self.scorer.record_results(results)
+
+        previous = self.scorer.active
+        active = self.scorer.select([target.address for target in targets])
+        if active == previous:
+            return None
+        target = next(target for target in targets if target.address == active)
+        print(f"Upstream failover: {previous} -> {active}")
+        try:
+            self.on_switch(target)
+        except Exception as e:
+            print(f"Error applying upstream {active}: {e}")
+        return target
+
+    async def run(self):
+        """Run rounds forever on the current event loop"""
+        while True:
+            try:
+                await self.run_round()
+            except Exception as e:
+                print(f"Error in failover monitor: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Run rounds on a background thread"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_thread, name="proxy-failover", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run_thread(self):
+        while not self._stop.is_set():
+            try:
+                asyncio.run(self.run_round())
+            except Exception as e:
+                print(f"Error in failover monitor: {e}")
+            self._stop.wait(self.interval)
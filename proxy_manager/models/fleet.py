@@ -0,0 +1,232 @@
+"""
+Fleet rollout: run one proxy operation on many hosts at once
+
+Each host runs its own ``proxy-manager`` (enable, disable or set-password)
+over SSH, with the secrets written to the remote command's stdin
+(``--password-stdin``) so they never appear in a process list. Hosts
+are handled by an asyncio worker pool:
+
+- at most ``concurrency`` hosts are in progress at any time;
+- every attempt has its own timeout, after which ssh is killed;
+- attempts that failed to reach the host (ssh exit status 255, or a
+  timeout) are retried with exponential backoff and jitter. A host that
+  ran the command and reported failure is not retried: it would fail
+  the same way again.
+
+The executor is pluggable. SSHExecutor drives ``ssh``; LocalExecutor runs
+the command on this machine with a separate HOME per host name, so a
+rollout can be tried against local stand-in hosts; FakeExecutor answers
+from rules, for tests and benchmarks.
+"""
+import asyncio
+import fnmatch
+import os
+import random
+import shlex
+import statistics
+import sys
+import time
+
+
+DEFAULT_CONCURRENCY = 20
+DEFAULT_TIMEOUT = 60
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 1.0
+# ssh exits with 255 when it could not connect or authenticate
+SSH_TRANSPORT_ERROR = 255
+DEFAULT_REMOTE_COMMAND = "proxy-manager"
+# GNOME settings live on the desktop user's session bus, which an SSH session does not have
+SESSION_BUS = "DBUS_SESSION_BUS_ADDRESS=${DBUS_SESSION_BUS_ADDRESS:-unix:path=/run/user/$(id -u)/bus}"
+
+
+def load_inventory(path):
+    """Host names from a file: one ``[user@]host`` per line, # starts a comment"""
+    hosts = []
+    with open(path) as f:
+        for line in f:
+            host = line.split("#", 1)[0].strip()
+            if host and host not in hosts:
+                hosts.append(host)
+    return hosts
+
+
+class SSHExecutor:
+    """Runs commands on remote hosts with the ssh client"""
+
+    def __init__(self, remote_command=DEFAULT_REMOTE_COMMAND, ssh_options=(), connect_timeout=10):
+        self.remote_command = remote_command
+        self.ssh_options = list(ssh_options)
+        self.connect_timeout = connect_timeout
+
+    def command(self, host, args):
+        remote = " ".join([SESSION_BUS, self.remote_command, *(shlex.quote(arg) for arg in args)])
+        options = ["-o", "BatchMode=yes", "-o", f"ConnectTimeout={self.connect_timeout}"]
+        for option in self.ssh_options:
+            options += ["-o", option]
+        return ["ssh", *options, host, remote]
+
+    async def run(self, host, args, input, timeout):
+        return await _run_process(self.command(host, args), input, timeout)
+
+
+class LocalExecutor:
+    """Runs the command on this machine, with HOME set to root/<host> for each host"""
+
+    def __init__(self, root, command=None, env=None):
+        self.root = root
+        self.base_command = command or [sys.executable, "-m", "proxy_manager"]
+        self.env = env
+
+    async def run(self, host, args, input, timeout):
+        home = os.path.join(self.root, host.replace("/", "_"))
+        os.makedirs(home, exist_ok=True)
+        env = dict(self.env or os.environ, HOME=home)
+        return await _run_process([*self.base_command, *args], input, timeout, env)
+
+
+class FakeExecutor:
+    """Answers from rules instead of connecting
+
+        executor = FakeExecutor()
+        executor.on("*", stdout="✓ Proxy enabled\\n", delay=0.2)
+        executor.on("lab-*", unreachable=2)       # two connection failures, then the rule's answer
+        executor.on("lab-7", returncode=1, stderr="sudo: incorrect password\\n")
+
+    Rules match host names with shell-style patterns; the latest matching
+    rule wins. Unmatched hosts cannot be reached. Every attempt is
+    appended to ``calls`` as (host, args, input).
+    """
+
+    def __init__(self):
+        self.calls = []
+        self._rules = []
+        self._attempts = {}
+
+    def on(self, pattern, returncode=0, stdout="", stderr="", delay=0.0, unreachable=0):
+        """Answer hosts matching pattern; the first ``unreachable`` attempts fail like ssh would"""
+        self._rules.append((pattern, returncode, stdout, stderr, delay, unreachable))
+        return self
+
+    async def run(self, host, args, input, timeout):
+        self.calls.append((host, list(args), input))
+        attempt = self._attempts[host] = self._attempts.get(host, 0) + 1
+        for pattern, returncode, stdout, stderr, delay, unreachable in reversed(self._rules):
+            if fnmatch.fnmatchcase(host, pattern):
+                # Sleeping under wait_for raises TimeoutError the same way a hung ssh would
+                await asyncio.wait_for(asyncio.sleep(delay), timeout)
+                if attempt <= unreachable:
+                    return SSH_TRANSPORT_ERROR, "", f"ssh: connect to host {host} port 22: Connection refused\n"
+                return returncode, stdout, stderr
+        return SSH_TRANSPORT_ERROR, "", f"ssh: Could not resolve hostname {host}\n"
+
+
+async def _run_process(command, input, timeout, env=None):
+    """Run command feeding it input; return (returncode, stdout, stderr), raising TimeoutError"""
+    process = await asyncio.create_subprocess_exec(
+        *command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE, env=env,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(input.encode()), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+    return process.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+
+class FleetRunner:
+    """Applies one operation to every host with bounded concurrency, timeouts and retries"""
+
+    def __init__(self, executor, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, on_result=None):
+        self.executor = executor
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.on_result = on_result
+
+    def run(self, hosts, args, secrets=()):
+        """Run from synchronous code; return one result dict per host, in inventory order"""
+        return asyncio.run(self.run_all(hosts, args, secrets))
+
+    async def run_all(self, hosts, args, secrets=()):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # --password-stdin reads one secret per line
+        input = "".join(f"{secret}\n" for secret in secrets)
+
+        async def bounded(host):
+            async with semaphore:
+                result = await self.run_host(host, args, input)
+            if self.on_result is not None:
+                self.on_result(result)
+            return result
+
+        return await asyncio.gather(*(bounded(host) for host in hosts))
+
+    async def run_host(self, host, args, input):
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            retryable = False
+            try:
+                returncode, stdout, stderr = await self.executor.run(host, ["--password-stdin", *args],
+                                                                     input, self.timeout)
+                error = None if returncode == 0 else _last_line(stderr) or _last_line(stdout) or f"exit {returncode}"
+                retryable = returncode == SSH_TRANSPORT_ERROR
+            except asyncio.TimeoutError:
+                returncode, stdout, error = None, "", f"no answer within {self.timeout} s"
+                retryable = True
+            except OSError as e:
+                returncode, stdout, error = None, "", str(e)
+
+            if not retryable or attempt > self.retries:
+                break
+            # Exponential backoff with jitter so retries from many hosts do not line up
+            await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+        return {
+            "host": host,
+            "ok": returncode == 0,
+            "returncode": returncode,
+            "attempts": attempt,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "error": error,
+            "output": _last_line(stdout),
+        }
+
+
+def _last_line(text):
+    lines = [line for line in (text or "").splitlines() if line.strip()]
+    return lines[-1].strip() if lines else ""
+
+
+def summarize(results, elapsed=None):
+    """Totals, latency figures and failed hosts of a rollout"""
+    durations = sorted(result["duration_ms"] for result in results)
+    failed = [result for result in results if not result["ok"]]
+    return {
+        "hosts": len(results),
+        "succeeded": len(results) - len(failed),
+        "failed": len(failed),
+        "retried": sum(1 for result in results if result["attempts"] > 1),
+        "elapsed_s": None if elapsed is None else round(elapsed, 2),
+        "host_p50_ms": round(statistics.median(durations), 1) if durations else None,
+        "host_max_ms": durations[-1] if durations else None,
+        "failures": {result["host"]: result["error"] for result in failed},
+    }
+
+
+def format_summary(summary):
+    """Human readable report of summarize()'s output"""
+    lines = [f"{summary['succeeded']}/{summary['hosts']} hosts succeeded, {summary['failed']} failed,"
+             f" {summary['retried']} needed retries"]
+    if summary["elapsed_s"] is not None:
+        lines[0] += f" ({summary['elapsed_s']} s)"
+    if summary["host_p50_ms"] is not None:
+        lines.append(f"Per host: p50 {summary['host_p50_ms']:.0f} ms, max {summary['host_max_ms']:.0f} ms")
+    for host, error in summary["failures"].items():
+        lines.append(f"❌ {host}: {error}")
+    return "\n".join(lines)
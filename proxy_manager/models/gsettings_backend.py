@@ -0,0 +1,196 @@
+"""
+GNOME settings backend for Proxy Manager
+
+Applies a whole set of GSettings keys at once instead of one
+``gsettings set`` process per key. Whenever ``dconf`` is installed every
+schema is written in a single ``dconf load`` transaction. The GSettings
+bindings commit one schema at a time, and put back the schemas already
+committed when a later one fails; the ``gsettings`` fallback goes one key
+at a time. Either way the root schema, and with it ``mode``, is written last.
+"""
+import shutil
+
+from proxy_manager.models.command_runner import CommandRunner
+from proxy_manager.utils.tracing import tracer
+
+
+# dconf paths of the GNOME proxy schemas
+SCHEMA_PATHS = {
+    "org.gnome.system.proxy": "/system/proxy/",
+    "org.gnome.system.proxy.http": "/system/proxy/http/",
+    "org.gnome.system.proxy.https": "/system/proxy/https/",
+    "org.gnome.system.proxy.ftp": "/system/proxy/ftp/",
+    "org.gnome.system.proxy.socks": "/system/proxy/socks/",
+}
+
+ROOT_SCHEMA = "org.gnome.system.proxy"
+
+
+def to_gvariant_text(value):
+    """Serialize a Python value to GVariant text format"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return "@as []"
+        return "[" + ", ".join(to_gvariant_text(item) for item in value) + "]"
+    escaped = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{escaped}'"
+
+
+def _gvariant_type(value):
+    """Return the GVariant type string for a Python value"""
+    if isinstance(value, bool):
+        return "b"
+    if isinstance(value, int):
+        return "i"
+    if isinstance(value, (list, tuple)):
+        return "as"
+    return "s"
+
+
+class GSettingsBackend:
+    """Reads and writes GNOME proxy settings through the fastest available channel
+
+    Writes are tried, in order, as a single ``dconf load`` changeset, through
+    the GSettings bindings (no process spawn, but one commit per schema),
+    and finally with sequential ``gsettings set`` calls. Sub-schemas are
+    always written before the root schema so ``mode`` only flips once hosts
+    and ports are in place: a reader between two schema commits still sees
+    the previous mode.
+    """
+
+    def __init__(self, timeout=10, runner=None):
+        self.timeout = timeout
+        self.runner = runner or CommandRunner()
+        self._gio = None
+        self._gio_checked = False
+
+    def _load_gio(self):
+        """Import Gio lazily; return None when PyGObject is unavailable"""
+        if not self._gio_checked:
+            self._gio_checked = True
+            try:
+                import gi
+                gi.require_version("Gio", "2.0")
+                from gi.repository import Gio, GLib
+                source = Gio.SettingsSchemaSource.get_default()
+                if source is not None and source.lookup(ROOT_SCHEMA, True) is not None:
+                    self._gio = (Gio, GLib)
+            except Exception:
+                self._gio = None
+        return self._gio
+
+    @staticmethod
+    def _ordered(changes):
+        """Yield (schema, keys) with the root schema last"""
+        for schema in sorted(changes, key=lambda name: name == ROOT_SCHEMA):
+            yield schema, changes[schema]
+
+    def apply(self, changes):
+        """Apply {schema: {key: value}}, mode last; return (success, error)"""
+        if not changes:
+            return True, ""
+        # Reads after a write must not come from the cache, whether or not it succeeded
+        self.runner.invalidate(["gsettings", "get"])
+
+        for schema in changes:
+            if schema not in SCHEMA_PATHS:
+                return False, f"Unknown schema: {schema}"
+
+        if shutil.which("dconf"):
+            success, error = self._apply_dconf(changes)
+            if success:
+                return True, ""
+            print(f"dconf load failed, falling back to GSettings: {error}")
+
+        if self._load_gio():
+            try:
+                with tracer.span("gio apply"):
+                    self._apply_gio(changes)
+                return True, ""
+            except Exception as e:
+                print(f"GSettings bindings failed, falling back to gsettings: {e}")
+
+        return self._apply_gsettings(changes)
+
+    def _apply_gio(self, changes):
+        """Apply changes with delayed-apply Gio.Settings objects
+
+        Each schema's keys land together, but GSettings has no transaction
+        spanning schemas, so the schemas are committed one after another.
+        If one fails, the schemas already committed get their previous
+        values back before the error is raised.
+        """
+        Gio, GLib = self._gio
+        committed = []
+        try:
+            for schema, keys in self._ordered(changes):
+                settings = Gio.Settings.new(schema)
+                previous = {key: settings.get_value(key) for key in keys}
+                settings.delay()
+                for key, value in keys.items():
+                    settings.set_value(key, GLib.Variant(_gvariant_type(value), value))
+                settings.apply()
+                committed.append((schema, settings, previous))
+            Gio.Settings.sync()
+        except Exception:
+            for schema, settings, previous in reversed(committed):
+                try:
+                    for key, value in previous.items():
+                        settings.set_value(key, value)
+                    settings.apply()
+                except Exception as e:
+                    print(f"Could not restore {schema}: {e}")
+            Gio.Settings.sync()
+            raise
+
+    def _apply_dconf(self, changes):
+        """Apply changes as a single dconf changeset"""
+        sections = []
+        for schema, keys in self._ordered(changes):
+            relative = SCHEMA_PATHS[schema][len(SCHEMA_PATHS[ROOT_SCHEMA]):].rstrip("/")
+            lines = [f"[{relative or '/'}]"]
+            lines.extend(f"{key}={to_gvariant_text(value)}" for key, value in keys.items())
+            sections.append("\n".join(lines))
+        keyfile = "\n\n".join(sections) + "\n"
+
+        result = self.runner.run(["dconf", "load", SCHEMA_PATHS[ROOT_SCHEMA]], input=keyfile,
+                                 timeout=self.timeout)
+        return result.ok, result.message
+
+    def _apply_gsettings(self, changes):
+        """Apply changes key by key with the gsettings tool"""
+        for schema, keys in self._ordered(changes):
+            for key, value in keys.items():
+                result = self.runner.run(["gsettings", "set", schema, key, to_gvariant_text(value)],
+                                         timeout=self.timeout, label=f"gsettings set {key}")
+                if not result.ok:
+                    return False, f"{schema} {key}: {result.message}"
+        return True, ""
+
+    def get(self, schema, key, fresh=False):
+        """Read a single key; return its Python value or None on failure
+
+        Without GIO, reads are served from the runner's short-lived cache
+        unless fresh is set (e.g. after a change notification).
+        """
+        if self._load_gio():
+            try:
+                Gio, _ = self._gio
+                return Gio.Settings.new(schema).get_value(key).unpack()
+            except Exception as e:
+                print(f"GSettings read failed, falling back to gsettings: {e}")
+
+        command = ["gsettings", "get", schema, key]
+        if fresh:
+            self.runner.invalidate(command)
+        result = self.runner.run(command, timeout=5, cache=True)
+        if result.error is not None:
+            print(f"Error reading {schema} {key}: {result.error}")
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip().strip("'")
@@ -0,0 +1,418 @@
+"""
+Local forwarding proxy for Proxy Manager
+
+An optional HTTP proxy on 127.0.0.1 that the desktop is pointed at instead
+of the upstream Squid. Requests are forwarded over a small pool of warm
+keep-alive connections to the upstream, so clients on this machine share a
+handful of upstream connections instead of opening one (and one TCP and
+auth handshake) per request.
+
+Plain requests are forwarded in absolute form; CONNECT tunnels take a pooled
+connection and keep it for themselves. With credentials configured, the
+Basic Proxy-Authorization header is computed once and added to every
+upstream request, so clients use an unauthenticated local endpoint and never
+see a 407. Without credentials, client Proxy-Authorization headers pass
+through unchanged.
+
+Hosts matched by the no_proxy rules (a BypassMatcher) are connected to
+directly, so every client gets the same bypass decisions whatever its own
+no_proxy support.
+"""
+import asyncio
+import collections
+import os
+import socket
+from pathlib import Path
+
+from proxy_manager.utils.http_wire import (
+    MAX_HEAD_SIZE,
+    HTTPWireError,
+    body_framing,
+    build_head,
+    parse_head,
+    pipe,
+    read_head,
+    relay_body,
+    request_authority,
+    strip_hop_by_hop,
+    wants_keep_alive,
+)
+from proxy_manager.utils.proxy_url import LOCAL_PROXY_HOST, basic_proxy_authorization
+
+
+DEFAULT_LOCAL_PROXY_PORT = 3129
+DEFAULT_POOL_SIZE = 8
+
+CONNECT_TIMEOUT = 10
+# Upstream connections idle longer than this may already be closed by Squid
+POOL_IDLE_TIMEOUT = 30
+CLIENT_IDLE_TIMEOUT = 60
+
+# Errors that mean a connection is unusable rather than a bug in the proxy
+_CONNECTION_ERRORS = (OSError, HTTPWireError, asyncio.IncompleteReadError, asyncio.TimeoutError)
+
+
+def _set_nodelay(writer):
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+
+
+def pid_file():
+    """Where a running ``proxy-manager serve`` records its process id"""
+    return Path.home() / ".proxy_manager_local_proxy.pid"
+
+
+def running_pid():
+    """Process id of the running local proxy, or None"""
+    try:
+        pid = int(pid_file().read_text().strip())
+        # Make sure a stale file does not point at an unrelated process
+        cmdline = Path(f"/proc/{pid}/cmdline").read_bytes().split(b"\0")
+    except (OSError, ValueError):
+        return None
+    return pid if b"serve" in cmdline else None
+
+
+def is_listening(host, port, timeout=0.2):
+    """Whether something accepts TCP connections on host:port"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class UpstreamPool:
+    """Idle keep-alive connections to one upstream proxy, most recently used first"""
+
+    def __init__(self, host, port, max_idle=DEFAULT_POOL_SIZE, idle_timeout=POOL_IDLE_TIMEOUT,
+                 connect_timeout=CONNECT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.opened = 0
+        self.reused = 0
+        self._idle = collections.deque()
+        self._closed = False
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    async def connect(self):
+        """Open a new upstream connection"""
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, limit=MAX_HEAD_SIZE),
+            self.connect_timeout,
+        )
+        _set_nodelay(writer)
+        self.opened += 1
+        return reader, writer
+
+    async def acquire(self):
+        """Return (reader, writer, reused), preferring a live idle connection"""
+        now = asyncio.get_running_loop().time()
+        while self._idle:
+            reader, writer, idle_since = self._idle.pop()
+            if now - idle_since > self.idle_timeout or reader.at_eof() or writer.is_closing():
+                writer.close()
+                continue
+            self.reused += 1
+            return reader, writer, True
+        reader, writer = await self.connect()
+        return reader, writer, False
+
+    def release(self, reader, writer, reusable):
+        """Return a connection to the pool, or close it"""
+        if (not reusable or self._closed or writer.is_closing() or reader.at_eof()
+                or len(self._idle) >= self.max_idle):
+            writer.close()
+            return
+        self._idle.append((reader, writer, asyncio.get_running_loop().time()))
+
+    async def warm(self, count):
+        """Open up to count idle connections ahead of the first requests"""
+        count = min(count, self.max_idle) - len(self._idle)
+        if count <= 0:
+            return 0
+        results = await asyncio.gather(*(self.connect() for _ in range(count)), return_exceptions=True)
+        warmed = 0
+        for result in results:
+            if isinstance(result, BaseException):
+                continue
+            self.release(*result, True)
+            warmed += 1
+        return warmed
+
+    def close(self):
+        """Close every idle connection and stop pooling"""
+        self._closed = True
+        while self._idle:
+            _, writer, _ = self._idle.pop()
+            writer.close()
+
+
+class LocalForwardingProxy:
+    """HTTP/1.1 forwarding proxy on localhost backed by an UpstreamPool"""
+
+    def __init__(self, upstream_host, upstream_port, listen_host=LOCAL_PROXY_HOST,
+                 listen_port=DEFAULT_LOCAL_PROXY_PORT, pool_size=DEFAULT_POOL_SIZE, warm=2,
+                 username=None, password=None, bypass=None):
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.warm = warm
+        self.pool = UpstreamPool(upstream_host, upstream_port, max_idle=pool_size)
+        self.proxy_authorization = None
+        self.bypass = bypass
+        self.requests = 0
+        self.tunnels = 0
+        self.direct = 0
+        self._server = None
+        self.set_credentials(username, password)
+
+    def set_credentials(self, username, password):
+        """Inject Basic auth for username/password upstream, or pass client auth through if unset"""
+        if username and password:
+            self.proxy_authorization = basic_proxy_authorization(username, password)
+        else:
+            self.proxy_authorization = None
+
+    def set_upstream(self, host, port):
+        """Send new requests to another upstream; connections in use finish on the old one"""
+        if (host, port) == (self.pool.host, self.pool.port):
+            return
+        old = self.pool
+        self.pool = UpstreamPool(host, port, max_idle=old.max_idle, idle_timeout=old.idle_timeout,
+                                 connect_timeout=old.connect_timeout)
+        self.pool.opened, self.pool.reused = old.opened, old.reused
+        old.close()
+
+    def stats(self):
+        """Counters for diagnostics"""
+        return {
+            "requests": self.requests,
+            "tunnels": self.tunnels,
+            "direct": self.direct,
+            "upstream_opened": self.pool.opened,
+            "upstream_reused": self.pool.reused,
+            "upstream_idle": self.pool.idle_count,
+        }
+
+    async def start(self):
+        """Start listening and pre-open a few upstream connections"""
+        self._server = await asyncio.start_server(
+            self._handle_client, self.listen_host, self.listen_port,
+            limit=MAX_HEAD_SIZE, reuse_address=True,
+        )
+        print(f"Local proxy listening on {self.listen_host}:{self.listen_port}, "
+              f"upstream {self.pool.host}:{self.pool.port}")
+        if self.warm:
+            warmed = await self.pool.warm(self.warm)
+            print(f"Opened {warmed} warm upstream connection(s)")
+
+    async def serve_forever(self):
+        """Start if needed and serve until cancelled"""
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Stop listening and drop pooled connections"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self.pool.close()
+
+    async def _handle_client(self, client_reader, client_writer):
+        _set_nodelay(client_writer)
+        try:
+            while True:
+                head = await asyncio.wait_for(read_head(client_reader), CLIENT_IDLE_TIMEOUT)
+                if head is None:
+                    break
+                start_line, headers = parse_head(head)
+                try:
+                    method, target, version = start_line.split(" ", 2)
+                except ValueError:
+                    await self._send_error(client_writer, 400, "Bad Request")
+                    break
+                if not await self._forward(client_reader, client_writer, method, target, version, headers):
+                    break
+        except _CONNECTION_ERRORS:
+            pass
+        finally:
+            client_writer.close()
+
+    async def _send_request(self, client_reader, request_head, framing, length, direct=None):
+        """Send a request upstream (or to direct=(host, port)); return (reader, writer, response head)
+
+        A reused connection may have been closed by the upstream while idle.
+        Requests without a body are retried once on a fresh connection.
+        """
+        retry = framing == "none" and direct is None
+        while True:
+            if direct is None:
+                reader, writer, reused = await self.pool.acquire()
+            else:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(*direct, limit=MAX_HEAD_SIZE), CONNECT_TIMEOUT
+                )
+                reused = False
+            try:
+                writer.write(request_head)
+                await relay_body(client_reader, writer, framing, length)
+                await writer.drain()
+                response_head = await read_head(reader)
+                if response_head is None:
+                    raise ConnectionResetError("Upstream closed the connection")
+                return reader, writer, response_head
+            except _CONNECTION_ERRORS:
+                writer.close()
+                if not (reused and retry):
+                    raise
+                retry = False
+
+    def _direct_route(self, method, target):
+        """(host, port, origin-form target) if the request bypasses the upstream, else None"""
+        if self.bypass is None:
+            return None
+        scheme, host, port, path = request_authority(method, target)
+        if not host or scheme not in (None, "http") or not self.bypass.bypass(host):
+            return None
+        return host, port, path
+
+    async def _tunnel_direct(self, client_reader, client_writer, host, port):
+        """Answer CONNECT for a bypassed host with a direct TCP connection"""
+        try:
+            up_reader, up_writer = await asyncio.wait_for(asyncio.open_connection(host, port), CONNECT_TIMEOUT)
+        except _CONNECTION_ERRORS as e:
+            await self._send_error(client_writer, 502, "Bad Gateway", f"Cannot connect to {host}:{port}: {e}")
+            return False
+        self.tunnels += 1
+        try:
+            client_writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            await client_writer.drain()
+            await asyncio.gather(pipe(client_reader, up_writer), pipe(up_reader, client_writer))
+        finally:
+            up_writer.close()
+        return False
+
+    async def _forward(self, client_reader, client_writer, method, target, version, headers):
+        """Forward one request; return True if the client connection stays open"""
+        self.requests += 1
+        client_keep_alive = wants_keep_alive(version, headers)
+        framing, length = body_framing(headers)
+        forward_headers = strip_hop_by_hop(headers)
+
+        direct = self._direct_route(method, target)
+        if direct is not None:
+            self.direct += 1
+            host, port, path = direct
+            if method == "CONNECT":
+                return await self._tunnel_direct(client_reader, client_writer, host, port)
+            # Origin servers get origin-form targets and never see proxy credentials
+            forward_headers = [(key, value) for key, value in forward_headers
+                               if key.lower() != "proxy-authorization"]
+            forward_headers.append(("Connection", "close"))
+            request_head = build_head(f"{method} {path} {version}", forward_headers)
+            direct = (host, port)
+        else:
+            if self.proxy_authorization is not None:
+                forward_headers = [(key, value) for key, value in forward_headers
+                                   if key.lower() != "proxy-authorization"]
+                forward_headers.append(("Proxy-Authorization", self.proxy_authorization))
+            forward_headers.append(("Connection", "keep-alive"))
+            request_head = build_head(f"{method} {target} {version}", forward_headers)
+
+        # Released to the pool it came from, even if the upstream is switched meanwhile
+        pool = self.pool
+        try:
+            up_reader, up_writer, response_head = await self._send_request(
+                client_reader, request_head, framing, length, direct
+            )
+        except _CONNECTION_ERRORS as e:
+            where = "Upstream proxy" if direct is None else f"{direct[0]}:{direct[1]}"
+            await self._send_error(client_writer, 502, "Bad Gateway", f"{where} unreachable: {e}")
+            return False
+
+        try:
+            response_line, response_headers = parse_head(response_head)
+            parts = response_line.split(" ", 2)
+            response_version, status = parts[0], int(parts[1])
+
+            # Interim responses (100 Continue) are relayed as they come
+            while 100 <= status < 200 and status != 101:
+                client_writer.write(response_head)
+                response_head = await read_head(up_reader)
+                if response_head is None:
+                    raise ConnectionResetError("Upstream closed the connection")
+                response_line, response_headers = parse_head(response_head)
+                parts = response_line.split(" ", 2)
+                response_version, status = parts[0], int(parts[1])
+
+            if method == "CONNECT" and 200 <= status < 300:
+                self.tunnels += 1
+                client_writer.write(build_head(response_line, strip_hop_by_hop(response_headers)))
+                await client_writer.drain()
+                await asyncio.gather(pipe(client_reader, up_writer), pipe(up_reader, client_writer))
+                up_writer.close()
+                return False
+
+            response_framing, response_length = body_framing(response_headers, method, status)
+            upstream_reusable = (direct is None and response_framing != "close"
+                                 and wants_keep_alive(response_version, response_headers))
+            keep_client = client_keep_alive and response_framing != "close"
+
+            out_headers = strip_hop_by_hop(response_headers)
+            out_headers.append(("Connection", "keep-alive" if keep_client else "close"))
+            client_writer.write(build_head(response_line, out_headers))
+            await relay_body(up_reader, client_writer, response_framing, response_length)
+            await client_writer.drain()
+        except (ValueError, IndexError):
+            up_writer.close()
+            await self._send_error(client_writer, 502, "Bad Gateway", "Malformed response from upstream")
+            return False
+        except BaseException:
+            up_writer.close()
+            raise
+
+        pool.release(up_reader, up_writer, upstream_reusable)
+        return keep_client
+
+    @staticmethod
+    async def _send_error(writer, status, reason, detail=""):
+        body = f"{status} {reason}\n{detail}\n".encode("utf-8", "replace")
+        head = build_head(f"HTTP/1.1 {status} {reason}", [
+            ("Content-Type", "text/plain; charset=utf-8"),
+            ("Content-Length", str(len(body))),
+            ("Connection", "close"),
+        ])
+        try:
+            writer.write(head + body)
+            await writer.drain()
+        except OSError:
+            pass
+
+
+def reload_running_proxy():
+    """Ask a running local proxy to re-read its credentials; return True if one was signalled"""
+    import signal
+
+    pid = running_pid()
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, signal.SIGHUP)
+    except OSError:
+        return False
+    return True
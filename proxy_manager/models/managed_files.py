@@ -0,0 +1,39 @@
+"""
+Managed system files for Proxy Manager
+
+Proxy Manager owns a delimited block inside shared files such as
+/etc/environment, or the whole of files it created such as
+/etc/apt/apt.conf.d/99proxy. The files are written through
+ManagedFileConsumer, which skips the privileged write when the rendered
+content matches what is on disk, and are rendered from the same
+templates by the privileged helper.
+"""
+from pathlib import Path
+
+# The block format is shared with the privileged helper, which renders the same files
+from proxy_manager.models.privileged_helper import (
+    BLOCK_BEGIN, BLOCK_END, LEGACY_ENVIRONMENT_LINE, render_block,
+)
+
+
+class ManagedBlockFile:
+    """A system file in which Proxy Manager manages one block, or the whole file"""
+
+    def __init__(self, path, whole_file=False, legacy_line=None):
+        self.path = Path(path)
+        self.whole_file = whole_file
+        self.legacy_line = legacy_line
+
+    def read(self):
+        """Current content, or None if the file does not exist"""
+        try:
+            return self.path.read_text()
+        except FileNotFoundError:
+            return None
+
+    def render(self, current, block):
+        """Return the full file content with block in place (None removes it)
+
+        For whole files, None means the file should not exist.
+        """
+        return render_block(current, block, self.whole_file, self.legacy_line)
@@ -0,0 +1,309 @@
+"""
+Proxy auto-config (PAC) support for Proxy Manager
+
+generate_pac() turns the proxy settings and no_proxy list into a
+``proxy.pac`` that browsers evaluate locally. PacServer serves that file
+from 127.0.0.1 so GNOME can use it as ``autoconfig-url``, and PacEvaluator
+runs the generated subset of JavaScript in Python, with a per-host cache,
+so routing decisions can be checked without a browser.
+"""
+import asyncio
+import fnmatch
+import functools
+import ipaddress
+import json
+import re
+from pathlib import Path
+
+from proxy_manager.utils.bypass import classify_entry, parse_no_proxy
+from proxy_manager.utils.http_wire import HTTPWireError, build_head, parse_head, read_head
+from proxy_manager.utils.proxy_url import LOCAL_PROXY_HOST, split_host_port
+
+
+DEFAULT_PAC_PORT = 3131
+PAC_PATH = "/proxy.pac"
+PAC_CONTENT_TYPE = "application/x-ns-proxy-autoconfig"
+CACHE_SIZE = 4096
+
+
+def default_pac_file():
+    """Where Proxy Manager keeps the generated PAC file"""
+    return Path.home() / ".proxy_manager.pac"
+
+
+class PacError(Exception):
+    """PAC text outside the subset PacEvaluator understands"""
+
+
+def _js(value):
+    """JavaScript string literal"""
+    return json.dumps(value)
+
+
+def _bypass_condition(entry):
+    """PAC condition for one no_proxy entry, or None if it has no equivalent"""
+    kind, value = classify_entry(entry)
+    if kind == "all":
+        return "true"
+    if kind == "local":
+        # IPv6 literals have no dot either, but <local> only covers names
+        return "isPlainHostName(host) && host.indexOf(\":\") < 0"
+    if kind == "domain":
+        return f"host == {_js(value)} || dnsDomainIs(host, {_js('.' + value)})"
+    if kind == "subdomains":
+        return f"dnsDomainIs(host, {_js('.' + value)})"
+    if kind == "pattern":
+        return f"shExpMatch(host, {_js(value)})"
+    if kind == "network":
+        if value.version == 4:
+            # isInNet() resolves names in browsers; only test address literals
+            return f"ipv4 && isInNet(host, {_js(str(value.network_address))}, {_js(str(value.netmask))})"
+        return f"isInNetEx(host, {_js(str(value))})"
+    return None
+
+
+def generate_pac(settings):
+    """Return proxy.pac text for settings (no_proxy and http/https/ftp proxy URLs)"""
+    def proxy(key):
+        host, port = split_host_port(settings.get(key) or settings["http_proxy"])
+        if ":" in host:
+            host = f"[{host}]"
+        return f"PROXY {host}:{port}"
+
+    lines = [
+        "// Generated by Proxy Manager; edits are overwritten",
+        "function FindProxyForURL(url, host) {",
+        "    host = host.toLowerCase();",
+        "    var ipv4 = /^\\d+\\.\\d+\\.\\d+\\.\\d+$/.test(host);",
+    ]
+    for entry in parse_no_proxy(settings.get("no_proxy", "")):
+        condition = _bypass_condition(entry)
+        if condition is not None:
+            lines.append(f"    if ({condition}) return \"DIRECT\";")
+    lines.append(f"    if (shExpMatch(url, \"https:*\")) return \"{proxy('https_proxy')}\";")
+    lines.append(f"    if (shExpMatch(url, \"ftp:*\")) return \"{proxy('ftp_proxy')}\";")
+    lines.append(f"    return \"{proxy('http_proxy')}\";")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+_STRING = r'"((?:[^"\\]|\\.)*)"'
+_STATEMENT = re.compile(rf"^(?:if \((?P<condition>.+)\) )?return {_STRING};$")
+_URL_PATTERN = re.compile(rf"shExpMatch\(url, {_STRING}\)")
+_IPV4_LITERAL = re.compile(r"^\d+\.\d+\.\d+\.\d+$")
+_IGNORED = {
+    "function FindProxyForURL(url, host) {",
+    "}",
+    "host = host.toLowerCase();",
+    "var ipv4 = /^\\d+\\.\\d+\\.\\d+\\.\\d+$/.test(host);",
+}
+
+
+def _always():
+    return lambda url, host, ipv4: True
+
+
+def _plain_host_name():
+    return lambda url, host, ipv4: "." not in host
+
+
+def _plain_name():
+    return lambda url, host, ipv4: "." not in host and ":" not in host
+
+
+def _host_equals(value):
+    return lambda url, host, ipv4: host == value
+
+
+def _dns_domain_is(suffix):
+    return lambda url, host, ipv4: host.endswith(suffix)
+
+
+def _host_matches(pattern):
+    regex = re.compile(fnmatch.translate(pattern))
+    return lambda url, host, ipv4: regex.match(host) is not None
+
+
+def _url_matches(pattern):
+    regex = re.compile(fnmatch.translate(pattern))
+    return lambda url, host, ipv4: regex.match(url) is not None
+
+
+def _ipv4_in_net(address, mask):
+    network = ipaddress.IPv4Network(f"{address}/{mask}", strict=False)
+
+    def test(url, host, ipv4):
+        try:
+            return ipv4 and ipaddress.IPv4Address(host) in network
+        except ValueError:
+            return False
+    return test
+
+
+def _in_net_ex(cidr):
+    network = ipaddress.ip_network(cidr, strict=False)
+
+    def test(url, host, ipv4):
+        try:
+            return ipaddress.ip_address(host.strip("[]")) in network
+        except ValueError:
+            return False
+    return test
+
+
+# Condition terms generate_pac() emits, and the predicate factory for each
+_TERMS = [
+    (re.compile(r"^true$"), _always),
+    (re.compile(r"^isPlainHostName\(host\)$"), _plain_host_name),
+    (re.compile(r'^isPlainHostName\(host\) && host\.indexOf\(":"\) < 0$'), _plain_name),
+    (re.compile(rf"^host == {_STRING}$"), _host_equals),
+    (re.compile(rf"^dnsDomainIs\(host, {_STRING}\)$"), _dns_domain_is),
+    (re.compile(rf"^shExpMatch\(host, {_STRING}\)$"), _host_matches),
+    (re.compile(rf"^shExpMatch\(url, {_STRING}\)$"), _url_matches),
+    (re.compile(rf"^ipv4 && isInNet\(host, {_STRING}, {_STRING}\)$"), _ipv4_in_net),
+    (re.compile(rf"^isInNetEx\(host, {_STRING}\)$"), _in_net_ex),
+]
+
+
+def _unquote(value):
+    return json.loads(f'"{value}"')
+
+
+def _compile_term(term):
+    for pattern, factory in _TERMS:
+        match = pattern.match(term)
+        if match:
+            return factory(*(_unquote(group) for group in match.groups()))
+    raise PacError(f"Unsupported PAC condition: {term}")
+
+
+class PacEvaluator:
+    """Evaluates PAC files in the subset produced by generate_pac()"""
+
+    def __init__(self, pac_text, cache_size=CACHE_SIZE):
+        self.rules = []
+        # When URLs are only tested for their scheme, results depend on (scheme, host)
+        self._scheme_only = True
+        for number, raw in enumerate(pac_text.splitlines(), 1):
+            line = raw.strip()
+            if not line or line.startswith("//") or line in _IGNORED:
+                continue
+            match = _STATEMENT.match(line)
+            if not match:
+                raise PacError(f"Unsupported PAC statement on line {number}: {line}")
+            condition = match.group("condition") or ""
+            terms = [_compile_term(term.strip()) for term in condition.split(" || ") if term.strip()]
+            for pattern in _URL_PATTERN.findall(condition):
+                if not _unquote(pattern).endswith(":*"):
+                    self._scheme_only = False
+            self.rules.append((terms, _unquote(match.group(2))))
+        if not self.rules or self.rules[-1][0]:
+            raise PacError("PAC file has no unconditional return")
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._evaluate)
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(Path(path).read_text())
+
+    def _evaluate(self, url, host):
+        ipv4 = _IPV4_LITERAL.match(host) is not None
+        for terms, result in self.rules:
+            if not terms or any(term(url, host, ipv4) for term in terms):
+                return result
+        return "DIRECT"
+
+    def find_proxy(self, url, host=None):
+        """FindProxyForURL(url, host): "DIRECT" or "PROXY host:port" """
+        if host is None:
+            authority = url.split("://", 1)[-1].split("/", 1)[0].rpartition("@")[2]
+            host = authority[1:].partition("]")[0] if authority.startswith("[") else authority.partition(":")[0]
+        host = host.lower()
+        if self._scheme_only:
+            scheme = url.split(":", 1)[0].lower()
+            return self._cached(f"{scheme}:", host)
+        return self._cached(url, host)
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+
+class PacServer:
+    """Serves one PAC file over HTTP on localhost, re-reading it when it changes"""
+
+    def __init__(self, pac_file, listen_host=LOCAL_PROXY_HOST, listen_port=DEFAULT_PAC_PORT):
+        self.pac_file = Path(pac_file)
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.requests = 0
+        self._server = None
+        self._content = None
+        self._stamp = None
+
+    @property
+    def url(self):
+        return f"http://{self.listen_host}:{self.listen_port}{PAC_PATH}"
+
+    def _load(self):
+        """Current PAC bytes, read again only when the file's mtime or size changed"""
+        try:
+            stat = self.pac_file.stat()
+        except FileNotFoundError:
+            self._content, self._stamp = None, None
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            self._content, self._stamp = self.pac_file.read_bytes(), stamp
+        return self._content
+
+    def stats(self):
+        """Counters for diagnostics"""
+        return {"requests": self.requests, "loaded": self._stamp is not None}
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.listen_host, self.listen_port,
+                                                  reuse_address=True)
+        self.listen_port = self._server.sockets[0].getsockname()[1]
+        print(f"PAC file {self.pac_file} served at {self.url}")
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(read_head(reader), 10)
+            if head is None:
+                return
+            start_line, _ = parse_head(head)
+            method, target = (start_line.split(" ") + ["", ""])[:2]
+            self.requests += 1
+            content = self._load() if target.split("?", 1)[0] == PAC_PATH else None
+            if method not in ("GET", "HEAD"):
+                status, content = "405 Method Not Allowed", b""
+            elif content is None:
+                status, content = "404 Not Found", b""
+            else:
+                status = "200 OK"
+            writer.write(build_head(f"HTTP/1.1 {status}", [
+                ("Content-Type", PAC_CONTENT_TYPE),
+                ("Content-Length", str(len(content))),
+                ("Cache-Control", "no-cache"),
+                ("Connection", "close"),
+            ]))
+            if method == "GET":
+                writer.write(content)
+            await writer.drain()
+        except (OSError, HTTPWireError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
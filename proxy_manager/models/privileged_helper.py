@@ -0,0 +1,548 @@
+"""
+Privileged helper for Proxy Manager
+
+A small long-lived root process, started once per session through sudo,
+that serves a narrow typed request protocol over a Unix socket:
+
+    {"op": "ping"}
+    {"op": "proxy-file", "target": "environment", "values": {"http_proxy": "http://proxy:3128", ...}}
+    {"op": "proxy-file", "target": "apt", "values": null}
+    {"op": "systemctl", "action": "stop", "units": ["klnagent64"]}
+    {"op": "snap-proxy", "values": {"http": "http://proxy:3128", "https": null}}
+    {"op": "shutdown"}
+
+Each request and response is a single line of JSON. Responses carry
+"ok", "stdout" and "stderr" so callers get the same triple as
+ProxyModel.run_command_with_sudo.
+
+Any process of the owner's uid can reach the socket without a password,
+so no request carries file content: ``proxy-file`` takes the proxy URLs
+and no_proxy list, checks them, and renders /etc/environment, the APT
+configuration or the docker drop-in from the fixed templates below
+(``values`` null removes the proxy settings). ProxyModel renders the same
+templates for its sudo fallback and to tell whether a file is up to date.
+
+This module only depends on the standard library: it is executed by path
+as root, where the proxy_manager package may not be importable. Frozen
+builds and the zipapp have no such path and run it through the hidden
+``--privileged-helper`` option of their own command line instead.
+"""
+import json
+import os
+import re
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+
+# Files proxy-file may write, by target name
+PROXY_FILES = {
+    "environment": "/etc/environment",
+    "apt": "/etc/apt/apt.conf.d/99proxy",
+    "docker": "/etc/systemd/system/docker.service.d/http-proxy.conf",
+}
+
+# Settings the templates are rendered from
+PROXY_KEYS = ("http_proxy", "https_proxy", "ftp_proxy", "no_proxy", "apt_proxy")
+
+SYSTEMCTL_ACTIONS = ("start", "stop", "restart", "is-active", "daemon-reload")
+
+# snapd system options the helper may set or unset
+SNAP_PROXY_KEYS = ("http", "https")
+
+SOCKET_NAME = "helper.sock"
+
+# Longest a systemctl or snap command may take; the client waits a little longer
+COMMAND_TIMEOUT = 60
+
+BLOCK_BEGIN = "# BEGIN Proxy Manager"
+BLOCK_END = "# END Proxy Manager"
+
+# Lines written by versions that replaced the whole file
+LEGACY_ENVIRONMENT_LINE = re.compile(
+    r"^\s*((http|https|ftp|no)_proxy\s*=|# Proxy Settings - (Updated by|Actualizado por) Proxy Manager)",
+    re.IGNORECASE,
+)
+
+# Quotes, backslashes, whitespace and control characters would end the quoted values in the templates
+_UNSAFE_VALUE = re.compile(r'["\\\x00-\x20\x7f]')
+
+
+def proxy_values(settings):
+    """The PROXY_KEYS of settings, as sent to proxy-file"""
+    return {key: settings.get(key) or "" for key in PROXY_KEYS}
+
+
+def check_proxy_values(values):
+    """Return {key: value} for PROXY_KEYS from values; ValueError for anything a template cannot hold"""
+    if not isinstance(values, dict):
+        raise ValueError("Proxy values must be an object")
+    unknown = sorted(set(values) - set(PROXY_KEYS))
+    if unknown:
+        raise ValueError(f"Unknown proxy values: {', '.join(unknown)}")
+    checked = {}
+    for key in PROXY_KEYS:
+        value = values.get(key) or ""
+        if not isinstance(value, str) or _UNSAFE_VALUE.search(value):
+            raise ValueError(f"Invalid value for {key}")
+        checked[key] = value
+    return checked
+
+
+def environment_block(values):
+    """Proxy variables managed in /etc/environment"""
+    names = ("http_proxy", "https_proxy", "ftp_proxy", "no_proxy")
+    lines = [f'{name}="{values[name]}"' for name in names]
+    lines += [f'{name.upper()}="{values[name]}"' for name in names]
+    return "\n".join(lines) + "\n"
+
+
+def apt_config(values):
+    """Content of /etc/apt/apt.conf.d/99proxy"""
+    apt_proxy = values["apt_proxy"]
+    return f"""# Proxy Settings - Updated by Proxy Manager
+Acquire::http::proxy "{apt_proxy}/";
+Acquire::https::proxy "{apt_proxy}/";
+Acquire::ftp::proxy "{apt_proxy}/";
+"""
+
+
+def _systemd_quote(value):
+    """Quote an Environment= assignment; % starts a specifier in unit files"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("%", "%%") + '"'
+
+
+def docker_drop_in(values):
+    """systemd drop-in giving the docker daemon the proxy"""
+    variables = {
+        "HTTP_PROXY": values["http_proxy"],
+        "HTTPS_PROXY": values.get("https_proxy") or values["http_proxy"],
+        "NO_PROXY": values["no_proxy"],
+    }
+    assignments = " ".join(_systemd_quote(f"{name}={value}") for name, value in variables.items())
+    return f"# Proxy Settings - Updated by Proxy Manager\n[Service]\nEnvironment={assignments}\n"
+
+
+def render_block(current, block, whole_file=False, legacy_line=None):
+    """Return file content with Proxy Manager's block in place (None removes it)
+
+    Other lines of a shared file are kept as they are. For whole files,
+    None means the file should not exist.
+    """
+    if whole_file or (current is None and block is None):
+        return block
+
+    kept = []
+    inside = False
+    insert_at = None
+    for line in (current or "").splitlines():
+        stripped = line.strip()
+        if stripped == BLOCK_BEGIN:
+            inside = True
+            if insert_at is None:
+                insert_at = len(kept)
+            continue
+        if inside:
+            if stripped == BLOCK_END:
+                inside = False
+            continue
+        if legacy_line is not None and legacy_line.match(line):
+            continue
+        kept.append(line)
+
+    # Drop blank lines left at the end by removed blocks
+    while kept and not kept[-1].strip():
+        kept.pop()
+    if insert_at is None or insert_at > len(kept):
+        insert_at = len(kept)
+
+    if block is not None:
+        kept[insert_at:insert_at] = [BLOCK_BEGIN, *block.rstrip("\n").splitlines(), BLOCK_END]
+
+    return "\n".join(kept) + "\n" if kept else ""
+
+
+# target: (template, whole file, legacy lines)
+PROXY_TEMPLATES = {
+    "environment": (environment_block, False, LEGACY_ENVIRONMENT_LINE),
+    "apt": (apt_config, True, None),
+    "docker": (docker_drop_in, True, None),
+}
+
+
+def render_proxy_file(target, current, values):
+    """Content of a PROXY_FILES target for checked values (None: proxy removed), or None for no file"""
+    template, whole_file, legacy_line = PROXY_TEMPLATES[target]
+    return render_block(current, None if values is None else template(values), whole_file, legacy_line)
+
+
+def _unit_name(unit):
+    """systemd's own default: a unit without a type suffix is a service"""
+    return unit if "." in unit else f"{unit}.service"
+
+
+def _peer_uid(conn):
+    """Return the uid of the process on the other end of a Unix socket"""
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+
+class PrivilegedHelperServer:
+    """Serves privileged requests for a single owner uid"""
+
+    def __init__(self, socket_path, owner_uid, proxy_files=PROXY_FILES, allowed_units=(),
+                 systemctl="systemctl", parent_pid=None):
+        self.socket_path = socket_path
+        self.owner_uid = owner_uid
+        self.proxy_files = dict(proxy_files)
+        # Units the parent may control, fixed at launch: any same-uid process can reach the socket
+        self.allowed_units = {_unit_name(unit) for unit in allowed_units}
+        self.systemctl = systemctl
+        self.parent_pid = parent_pid
+        self._sock = None
+        self._stopping = threading.Event()
+
+    def bind(self):
+        """Create the listening socket, readable only by the owner"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            self._sock.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        if os.geteuid() == 0:
+            os.chown(self.socket_path, self.owner_uid, -1)
+        self._sock.listen(8)
+        self._sock.settimeout(1.0)
+
+    def serve_forever(self):
+        """Accept connections until shutdown or until the parent process exits"""
+        if self._sock is None:
+            self.bind()
+        try:
+            while not self._stopping.is_set():
+                if self.parent_pid and not self._parent_alive():
+                    break
+                try:
+                    conn, _ = self._sock.accept()
+                except socket.timeout:
+                    continue
+                except OSError:
+                    break
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            self._close()
+
+    def shutdown(self):
+        """Stop serving"""
+        self._stopping.set()
+
+    def _close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+    def _parent_alive(self):
+        try:
+            os.kill(self.parent_pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def _serve_connection(self, conn):
+        with conn:
+            try:
+                uid = _peer_uid(conn)
+            except OSError:
+                return
+            if uid not in (self.owner_uid, 0):
+                return
+
+            stream = conn.makefile("rwb")
+            for line in stream:
+                try:
+                    request = json.loads(line)
+                    response = self.handle(request)
+                except Exception as e:
+                    response = {"ok": False, "stdout": "", "stderr": str(e)}
+                stream.write(json.dumps(response).encode() + b"\n")
+                stream.flush()
+                if self._stopping.is_set():
+                    break
+
+    def handle(self, request):
+        """Dispatch a single request and return its response"""
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "stdout": "pong", "stderr": ""}
+        if op == "proxy-file":
+            return self._proxy_file(request["target"], request["values"])
+        if op == "systemctl":
+            return self._systemctl(request["action"], request["units"])
+        if op == "snap-proxy":
+            return self._snap_proxy(request["values"])
+        if op == "shutdown":
+            self.shutdown()
+            return {"ok": True, "stdout": "", "stderr": ""}
+        return {"ok": False, "stdout": "", "stderr": f"Unknown operation: {op}"}
+
+    def _proxy_file(self, target, values):
+        """Render a proxy file from checked values and write it (or remove it) atomically"""
+        if target not in self.proxy_files:
+            raise PermissionError(f"Unknown proxy file: {target}")
+        path = self.proxy_files[target]
+        if values is not None:
+            values = check_proxy_values(values)
+        try:
+            with open(path) as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        content = render_proxy_file(target, current, values)
+        if content is None:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        elif content != current:
+            self._write_file(path, content)
+        return {"ok": True, "stdout": "", "stderr": ""}
+
+    @staticmethod
+    def _write_file(path, content):
+        """Write a file readable by everyone atomically: temp file, fsync, rename, fsync directory"""
+        import tempfile
+        directory = os.path.dirname(path)
+        # Drop-in directories do not exist until something is put in them
+        os.makedirs(directory, mode=0o755, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".proxy-manager-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+                f.flush()
+                os.fchmod(f.fileno(), 0o644)
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def _systemctl(self, action, units):
+        if action not in SYSTEMCTL_ACTIONS:
+            raise PermissionError(f"systemctl action not allowed: {action}")
+        # daemon-reload is the only action that takes no units
+        if (not units) != (action == "daemon-reload") or any(
+                not isinstance(unit, str) or unit.startswith("-") for unit in units):
+            raise ValueError("Invalid unit list")
+        denied = sorted({_unit_name(unit) for unit in units} - self.allowed_units)
+        if denied:
+            raise PermissionError(f"Units not allowed: {', '.join(denied)}")
+        result = subprocess.run([self.systemctl, action, *units],
+                                capture_output=True, text=True, timeout=COMMAND_TIMEOUT)
+        return {"ok": result.returncode == 0, "stdout": result.stdout, "stderr": result.stderr}
+
+    def _snap_proxy(self, values):
+        """Set the given snapd proxy options and unset those that are None"""
+        if not set(values) <= set(SNAP_PROXY_KEYS):
+            raise PermissionError(f"snap options not allowed: {sorted(set(values) - set(SNAP_PROXY_KEYS))}")
+        assignments = []
+        for key, value in values.items():
+            if value is not None and (not isinstance(value, str) or _UNSAFE_VALUE.search(value)):
+                raise ValueError(f"Invalid value for proxy.{key}")
+            if value:
+                assignments.append(f"proxy.{key}={value}")
+        unset = [f"proxy.{key}" for key, value in values.items() if not value]
+        stdout, stderr = "", ""
+        for command in (["snap", "set", "system", *assignments] if assignments else None,
+                        ["snap", "unset", "system", *unset] if unset else None):
+            if command is None:
+                continue
+            result = subprocess.run(command, capture_output=True, text=True, timeout=COMMAND_TIMEOUT)
+            stdout += result.stdout
+            stderr += result.stderr
+            if result.returncode != 0:
+                return {"ok": False, "stdout": stdout, "stderr": stderr}
+        return {"ok": True, "stdout": stdout, "stderr": stderr}
+
+
+class PrivilegedHelperClient:
+    """Starts the privileged helper once and talks to it over its socket"""
+
+    def __init__(self, timeout=COMMAND_TIMEOUT + 30):
+        self.timeout = timeout
+        self.process = None
+        self.socket_path = None
+        self.runtime_dir = None
+        self._sock = None
+        self._stream = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def helper_command():
+        """Command that runs the helper from this installation, or None"""
+        if getattr(sys, "frozen", False):
+            return [sys.executable, "--privileged-helper"]
+        # Modules imported from a zipapp have a zipimporter loader
+        archive = getattr(__loader__, "archive", None)
+        if archive:
+            return [sys.executable, "-I", archive, "--privileged-helper"]
+        if os.path.isfile(os.path.abspath(__file__)):
+            return [sys.executable, "-I", os.path.abspath(__file__)]
+        return None
+
+    @staticmethod
+    def is_supported():
+        return hasattr(socket, "SO_PEERCRED") and PrivilegedHelperClient.helper_command() is not None
+
+    def is_running(self):
+        return self._stream is not None and (self.process is None or self.process.poll() is None)
+
+    def start(self, password, units=(), startup_timeout=10):
+        """Launch the helper with sudo, allowed to control units; return (success, error)"""
+        if self.is_running():
+            return True, ""
+        if not password:
+            return False, "Empty password"
+        if not self.is_supported():
+            return False, "Privileged helper not supported in this build"
+        if not shutil.which("sudo"):
+            return False, "sudo not found"
+
+        import tempfile
+        self.runtime_dir = runtime_dir = tempfile.mkdtemp(prefix="proxy-manager-")
+        socket_path = os.path.join(runtime_dir, SOCKET_NAME)
+        cmd = [
+            "sudo", "-S", "-p", "", *self.helper_command(),
+            "--socket", socket_path,
+            "--owner", str(os.getuid()),
+            "--parent", str(os.getpid()),
+        ]
+        for unit in units:
+            cmd += ["--unit", unit]
+        try:
+            process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE, text=True)
+            process.stdin.write(password + "\n")
+            process.stdin.close()
+        except OSError as e:
+            self._remove_runtime_dir()
+            return False, str(e)
+
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                self._remove_runtime_dir()
+                return False, process.stderr.read()
+            if os.path.exists(socket_path) and self.connect(socket_path):
+                self.process = process
+                return True, ""
+            time.sleep(0.02)
+
+        process.kill()
+        process.wait()
+        self._remove_runtime_dir()
+        return False, "Timed out waiting for privileged helper"
+
+    def connect(self, socket_path):
+        """Connect to an already running helper; return True on success"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(socket_path)
+        except OSError:
+            sock.close()
+            return False
+        self.socket_path = socket_path
+        self._sock = sock
+        self._stream = sock.makefile("rwb")
+        ok, _, _ = self.request("ping")
+        return ok
+
+    def request(self, op, **params):
+        """Send one request; return (success, stdout, stderr)"""
+        if self._stream is None:
+            return False, "", "Privileged helper not running"
+        params["op"] = op
+        with self._lock:
+            try:
+                self._stream.write(json.dumps(params).encode() + b"\n")
+                self._stream.flush()
+                line = self._stream.readline()
+            except OSError as e:
+                self._disconnect()
+                return False, "", str(e)
+        if not line:
+            self._disconnect()
+            return False, "", "Privileged helper closed the connection"
+        response = json.loads(line)
+        return response.get("ok", False), response.get("stdout", ""), response.get("stderr", "")
+
+    def proxy_file(self, target, values):
+        return self.request("proxy-file", target=target, values=values)
+
+    def systemctl(self, action, units):
+        return self.request("systemctl", action=action, units=list(units))
+
+    def snap_proxy(self, values):
+        return self.request("snap-proxy", values=dict(values))
+
+    def stop(self):
+        """Ask the helper to exit and release the connection"""
+        if self._stream is not None:
+            self.request("shutdown")
+        self._disconnect()
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+            self.process = None
+        self._remove_runtime_dir()
+
+    def _remove_runtime_dir(self):
+        if self.runtime_dir is not None:
+            shutil.rmtree(self.runtime_dir, ignore_errors=True)
+            self.runtime_dir = None
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._stream = None
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Proxy Manager privileged helper")
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--owner", type=int, required=True)
+    parser.add_argument("--parent", type=int)
+    parser.add_argument("--unit", action="append", default=[], help="systemd unit the parent may control")
+    args = parser.parse_args(argv)
+
+    server = PrivilegedHelperServer(args.socket, args.owner, allowed_units=args.unit, parent_pid=args.parent)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Parallel health and latency prober for the configured upstream proxies
+
+Every distinct upstream named by the proxy entries (http/https/ftp/apt) and
+by ``fallback_proxies`` is probed at the same time, so a full check takes
+as long as the slowest proxy rather than the sum. Each sample measures:
+
+- TCP connect time to the proxy;
+- time from sending ``GET <probe_url>`` to the response head, whatever
+  the status (a 407 still proves the proxy is alive);
+- CONNECT setup time on a second connection, up to the tunnel response.
+
+Samples for one proxy run one after another so they do not compete with
+each other; results carry percentiles over all successful samples.
+"""
+import asyncio
+import statistics
+import time
+
+from proxy_manager.utils.http_wire import HTTPWireError, build_head, parse_head, read_head
+from proxy_manager.utils.proxy_url import basic_proxy_authorization, split_credentials, split_host_port
+
+
+PROXY_KEYS = ("http_proxy", "https_proxy", "ftp_proxy", "apt_proxy")
+DEFAULT_PROBE_URL = "http://www.google.com/"
+DEFAULT_CONNECT_AUTHORITY = "www.google.com:443"
+DEFAULT_SAMPLES = 3
+PROBE_TIMEOUT = 10
+
+
+def _percentiles(samples):
+    """p50/p90/max/mean in milliseconds (nearest rank) of a list of seconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def rank(pct):
+        return ordered[max(0, min(len(ordered) - 1, -(-pct * len(ordered) // 100) - 1))]
+
+    return {
+        "p50_ms": round(rank(50) * 1000, 2),
+        "p90_ms": round(rank(90) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+    }
+
+
+class ProbeTarget:
+    """One upstream proxy and the setting names that point at it"""
+
+    def __init__(self, host, port, names=(), proxy_authorization=None):
+        self.host = host
+        self.port = port
+        self.names = list(names)
+        self.proxy_authorization = proxy_authorization
+
+    @property
+    def address(self):
+        host = f"[{self.host}]" if ":" in self.host else self.host
+        return f"{host}:{self.port}"
+
+    def __repr__(self):
+        return f"ProbeTarget({self.address}, names={self.names})"
+
+
+def collect_targets(settings, credentials=None, keys=PROXY_KEYS):
+    """Distinct upstreams from the proxy entries and fallback_proxies, in order
+
+    Saved credentials (username and password) are used for every target;
+    otherwise the ones embedded in each URL, if any.
+    """
+    username = (credentials or {}).get("username")
+    password = (credentials or {}).get("password")
+    urls = [(key, settings.get(key)) for key in keys]
+    urls += [(f"fallback_proxies[{index}]", url) for index, url in enumerate(settings.get("fallback_proxies") or ())]
+
+    targets = {}
+    for name, url in urls:
+        if not url:
+            continue
+        host, port = split_host_port(url)
+        if not host:
+            continue
+        target = targets.get((host, port))
+        if target is None:
+            user, secret = (username, password) if username and password else split_credentials(url)
+            authorization = basic_proxy_authorization(user, secret) if user and secret else None
+            target = targets[(host, port)] = ProbeTarget(host, port, proxy_authorization=authorization)
+        target.names.append(name)
+    return list(targets.values())
+
+
+class ProxyProber:
+    """Probes a list of ProbeTargets concurrently"""
+
+    def __init__(self, targets, samples=DEFAULT_SAMPLES, timeout=PROBE_TIMEOUT,
+                 probe_url=DEFAULT_PROBE_URL, connect_authority=DEFAULT_CONNECT_AUTHORITY):
+        self.targets = list(targets)
+        self.samples = max(1, samples)
+        self.timeout = timeout
+        self.probe_url = probe_url
+        self.connect_authority = connect_authority
+
+    def run(self):
+        """Probe every target from synchronous code; return the list of results"""
+        return asyncio.run(self.probe_all())
+
+    async def probe_all(self):
+        return await asyncio.gather(*(self.probe(target) for target in self.targets))
+
+    async def probe(self, target):
+        """Run all samples against one target and summarize them"""
+        connects, responses, tunnels = [], [], []
+        statuses, errors = [], []
+        for _ in range(self.samples):
+            try:
+                connect, response, status = await asyncio.wait_for(self._request(target), self.timeout)
+                connects.append(connect)
+                responses.append(response)
+                statuses.append(status)
+                tunnel, tunnel_status = await asyncio.wait_for(self._tunnel(target), self.timeout)
+                if 200 <= tunnel_status < 300:
+                    tunnels.append(tunnel)
+                else:
+                    errors.append(f"CONNECT answered {tunnel_status}")
+            except asyncio.TimeoutError:
+                errors.append(f"no answer within {self.timeout} s")
+            except (OSError, HTTPWireError, ValueError, IndexError) as e:
+                errors.append(str(e) or type(e).__name__)
+
+        status = statuses[-1] if statuses else None
+        return {
+            "proxy": target.address,
+            "names": target.names,
+            "reachable": bool(statuses),
+            "ok": status is not None and 200 <= status < 400 and bool(tunnels),
+            "auth_required": 407 in statuses,
+            "status": status,
+            "samples": self.samples,
+            "failures": self.samples - len(tunnels),
+            "error": errors[-1] if errors else None,
+            "tcp_connect": _percentiles(connects),
+            "first_response": _percentiles(responses),
+            "tunnel_setup": _percentiles(tunnels),
+        }
+
+    def _headers(self, target, host):
+        headers = [("Host", host), ("User-Agent", "proxy-manager-probe"), ("Connection", "close")]
+        if target.proxy_authorization:
+            headers.append(("Proxy-Authorization", target.proxy_authorization))
+        return headers
+
+    async def _exchange(self, target, start_line, host):
+        """Connect, send one request head; return (connect s, response s, status)"""
+        start = time.perf_counter()
+        reader, writer = await asyncio.open_connection(target.host, target.port)
+        connected = time.perf_counter()
+        try:
+            writer.write(build_head(start_line, self._headers(target, host)))
+            await writer.drain()
+            head = await read_head(reader)
+            if head is None:
+                raise HTTPWireError("Proxy closed the connection without answering")
+            answered = time.perf_counter()
+            status_line, _ = parse_head(head)
+            return connected - start, answered - connected, int(status_line.split(" ", 2)[1])
+        finally:
+            writer.close()
+
+    async def _request(self, target):
+        host = self.probe_url.split("://", 1)[-1].split("/", 1)[0]
+        return await self._exchange(target, f"GET {self.probe_url} HTTP/1.1", host)
+
+    async def _tunnel(self, target):
+        """CONNECT setup time, from the start of the TCP connect to the tunnel response"""
+        connect, response, status = await self._exchange(
+            target, f"CONNECT {self.connect_authority} HTTP/1.1", self.connect_authority)
+        return connect + response, status
+
+
+def format_result(result):
+    """One line summary of a probe result"""
+    names = ", ".join(result["names"])
+    if not result["reachable"]:
+        return f"{result['proxy']} ({names}): unreachable - {result['error']}"
+    parts = [f"HTTP {result['status']}"]
+    if result["status"] == 407:
+        parts[0] += " (authentication required)"
+    for key, label in (("tcp_connect", "connect"), ("first_response", "response"), ("tunnel_setup", "CONNECT")):
+        if result[key]:
+            parts.append(f"{label} p50 {result[key]['p50_ms']:.0f} ms")
+    if result["error"]:
+        parts.append(result["error"])
+    return f"{result['proxy']} ({names}): " + ", ".join(parts)
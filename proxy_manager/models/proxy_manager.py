@@ -1,180 +1,418 @@
 """
 Proxy management model for Proxy Manager
 """
+import functools
+import shlex
 import subprocess
-import tempfile
+import sys
+import threading
+import time
 from pathlib import Path
+from proxy_manager.models.command_runner import CommandRunner
+from proxy_manager.models.consumers import ConsumerPipeline, GnomeConsumer, ManagedFileConsumer
+from proxy_manager.models.gsettings_backend import GSettingsBackend, ROOT_SCHEMA
+from proxy_manager.models.managed_files import LEGACY_ENVIRONMENT_LINE, ManagedBlockFile
+from proxy_manager.models.privileged_helper import apt_config, check_proxy_values, environment_block, proxy_values
+from proxy_manager.models.service_control import DEFAULT_USB_SERVICES, ServiceController, normalize_units
+from proxy_manager.models.status_monitor import ACTIVE_MODES, ProxyStatusMonitor
+from proxy_manager.utils.proxy_url import (
+    LOCAL_PROXY_HOST, redact_credentials, replace_host_port, split_host_port, with_credentials,
+)
+from proxy_manager.utils.tracing import traced, tracer
+
+
+def _changes_settings(method):
+    """Decorator: run a ProxyModel method holding its settings lock
+
+    The password, proxy and failover paths run on different threads and
+    all rewrite config.proxy_settings and the consumers.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._settings_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class ProxyModel:
     """Handles proxy operations and system configuration"""
     
-    def __init__(self, config_manager):
+    def __init__(self, config_manager, runner=None):
         self.config = config_manager
         self.proxy_active = False
         self.services_active = True
+        # Every external command goes through the runner; tests can give it a FakeBackend
+        self.runner = runner or CommandRunner()
+        self.gsettings = GSettingsBackend(runner=self.runner)
+        self.status_monitor = ProxyStatusMonitor(self.gsettings)
+        self.services = ServiceController(runner=self.runner)
+        self.environment_file = ManagedBlockFile("/etc/environment", legacy_line=LEGACY_ENVIRONMENT_LINE)
+        self.apt_file = ManagedBlockFile("/etc/apt/apt.conf.d/99proxy", whole_file=True)
+        self._helper = None
+        self._helper_failed_password = None
+        self._helper_lock = threading.Lock()
+        # Re-entrant: enabling the proxy saves the credentials and syncs the consumers under it
+        self._settings_lock = threading.RLock()
+        self._consumers = None
+        self._bypass = None
+        self._failover = None
+        self.pac_file = None
     
+    @traced("check_proxy_status", false_is_failure=False)
     def check_proxy_status(self):
         """Check current proxy status"""
+        if self.status_monitor.running:
+            # Kept current by change notifications: no process spawn needed
+            self.proxy_active = self.status_monitor.is_active
+            return self.proxy_active
+        
         try:
-            result = subprocess.run(['gsettings', 'get', 'org.gnome.system.proxy', 'mode'], 
-                                  capture_output=True, text=True, timeout=5)
-            mode = result.stdout.strip().strip("'")
-            self.proxy_active = (mode == 'manual')
+            mode = self.status_monitor.refresh()
+            self.proxy_active = mode in ACTIVE_MODES
             return self.proxy_active
         except Exception as e:
             print(f"Error checking proxy status: {e}")
             return False
     
+    def start_status_monitor(self, callback=None):
+        """Follow external proxy changes; callback(is_active) runs on the monitor thread"""
+        if callback is not None:
+            self.status_monitor.add_listener(lambda mode: callback(mode in ACTIVE_MODES))
+        if self.status_monitor.start():
+            print(f"Proxy status monitor started ({self.status_monitor.source})")
+        else:
+            print("Proxy status monitor unavailable, status will be read on demand")
+    
+    def check_status(self):
+        """Check proxy and services status concurrently; return (proxy_active, services_active)"""
+        return tuple(self.runner.gather(self.check_proxy_status, self.check_services_status))
+    
+    @property
+    def usb_services(self):
+        """Units stopped to allow USB access, from configuration"""
+        return normalize_units(self.config.proxy_settings.get("usb_services", DEFAULT_USB_SERVICES))
+    
+    @traced("check_services_status", false_is_failure=False)
     def check_services_status(self):
-        """Check status of Kaspersky services"""
+        """Check status of the configured USB-blocking services in one systemctl call"""
         try:
-            services = ["klnagent64", "klnagent64.service"]
-            all_active = True
-            
-            for service in services:
-                try:
-                    result = subprocess.run(['systemctl', 'is-active', service], 
-                                          capture_output=True, text=True, timeout=5)
-                    if result.stdout.strip() != "active":
-                        all_active = False
-                        break
-                except subprocess.TimeoutExpired:
-                    print(f"Timeout checking service {service}")
-                    all_active = False
-                    break
-            
-            self.services_active = all_active
-            return all_active
+            self.services_active = self.services.all_active(self.usb_services)
+            return self.services_active
         except Exception as e:
             print(f"Error checking services: {e}")
             self.services_active = True
             return True
     
-    def _perform_enable_proxy(self, password):
-        """Perform proxy activation"""
-        print("=== ACTIVATING PROXY ===")
+    @property
+    def bypass_matcher(self):
+        """no_proxy rules, compiled once per distinct no_proxy value"""
+        no_proxy = self.config.proxy_settings.get("no_proxy", "")
+        if self._bypass is None or self._bypass[0] != no_proxy:
+            from proxy_manager.utils.bypass import BypassMatcher
+            self._bypass = (no_proxy, BypassMatcher.from_string(no_proxy))
+        return self._bypass[1]
+    
+    def route_for(self, host):
+        """Return None if host bypasses the proxy, else the (host, port) of the upstream used"""
+        if self.bypass_matcher.bypass(host):
+            return None
+        return self.active_upstream()
+    
+    def active_upstream(self):
+        """(host, port) of the upstream in use: http_proxy's, unless failover selected another"""
+        settings = self.config.proxy_settings
+        if settings.get("failover_enabled") and settings.get("active_upstream"):
+            return split_host_port(settings["active_upstream"])
+        return split_host_port(settings["http_proxy"])
+    
+    def probe_proxies(self, settings=None, samples=None):
+        """Probe every configured upstream in parallel; settings default to the saved ones"""
+        from proxy_manager.models.prober import DEFAULT_SAMPLES, ProxyProber, collect_targets
+        targets = collect_targets(settings or self.config.proxy_settings, self.config.credentials)
+        return ProxyProber(targets, samples=samples or DEFAULT_SAMPLES).run()
+    
+    @property
+    def local_proxy_enabled(self):
+        return bool(self.config.proxy_settings.get("local_proxy_enabled", False))
+    
+    @property
+    def injects_credentials(self):
+        """Whether the local proxy adds Proxy-Authorization itself (credentials are saved)"""
+        credentials = self.config.credentials
+        return bool(credentials.get("username") and credentials.get("password"))
+    
+    def effective_proxy_settings(self, base=None):
+        """Proxy settings as clients should use them: via the local proxy when enabled
+        
+        base replaces the saved settings, e.g. to preview new credentials.
+        """
+        settings = dict(self.config.proxy_settings if base is None else base)
+        if self.local_proxy_enabled:
+            port = int(settings["local_proxy_port"])
+            # HTTPS goes through the dedicated CONNECT tunnel listener
+            ports = {"https_proxy": int(settings["local_tunnel_port"])}
+            # With injected auth, credentials stay out of /etc/environment, APT and GNOME
+            keep_credentials = not self.injects_credentials
+            for key in ("http_proxy", "https_proxy", "ftp_proxy", "apt_proxy"):
+                if settings.get(key):
+                    settings[key] = replace_host_port(
+                        settings[key], LOCAL_PROXY_HOST, ports.get(key, port), keep_credentials
+                    )
+        else:
+            # Entries pointing at the primary upstream follow the failover choice
+            primary = split_host_port(settings["http_proxy"])
+            active = self.active_upstream()
+            if active != primary:
+                for key in ("http_proxy", "https_proxy", "ftp_proxy", "apt_proxy"):
+                    if settings.get(key) and split_host_port(settings[key]) == primary:
+                        settings[key] = replace_host_port(settings[key], *active)
+        return settings
+    
+    def start_failover(self, callback=None):
+        """Follow the fastest healthy upstream in the background; callback(address) runs on its thread
         
+        With the local proxy enabled, the proxy process does this itself.
+        """
+        settings = self.config.proxy_settings
+        if not settings.get("failover_enabled") or self.local_proxy_enabled:
+            return False
+        from proxy_manager.models.failover import DEFAULT_FAILOVER_INTERVAL, FailoverMonitor
+        
+        def on_switch(target):
+            self.apply_upstream(target.address)
+            if callback is not None:
+                callback(target.address)
+        
+        host, port = self.active_upstream()
+        active = f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+        self._failover = FailoverMonitor(
+            lambda: (self.config.proxy_settings, self.config.credentials), on_switch,
+            interval=int(settings.get("failover_interval", DEFAULT_FAILOVER_INTERVAL)), active=active,
+        )
+        self._failover.start()
+        print(f"Upstream failover started (active {active})")
+        return True
+    
+    @_changes_settings
+    def apply_upstream(self, address):
+        """Make address the active upstream and re-point whatever can be updated without a password"""
+        primary_host, primary_port = split_host_port(self.config.proxy_settings["http_proxy"])
+        is_primary = split_host_port(address) == (primary_host, primary_port)
+        self.config.proxy_settings["active_upstream"] = "" if is_primary else address
+        self.config.save_config(self.config.proxy_settings)
+        if not self.check_proxy_status():
+            return
+        
+        if self.pac_enabled:
+            self.write_pac_file()
+        success, error = self.gsettings.apply(self.build_gnome_profile())
+        if not success:
+            print(f"Error switching system proxy to {address}: {error}")
+        # Root-owned files need the privileged helper of an earlier operation in this session
+        if self.helper.is_running():
+            self.sync_consumers(None, enabled=True, only=self._non_gnome_consumers())
+        else:
+            print("/etc/environment, APT and the tool consumers keep the previous upstream until the proxy is enabled again")
+    
+    @property
+    def pac_enabled(self):
+        return bool(self.config.proxy_settings.get("pac_enabled", False))
+    
+    @property
+    def pac_url(self):
+        return f"http://{LOCAL_PROXY_HOST}:{int(self.config.proxy_settings['pac_port'])}/proxy.pac"
+    
+    def build_pac(self):
+        """proxy.pac content for the current settings"""
+        from proxy_manager.models.pac import generate_pac
+        return generate_pac(self.effective_proxy_settings())
+    
+    def write_pac_file(self):
+        """Write the PAC file served to GNOME if its content changed; return True if written"""
+        from proxy_manager.models.pac import default_pac_file
+        if self.pac_file is None:
+            self.pac_file = default_pac_file()
+        content = self.build_pac()
         try:
-            # 1. Configure system proxy (GNOME)
-            print("1. Configuring system proxy...")
-            proxy_url = self.config.proxy_settings["http_proxy"]
-            
-            if '@' in proxy_url:
-                proxy_host_port = proxy_url.split('@')[-1]
-            else:
-                proxy_host_port = proxy_url.split('://')[-1]
-            
-            if ':' in proxy_host_port:
-                proxy_host = proxy_host_port.split(':')[0]
-                proxy_port = proxy_host_port.split(':')[1].split('/')[0]
-            else:
-                proxy_host = proxy_host_port
-                proxy_port = "3128"
-            
-            print(f"Host: {proxy_host}, Port: {proxy_port}")
-            
-            result = subprocess.run([
-                'gsettings', 'set', 'org.gnome.system.proxy', 'mode', 'manual'
-            ], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode != 0:
-                print(f"Error setting manual mode: {result.stderr}")
-                return False
-            
-            result = subprocess.run([
-                'gsettings', 'set', 'org.gnome.system.proxy.http', 'host', proxy_host
-            ], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode != 0:
-                print(f"Error setting HTTP host: {result.stderr}")
-                return False
-            
-            result = subprocess.run([
-                'gsettings', 'set', 'org.gnome.system.proxy.http', 'port', proxy_port
-            ], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode != 0:
-                print(f"Error setting HTTP port: {result.stderr}")
-                return False
-            
-            result = subprocess.run([
-                'gsettings', 'set', 'org.gnome.system.proxy.http', 'enabled', 'true'
-            ], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode != 0:
-                print(f"Error enabling HTTP proxy: {result.stderr}")
-                return False
-            
-            print("✓ System proxy configured")
-            
-            # Configure no_proxy
-            print("2. Configuring no_proxy...")
-            no_proxy_list = [item.strip() for item in self.config.proxy_settings["no_proxy"].split(',') if item.strip()]
-            no_proxy_str = str(no_proxy_list).replace("'", '"')
-            
-            result = subprocess.run([
-                'gsettings', 'set', 'org.gnome.system.proxy', 'ignore-hosts', no_proxy_str
-            ], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode != 0:
-                print(f"Error configuring no_proxy: {result.stderr}")
+            if self.pac_file.read_text() == content:
                 return False
-            
-            print("✓ No_proxy configured")
-            
-            # 2. Set environment variables in /etc/environment
-            print("3. Configuring environment variables...")
-            env_content = f"""
-# Proxy Settings - Updated by Proxy Manager
-\thttp_proxy="{self.config.proxy_settings['http_proxy']}"
-\thttps_proxy="{self.config.proxy_settings['https_proxy']}"
-\tftp_proxy="{self.config.proxy_settings['ftp_proxy']}"
-\tno_proxy="{self.config.proxy_settings['no_proxy']}"
-\tHTTP_PROXY="{self.config.proxy_settings['http_proxy']}"
-\tHTTPS_PROXY="{self.config.proxy_settings['https_proxy']}"
-\tFTP_PROXY="{self.config.proxy_settings['ftp_proxy']}"
-\tNO_PROXY="{self.config.proxy_settings['no_proxy']}"
-"""
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.env') as temp_file:
-                temp_file.write(env_content)
-                temp_file_path = temp_file.name
-            
-            print(f"Temporary file created: {temp_file_path}")
-            
-            # Move the temporary file to avoid redirection issues
-            success, stdout, stderr = self.run_command_with_sudo(
-                f"mv {temp_file_path} /etc/environment && chmod 644 /etc/environment",
-                password
+        except FileNotFoundError:
+            pass
+        staged = self.pac_file.with_name(self.pac_file.name + ".tmp")
+        staged.write_text(content)
+        staged.replace(self.pac_file)
+        return True
+    
+    @traced("ensure_local_services")
+    def ensure_local_services(self, timeout=3.0):
+        """Start the enabled local listeners (proxy and tunnel, PAC) unless they already listen"""
+        from proxy_manager.models.local_proxy import is_listening
+        
+        settings = self.config.proxy_settings
+        wanted = {}
+        if self.local_proxy_enabled:
+            wanted["proxy"] = [int(settings["local_proxy_port"]), int(settings["local_tunnel_port"])]
+        if self.pac_enabled:
+            wanted["pac"] = [int(settings["pac_port"])]
+        missing = [name for name, ports in wanted.items()
+                   if not all(is_listening(LOCAL_PROXY_HOST, port) for port in ports)]
+        if not missing:
+            return True
+        
+        args = ["serve", "--port", str(settings["local_proxy_port"]), "--tunnel-port",
+                str(settings["local_tunnel_port"]), "--pac-port", str(settings["pac_port"])]
+        if len(missing) == 1:
+            # Another serve process already runs the other listeners
+            args += ["--only", missing[0]]
+        package_root = Path(__file__).resolve().parents[2]
+        if getattr(sys, "frozen", False):
+            command = [sys.executable, *args]
+        elif package_root.is_file():
+            # Running from the zipapp: the archive itself is the program
+            command = [sys.executable, str(package_root), *args]
+            package_root = package_root.parent
+        else:
+            command = [sys.executable, "-m", "proxy_manager", *args]
+        log_path = Path.home() / ".proxy_manager_local_proxy.log"
+        print(f"Starting local services: {', '.join(missing)} (log: {log_path})")
+        # The new process reads the configuration from disk
+        self.config.flush()
+        with open(log_path, "ab") as log:
+            # A new session keeps the listeners running after the GUI or CLI exits
+            subprocess.Popen(
+                command, cwd=str(package_root), stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                start_new_session=True,
             )
-            
-            if success:
-                print("✓ Environment variables updated")
+        
+        ports = [port for name in missing for port in wanted[name]]
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if all(is_listening(LOCAL_PROXY_HOST, port) for port in ports):
+                return True
+            time.sleep(0.05)
+        return False
+    
+    def build_gnome_profile(self, settings=None):
+        """Build the complete GNOME proxy profile from effective settings (default: the current ones)"""
+        settings = settings or self.effective_proxy_settings()
+        profile = {}
+        for scheme, key in (("http", "http_proxy"), ("https", "https_proxy"), ("ftp", "ftp_proxy")):
+            host, port = split_host_port(settings.get(key) or settings["http_proxy"])
+            profile[f"{ROOT_SCHEMA}.{scheme}"] = {"host": host, "port": port}
+        profile[f"{ROOT_SCHEMA}.http"]["enabled"] = True
+        
+        # The upstream is an HTTP proxy, so make sure no stale SOCKS host is used
+        profile[f"{ROOT_SCHEMA}.socks"] = {"host": "", "port": 0}
+        
+        no_proxy_list = [item.strip() for item in settings["no_proxy"].split(',') if item.strip()]
+        profile[ROOT_SCHEMA] = {
+            "mode": "manual",
+            "use-same-proxy": False,
+            "ignore-hosts": no_proxy_list,
+        }
+        if self.pac_enabled:
+            # The static hosts stay configured for tools that ignore the PAC file
+            profile[ROOT_SCHEMA]["mode"] = "auto"
+            profile[ROOT_SCHEMA]["autoconfig-url"] = self.pac_url
+        return profile
+    
+    @staticmethod
+    def _step(progress, step, total, message):
+        """Log an operation step, forward it to the optional progress callback and time it"""
+        print(f"{step}. {message}")
+        if progress is not None:
+            progress(step, total, message)
+        return tracer.span(f"{step}. {message.rstrip('.')}")
+    
+    def environment_block(self, settings=None):
+        """Proxy variables managed in /etc/environment"""
+        return environment_block(proxy_values(settings or self.effective_proxy_settings()))
+    
+    def apt_config(self, settings=None):
+        """Content of /etc/apt/apt.conf.d/99proxy"""
+        return apt_config(proxy_values(settings or self.effective_proxy_settings()))
+    
+    @property
+    @_changes_settings
+    def consumers(self):
+        """Pipeline of everything holding the proxy settings, built on first use"""
+        if self._consumers is None:
+            self._consumers = ConsumerPipeline(self.runner)
+            self._consumers.register(GnomeConsumer(self))
+            self._consumers.register(
+                ManagedFileConsumer("environment", self.environment_file, self.environment_block, self)
+            )
+            self._consumers.register(ManagedFileConsumer("apt", self.apt_file, self.apt_config, self))
+            from proxy_manager.models.tool_consumers import TOOL_CONSUMERS
+            for name in self.config.proxy_settings.get("tool_consumers", []):
+                if name not in TOOL_CONSUMERS:
+                    print(f"Warning: unknown tool consumer {name!r} in tool_consumers")
+                    continue
+                consumer = TOOL_CONSUMERS[name](self)
+                if consumer.available():
+                    self._consumers.register(consumer)
+        return self._consumers
+    
+    def settings_with_credentials(self, username, password):
+        """Copy of the saved proxy settings with username and password in every proxy URL"""
+        settings = dict(self.config.proxy_settings)
+        for key in ('http_proxy', 'https_proxy', 'ftp_proxy', 'apt_proxy'):
+            if settings.get(key):
+                settings[key] = with_credentials(settings[key], username, password)
+        return settings
+    
+    def plan_consumers(self, enabled=True, settings=None):
+        """Which consumers differ from settings (default: the saved ones), without writing anything"""
+        return self.consumers.plan(self.effective_proxy_settings(settings), enabled)
+    
+    @_changes_settings
+    def sync_consumers(self, password, enabled=True, only=None, force=False):
+        """Write every consumer that is out of date with the saved settings; return one entry per consumer"""
+        entries = self.consumers.apply(self.effective_proxy_settings(), enabled, password, only=only, force=force)
+        for entry in entries:
+            if not entry["changed"]:
+                print(f"✓ {entry['target']} already up to date, skipping write")
+            elif entry["success"]:
+                print(f"✓ {entry['target']} updated")
             else:
-                print(f"Warning: Could not update /etc/environment: {stderr}")
+                print(f"Warning: Could not update {entry['target']}: {entry['error']}")
+        return entries
+    
+    def _non_gnome_consumers(self):
+        return [consumer.name for consumer in self.consumers.consumers if consumer.name != "gnome"]
+    
+    @traced("enable_proxy", operation=True)
+    @_changes_settings
+    def _perform_enable_proxy(self, password, progress=None):
+        """Perform proxy activation"""
+        print("=== ACTIVATING PROXY ===")
+        
+        try:
+            if self.pac_enabled and self.write_pac_file():
+                print(f"✓ {self.pac_file} updated")
             
-            # 3. Configure proxy for apt
-            print("4. Configuring proxy for APT...")
-            apt_config = f"""
-# Proxy Settings - Updated by Proxy Manager
-Acquire::http::proxy "{self.config.proxy_settings['apt_proxy']}/";
-Acquire::https::proxy "{self.config.proxy_settings['apt_proxy']}/";
-Acquire::ftp::proxy "{self.config.proxy_settings['apt_proxy']}/";
-"""
+            # Never point the desktop at a local port nobody listens on
+            if (self.local_proxy_enabled or self.pac_enabled) and not self.ensure_local_services():
+                print("❌ Error: Local proxy services did not start")
+                return False
             
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.apt') as temp_file:
-                temp_file.write(apt_config)
-                temp_file_path = temp_file.name
+            # 1. Configure system proxy (GNOME), mode last; always written, as a repair
+            with self._step(progress, 1, 2, "Configuring system proxy...") as step:
+                proxy_host, proxy_port = split_host_port(self.effective_proxy_settings()["http_proxy"])
+                print(f"Host: {proxy_host}, Port: {proxy_port}")
+                
+                gnome, = self.consumers.apply(self.effective_proxy_settings(), True, password,
+                                              only=["gnome"], force=True)
+                if not gnome["success"]:
+                    step.finish(False, error=gnome["error"])
+                    print(f"Error configuring system proxy: {gnome['error']}")
+                    return False
             
-            success, stdout, stderr = self.run_command_with_sudo(
-                f"mv {temp_file_path} /etc/apt/apt.conf.d/99proxy && chmod 644 /etc/apt/apt.conf.d/99proxy",
-                password
-            )
+            print("✓ System proxy and no_proxy configured")
             
-            if success:
-                print("✓ APT proxy configured")
-            else:
-                print(f"Warning: Could not configure APT proxy: {stderr}")
+            # 2. /etc/environment, APT and the developer tools, in parallel and only where out of date
+            with self._step(progress, 2, 2, "Configuring environment, APT and tools..."):
+                self.sync_consumers(password, enabled=True, only=self._non_gnome_consumers())
             
             print("=== PROXY ACTIVATED SUCCESSFULLY ===")
             return True
@@ -191,67 +429,27 @@ Acquire::ftp::proxy "{self.config.proxy_settings['apt_proxy']}/";
             traceback.print_exc()
             return False
     
-    def _perform_disable_proxy(self, password):
+    @traced("disable_proxy", operation=True)
+    @_changes_settings
+    def _perform_disable_proxy(self, password, progress=None):
         """Perform proxy deactivation"""
         print("=== DEACTIVATING PROXY ===")
         
         try:
             # 1. Disable system proxy (GNOME)
-            print("1. Disabling system proxy...")
-            result = subprocess.run([
-                'gsettings', 'set', 'org.gnome.system.proxy', 'mode', 'none'
-            ], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode != 0:
-                print(f"Error disabling system proxy: {result.stderr}")
-                return False
+            with self._step(progress, 1, 2, "Disabling system proxy...") as step:
+                gnome, = self.consumers.apply(self.effective_proxy_settings(), False, password,
+                                              only=["gnome"], force=True)
+                if not gnome["success"]:
+                    step.finish(False, error=gnome["error"])
+                    print(f"Error disabling system proxy: {gnome['error']}")
+                    return False
             
             print("✓ System proxy disabled")
             
-            # 2. Clear system environment variables (for this session only)
-            print("2. Clearing environment variables...")
-            env_commands = [
-                'unset http_proxy',
-                'unset https_proxy', 
-                'unset ftp_proxy',
-                'unset no_proxy',
-                'unset HTTP_PROXY',
-                'unset HTTPS_PROXY',
-                'unset FTP_PROXY',
-                'unset NO_PROXY'
-            ]
-            
-            for cmd in env_commands:
-                try:
-                    subprocess.run(cmd, shell=True, executable='/bin/bash', timeout=5)
-                except Exception as e:
-                    print(f"Warning clearing {cmd.split()[1]}: {e}")
-            
-            print("✓ Environment variables cleared")
-            
-            # 3. Clear apt proxy
-            print("3. Clearing APT proxy...")
-            apt_proxy_file = "/etc/apt/apt.conf.d/99proxy"
-            if Path(apt_proxy_file).exists():
-                print(f"Removing APT config file: {apt_proxy_file}")
-                success, stdout, stderr = self.run_command_with_sudo(f"rm -f {apt_proxy_file}", password)
-                if success:
-                    print("✓ APT proxy cleared")
-                else:
-                    print(f"Warning: Could not remove {apt_proxy_file}: {stderr}")
-            else:
-                print("✓ No APT proxy file exists")
-            
-            # 4. Clear /etc/environment
-            print("4. Clearing /etc/environment...")
-            success, stdout, stderr = self.run_command_with_sudo(
-                "sed -i '/proxy/d;/PROXY/d' /etc/environment",
-                password
-            )
-            if success:
-                print("✓ /etc/environment cleared")
-            else:
-                print(f"Warning: Could not clear /etc/environment: {stderr}")
+            # 2. Remove the proxy from /etc/environment (keeping unrelated lines), APT and the tools
+            with self._step(progress, 2, 2, "Clearing environment, APT and tools..."):
+                self.sync_consumers(password, enabled=False, only=self._non_gnome_consumers())
             
             print("=== PROXY DEACTIVATED SUCCESSFULLY ===")
             return True
@@ -268,82 +466,176 @@ Acquire::ftp::proxy "{self.config.proxy_settings['apt_proxy']}/";
             traceback.print_exc()
             return False
     
+    @traced("stop_usb_services", operation=True)
     def stop_usb_services(self, password):
         """Stop Kaspersky services for USB access"""
         print("=== STOPPING SERVICES FOR USB ===")
-        
-        services = ["klnagent64.service", "klnagent64"]
-        all_success = True
-        
-        for service in services:
-            print(f"Stopping service: {service}")
-            success, stdout, stderr = self.run_command_with_sudo(f"systemctl stop {service}", password)
-            
-            if success:
-                print(f"✓ Service {service} stopped successfully")
-            else:
-                print(f"❌ Error stopping {service}: {stderr}")
-                all_success = False
-        
-        # Verify actual status after stopping
-        self.check_services_status()
-        
-        return all_success and not self.services_active
+        return self._change_usb_services("stop", password) and not self.services_active
     
+    @traced("start_usb_services", operation=True)
     def start_usb_services(self, password):
         """Start Kaspersky services for USB access"""
         print("=== STARTING SERVICES FOR USB ===")
+        return self._change_usb_services("start", password) and self.services_active
+    
+    def _change_usb_services(self, action, password):
+        """Apply a systemctl action to all USB services at once, then verify"""
+        units = self.usb_services
+        print(f"Services: {', '.join(units)}")
+        success, stdout, stderr = self.services.change(action, units, self.systemctl, password)
         
-        services = ["klnagent64", "klnagent64.service"]
-        all_success = True
-        
-        for service in services:
-            print(f"Starting service: {service}")
-            success, stdout, stderr = self.run_command_with_sudo(f"systemctl start {service}", password)
-            
-            if success:
-                print(f"✓ Service {service} started successfully")
-            else:
-                print(f"❌ Error starting {service}: {stderr}")
-                all_success = False
+        if success:
+            print(f"✓ systemctl {action} succeeded")
+        else:
+            print(f"❌ Error in systemctl {action}: {stderr}")
         
-        # Verify actual status after starting
+        # Verify actual status after the change
         self.check_services_status()
-        
-        return all_success and self.services_active
+        return success
     
     def run_command_with_sudo(self, command, password):
         """Execute command with sudo using password"""
         if not password:
             return False, "", "Empty password"
+        # Labels end up in the trace log and the timings dialog: no proxy passwords there
+        shown = redact_credentials(command)
+        result = self.runner.run(f"sudo -S {command}", shell=True, input=password + "\n", timeout=30,
+                                 label="sudo " + (shown if len(shown) <= 60 else shown[:57] + "..."))
+        return result.ok, result.stdout, redact_credentials(result.message)
+    
+    @property
+    def helper(self):
+        """Privileged helper client, imported on first privileged operation"""
+        if self._helper is None:
+            from proxy_manager.models.privileged_helper import PrivilegedHelperClient
+            self._helper = PrivilegedHelperClient()
+        return self._helper
+    
+    def _ensure_helper(self, password):
+        """Start the privileged helper once per session; return True if it is usable"""
+        # Consumers are written concurrently: only the first of them starts the helper
+        with self._helper_lock:
+            if self.helper.is_running():
+                return True
+            if not password or password == self._helper_failed_password:
+                return False
+            
+            with tracer.span("helper start") as span:
+                # The helper only controls the units this session may need
+                success, error = self.helper.start(password, units=[*self.usb_services, "docker.service"])
+                span.finish(success, error=error)
+            if not success:
+                # Do not pay the startup cost again for the same password: fall back to sudo -S
+                print(f"Privileged helper unavailable, using sudo per command: {error.strip()}")
+                self._helper_failed_password = password
+            return success
+    
+    @staticmethod
+    def _helper_request(op, target, request, *args):
+        """Send one request to the privileged helper inside a span; return (success, stdout, stderr)"""
+        with tracer.span(f"helper {op}", target=target) as span:
+            success, stdout, stderr = request(*args)
+            span.finish(success, error=stderr)
+            return success, stdout, stderr
+    
+    def write_proxy_file(self, target, path, content, values, password):
+        """Bring a privileged helper proxy-file target at path to content; return (success, stdout, stderr)
+
+        The helper renders content itself from values (None when the proxy
+        is disabled); without it content is written, or removed when None,
+        with sudo.
+        """
+        if values is not None:
+            try:
+                values = check_proxy_values(values)
+            except ValueError as e:
+                return False, "", str(e)
+        if self._ensure_helper(password):
+            return self._helper_request("proxy-file", path, self.helper.proxy_file, target, values)
+        if content is None:
+            return self.remove_system_file(path, password)
+        return self.write_system_file(path, content, password)
+    
+    def write_system_file(self, path, content, password, mode=0o644):
+        """Atomically write a root-owned file with sudo; return (success, stdout, stderr)"""
+        import tempfile
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.proxy') as temp_file:
+            temp_file.write(content)
+            temp_file_path = temp_file.name
+        
+        # install(1) sets root ownership and mode, sync(1) flushes, mv(1) renames atomically
+        staged = f"{path}.proxy-manager.tmp"
+        script = (
+            f"mkdir -p {shlex.quote(str(Path(path).parent))}"
+            f" && install -m {mode:o} {shlex.quote(temp_file_path)} {shlex.quote(staged)}"
+            f" && sync {shlex.quote(staged)} && mv -f {shlex.quote(staged)} {shlex.quote(path)}"
+        )
         try:
-            full_cmd = f"sudo -S {command}"
-            result = subprocess.run(
-                full_cmd,
-                shell=True,
-                input=password + "\n",
-                capture_output=True,
-                text=True,
-                timeout=30,
-                executable='/bin/bash'
-            )
-            return result.returncode == 0, result.stdout, result.stderr
-        except Exception as e:
-            return False, "", str(e)
+            return self.run_command_with_sudo(f"sh -c {shlex.quote(script)}", password)
+        finally:
+            Path(temp_file_path).unlink(missing_ok=True)
     
+    def remove_system_file(self, path, password):
+        """Remove a root-owned file with sudo; return (success, stdout, stderr)"""
+        return self.run_command_with_sudo(f"rm -f {shlex.quote(path)}", password)
+    
+    def set_snap_proxy(self, values, password):
+        """Set snapd's proxy.<scheme> options as root, unsetting those that are None; return (success, stdout, stderr)"""
+        if self._ensure_helper(password):
+            return self._helper_request("snap-proxy", "system", self.helper.snap_proxy, values)
+        commands = []
+        assignments = [shlex.quote(f"proxy.{key}={value}") for key, value in values.items() if value]
+        if assignments:
+            commands.append(f"snap set system {' '.join(assignments)}")
+        unset = [f"proxy.{key}" for key, value in values.items() if not value]
+        if unset:
+            commands.append(f"snap unset system {' '.join(unset)}")
+        return self.run_command_with_sudo(f"sh -c {shlex.quote(' && '.join(commands))}", password)
+    
+    def systemctl(self, action, units, password):
+        """Run a systemctl action on units as root; return (success, stdout, stderr)"""
+        if self._ensure_helper(password):
+            return self._helper_request("systemctl", f"{action} {' '.join(units)}",
+                                        self.helper.systemctl, action, units)
+        unit_args = " ".join(shlex.quote(unit) for unit in units)
+        return self.run_command_with_sudo(f"systemctl {action} {unit_args}", password)
+    
+    def shutdown(self):
+        """Release session resources such as the privileged helper"""
+        self.status_monitor.stop()
+        self.runner.shutdown()
+        if self._failover is not None:
+            self._failover.stop()
+        if self._helper is not None:
+            self._helper.stop()
+    
+    @_changes_settings
+    def save_credentials(self, username, password):
+        """Save the proxy username and password without touching the consumers"""
+        self.config.credentials["username"] = username
+        self.config.credentials["password"] = password
+        self.config.save_credentials()
+    
+    @_changes_settings
+    def save_proxy_settings(self, values):
+        """Merge values into the saved proxy settings"""
+        self.config.proxy_settings.update(values)
+        self.config.save_config(self.config.proxy_settings)
+    
+    @_changes_settings
     def update_proxy_settings_with_credentials(self, username, password):
         """Update proxy settings with current credentials"""
         if username and password:
-            for key in ['http_proxy', 'https_proxy', 'ftp_proxy', 'apt_proxy']:
-                if key in self.config.proxy_settings:
-                    current_url = self.config.proxy_settings[key]
-                    if '://' in current_url:
-                        protocol = current_url.split('://')[0]
-                        rest = current_url.split('://')[1]
-                        if '@' in rest:
-                            host_port = rest.split('@')[1]
-                            self.config.proxy_settings[key] = f"{protocol}://{username}:{password}@{host_port}"
-                        else:
-                            self.config.proxy_settings[key] = f"{protocol}://{username}:{password}@{rest}"
-            
-            self.config.save_config(self.config.proxy_settings)
\ No newline at end of file
+            # The local proxy injects the saved credentials, so keep them in sync
+            if self.config.credentials.get("username") != username or self.config.credentials.get("password") != password:
+                self.config.credentials["username"] = username
+                self.config.credentials["password"] = password
+                self.config.save_credentials()
+            
+            self.config.save_config(self.settings_with_credentials(username, password))
+            
+            if self.local_proxy_enabled:
+                from proxy_manager.models.local_proxy import reload_running_proxy
+                self.config.flush()
+                if reload_running_proxy():
+                    print("✓ Local proxy reloaded credentials")
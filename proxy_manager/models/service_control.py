@@ -0,0 +1,77 @@
+"""
+Service control backend for Proxy Manager
+
+Queries and changes any number of systemd units with a single systemctl
+call instead of one process per unit.
+"""
+from proxy_manager.models.command_runner import CommandRunner
+
+
+DEFAULT_USB_SERVICES = ["klnagent64"]
+
+
+def normalize_units(units):
+    """Return unit names with a type suffix, without duplicates, in order
+
+    Accepts a list or a comma separated string, so "klnagent64" and
+    "klnagent64.service" collapse into a single unit.
+    """
+    if isinstance(units, str):
+        units = units.split(',')
+
+    normalized = []
+    for unit in units:
+        unit = unit.strip()
+        if not unit:
+            continue
+        if '.' not in unit:
+            unit = f"{unit}.service"
+        if unit not in normalized:
+            normalized.append(unit)
+    return normalized
+
+
+class ServiceController:
+    """Batch systemd unit status queries and state changes"""
+
+    def __init__(self, timeout=5, runner=None):
+        self.timeout = timeout
+        self.runner = runner or CommandRunner()
+
+    def status(self, units):
+        """Return {unit: state} for all units from one 'systemctl is-active' call
+
+        Answers are cached briefly by the runner, so the checks made during
+        one user action share a single process; change() invalidates them.
+        """
+        units = normalize_units(units)
+        if not units:
+            return {}
+
+        result = self.runner.run(['systemctl', 'is-active', *units], timeout=self.timeout,
+                                 cache=True, status_query=True)
+        if result.error is not None:
+            print(f"Error checking services {', '.join(units)}: {result.error}")
+            return {unit: "unknown" for unit in units}
+
+        # is-active prints one state per unit, in argument order; its exit code is
+        # non-zero as soon as one unit is inactive, so only the output matters
+        states = result.stdout.split()
+        if len(states) != len(units):
+            print(f"Unexpected systemctl output: {result.stdout!r} {result.stderr!r}")
+            return {unit: "unknown" for unit in units}
+        return dict(zip(units, states))
+
+    def all_active(self, units):
+        """True if every unit is active"""
+        return all(state == "active" for state in self.status(units).values())
+
+    def change(self, action, units, privileged_systemctl, password):
+        """Apply a systemctl action to all units in one privileged call"""
+        units = normalize_units(units)
+        if not units:
+            return True, "", ""
+        try:
+            return privileged_systemctl(action, units, password)
+        finally:
+            self.runner.invalidate(['systemctl', 'is-active'])
@@ -0,0 +1,196 @@
+"""
+Event-driven proxy status for Proxy Manager
+
+Instead of forking ``gsettings get`` on every status check, the monitor reads
+the GNOME proxy mode once and then follows change notifications, either from
+GSettings (``changed::mode``) or, without PyGObject, from inotify events on
+the user dconf database. Readers get the cached mode without any I/O.
+"""
+import os
+import select
+import struct
+import threading
+from pathlib import Path
+
+from proxy_manager.models.gsettings_backend import ROOT_SCHEMA
+
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+# dconf rewrites its database a few times per changeset; collapse bursts
+DEBOUNCE_SECONDS = 0.05
+
+# GNOME proxy modes in which the proxy is in use: static hosts or a PAC file
+ACTIVE_MODES = ("manual", "auto")
+
+
+def dconf_user_db():
+    """Path of the user dconf database"""
+    config_home = os.environ.get("XDG_CONFIG_HOME") or str(Path.home() / ".config")
+    return Path(config_home) / "dconf" / "user"
+
+
+class ProxyStatusMonitor:
+    """Caches the GNOME proxy mode and keeps it current from change notifications"""
+
+    def __init__(self, gsettings_backend):
+        self.backend = gsettings_backend
+        self.mode = None
+        self.source = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._loop = None
+        self._wake_fds = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def is_active(self):
+        return self.mode in ACTIVE_MODES
+
+    def add_listener(self, callback):
+        """Register callback(mode), called from the monitor thread on every change"""
+        self._listeners.append(callback)
+
+    def set_mode(self, mode):
+        """Update the cached mode; notify listeners if it changed"""
+        with self._lock:
+            changed = mode != self.mode
+            self.mode = mode
+        if changed:
+            for callback in list(self._listeners):
+                try:
+                    callback(mode)
+                except Exception as e:
+                    print(f"Error in proxy status listener: {e}")
+
+    def refresh(self, fresh=False):
+        """Re-read the mode from GNOME settings; fresh bypasses recently cached reads"""
+        mode = self.backend.get(ROOT_SCHEMA, "mode", fresh=fresh)
+        if mode is not None:
+            self.set_mode(mode)
+        return self.mode
+
+    def start(self):
+        """Read the current mode once and subscribe to changes; return True if subscribed"""
+        if self.running:
+            return True
+        self._stop.clear()
+        self.refresh()
+
+        if self.backend._load_gio():
+            self.source = "gsettings"
+            target = self._run_gio
+        elif dconf_user_db().parent.is_dir() and self._libc() is not None:
+            self.source = "inotify"
+            target = self._run_inotify
+        else:
+            self.source = None
+            return False
+
+        self._thread = threading.Thread(target=target, name="proxy-status-monitor", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop following changes"""
+        self._stop.set()
+        if self._loop is not None:
+            self._loop.quit()
+        if self._wake_fds is not None:
+            os.write(self._wake_fds[1], b"x")
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run_gio(self):
+        Gio, GLib = self.backend._gio
+        context = GLib.MainContext.new()
+        context.push_thread_default()
+        try:
+            settings = Gio.Settings.new(ROOT_SCHEMA)
+            settings.connect("changed::mode", lambda s, key: self.set_mode(s.get_string(key)))
+            # Reading once makes GSettings subscribe to the key in this context
+            self.set_mode(settings.get_string("mode"))
+            self._loop = GLib.MainLoop.new(context, False)
+            if not self._stop.is_set():
+                self._loop.run()
+        except Exception as e:
+            print(f"Error in GSettings status monitor: {e}")
+        finally:
+            self._loop = None
+            context.pop_thread_default()
+
+    @staticmethod
+    def _libc():
+        # ctypes is only needed for the inotify fallback; keep it off the import path
+        import ctypes
+        import ctypes.util
+        name = ctypes.util.find_library("c")
+        if not name:
+            return None
+        libc = ctypes.CDLL(name, use_errno=True)
+        return libc if hasattr(libc, "inotify_init1") else None
+
+    def _run_inotify(self):
+        import ctypes
+        libc = self._libc()
+        db_path = dconf_user_db()
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            print(f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+            return
+
+        self._wake_fds = os.pipe()
+        try:
+            # dconf replaces the database with a rename, so watch the directory
+            mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+            if libc.inotify_add_watch(fd, str(db_path.parent).encode(), mask) < 0:
+                print(f"inotify_add_watch failed: {os.strerror(ctypes.get_errno())}")
+                return
+
+            while not self._stop.is_set():
+                readable, _, _ = select.select([fd, self._wake_fds[0]], [], [])
+                if self._wake_fds[0] in readable:
+                    break
+                if not self._drain_events(fd, db_path.name):
+                    continue
+                # Let the rest of the changeset land, then read the mode once
+                self._stop.wait(DEBOUNCE_SECONDS)
+                self._drain_events(fd, db_path.name)
+                if not self._stop.is_set():
+                    self.refresh(fresh=True)
+        finally:
+            os.close(fd)
+            for pipe_fd in self._wake_fds:
+                os.close(pipe_fd)
+            self._wake_fds = None
+
+    @staticmethod
+    def _drain_events(fd, filename):
+        """Consume pending inotify events; return True if any concerned filename"""
+        relevant = False
+        while True:
+            try:
+                data = os.read(fd, 4096)
+            except BlockingIOError:
+                return relevant
+            offset = 0
+            while offset < len(data):
+                _, _, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + name_len].rstrip(b"\0").decode(errors="replace")
+                offset += name_len
+                if name == filename:
+                    relevant = True
@@ -0,0 +1,364 @@
+"""
+CONNECT tunnel listener for Proxy Manager
+
+A dedicated local endpoint for ``https_proxy``. After the CONNECT handshake
+with the upstream, a tunnel only moves opaque TLS bytes, so it works on raw
+non-blocking sockets instead of asyncio streams: on Linux each direction
+is moved with ``os.splice`` through a pipe and never enters Python memory;
+elsewhere it is copied with ``loop.sock_recv_into`` into one reused buffer
+per direction. Memory use stays flat regardless of throughput.
+
+Hosts matched by the no_proxy rules are tunnelled directly, without the
+upstream.
+"""
+import asyncio
+import os
+import socket
+
+from proxy_manager.utils.http_wire import (
+    MAX_HEAD_SIZE,
+    HTTPWireError,
+    body_framing,
+    build_head,
+    parse_head,
+    request_authority,
+    strip_hop_by_hop,
+)
+from proxy_manager.utils.proxy_url import LOCAL_PROXY_HOST, basic_proxy_authorization
+
+
+DEFAULT_TUNNEL_PORT = 3130
+
+CONNECT_TIMEOUT = 10
+HEAD_TIMEOUT = 30
+BUFFER_SIZE = 256 * 1024
+SPLICE_SUPPORTED = hasattr(os, "splice")
+
+# Ask for pipes large enough to hold a full TCP window burst
+_F_SETPIPE_SZ = 1031
+_PIPE_SIZE = 1024 * 1024
+
+
+async def _wait_fd(loop, fd, writable=False):
+    """Wait until fd is readable (or writable)"""
+    future = loop.create_future()
+    add, remove = (loop.add_writer, loop.remove_writer) if writable else (loop.add_reader, loop.remove_reader)
+
+    def ready():
+        if not future.done():
+            future.set_result(None)
+
+    add(fd, ready)
+    try:
+        await future
+    finally:
+        remove(fd)
+
+
+def _make_pipe():
+    read_fd, write_fd = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+    try:
+        import fcntl
+        fcntl.fcntl(write_fd, _F_SETPIPE_SZ, _PIPE_SIZE)
+    except OSError:
+        # Limited by /proc/sys/fs/pipe-max-size for unprivileged users; the default still works
+        pass
+    return read_fd, write_fd
+
+
+async def splice_pump(loop, source, destination):
+    """Move bytes from source to destination socket through a kernel pipe until EOF"""
+    flags = os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK
+    src_fd, dst_fd = source.fileno(), destination.fileno()
+    read_fd, write_fd = _make_pipe()
+    total = 0
+    try:
+        while True:
+            try:
+                pending = os.splice(src_fd, write_fd, BUFFER_SIZE, flags=flags)
+            except BlockingIOError:
+                await _wait_fd(loop, src_fd)
+                continue
+            if pending == 0:
+                return total
+            total += pending
+            while pending:
+                try:
+                    pending -= os.splice(read_fd, dst_fd, pending, flags=flags)
+                except BlockingIOError:
+                    await _wait_fd(loop, dst_fd, writable=True)
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+async def buffer_pump(loop, source, destination):
+    """Copy bytes from source to destination socket with one reused buffer until EOF"""
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    total = 0
+    while True:
+        received = await loop.sock_recv_into(source, buffer)
+        if not received:
+            return total
+        await loop.sock_sendall(destination, view[:received])
+        total += received
+
+
+async def recv_head(loop, sock, initial=b""):
+    """Read an HTTP head from a raw socket; return (head, bytes read past it)"""
+    data = bytearray(initial)
+    while True:
+        end = data.find(b"\r\n\r\n")
+        if end >= 0:
+            return bytes(data[:end + 4]), bytes(data[end + 4:])
+        if len(data) > MAX_HEAD_SIZE:
+            raise HTTPWireError("Message head too large")
+        chunk = await loop.sock_recv(sock, 16 * 1024)
+        if not chunk:
+            if data.strip():
+                raise HTTPWireError("Connection closed in the middle of a message head")
+            return None, b""
+        data += chunk
+
+
+class TunnelProxy:
+    """Listener that only accepts CONNECT and splices the resulting tunnels"""
+
+    def __init__(self, upstream_host, upstream_port, listen_host=LOCAL_PROXY_HOST,
+                 listen_port=DEFAULT_TUNNEL_PORT, username=None, password=None, use_splice=None,
+                 bypass=None):
+        self.upstream_host = upstream_host
+        self.upstream_port = upstream_port
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.use_splice = SPLICE_SUPPORTED if use_splice is None else use_splice
+        self.proxy_authorization = None
+        self.bypass = bypass
+        self.tunnels = 0
+        self.direct = 0
+        self.active = 0
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self._sock = None
+        self._accept_task = None
+        self._tasks = set()
+        self.set_credentials(username, password)
+
+    def set_credentials(self, username, password):
+        """Inject Basic auth for username/password upstream, or pass client auth through if unset"""
+        if username and password:
+            self.proxy_authorization = basic_proxy_authorization(username, password)
+        else:
+            self.proxy_authorization = None
+
+    def set_upstream(self, host, port):
+        """Open new tunnels through another upstream; open tunnels are left alone"""
+        self.upstream_host = host
+        self.upstream_port = port
+
+    def stats(self):
+        """Counters for diagnostics"""
+        return {
+            "tunnels": self.tunnels,
+            "direct": self.direct,
+            "active": self.active,
+            "bytes_up": self.bytes_up,
+            "bytes_down": self.bytes_down,
+            "splice": self.use_splice,
+        }
+
+    async def start(self):
+        """Bind the listening socket and start accepting tunnels"""
+        sock = socket.socket(socket.AF_INET6 if ":" in self.listen_host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((self.listen_host, self.listen_port))
+            sock.listen(128)
+        except OSError:
+            sock.close()
+            raise
+        sock.setblocking(False)
+        self._sock = sock
+        self.listen_port = sock.getsockname()[1]
+        self._accept_task = asyncio.get_running_loop().create_task(self._accept_loop())
+        print(f"CONNECT tunnel listening on {self.listen_host}:{self.listen_port} "
+              f"({'splice' if self.use_splice else 'buffered'}), "
+              f"upstream {self.upstream_host}:{self.upstream_port}")
+
+    async def serve_forever(self):
+        """Start if needed and serve until cancelled"""
+        if self._sock is None:
+            await self.start()
+        try:
+            await self._accept_task
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Stop accepting and tear down open tunnels"""
+        if self._accept_task is not None:
+            self._accept_task.cancel()
+            self._accept_task = None
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    async def _accept_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            client, _ = await loop.sock_accept(self._sock)
+            task = loop.create_task(self._handle_client(client))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _connect(loop, host, port):
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        error = None
+        for family, type_, proto, _, address in infos:
+            sock = socket.socket(family, type_, proto)
+            sock.setblocking(False)
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, address), CONNECT_TIMEOUT)
+                return sock
+            except (OSError, asyncio.TimeoutError) as e:
+                sock.close()
+                error = e
+        raise error or OSError(f"Cannot resolve {host}")
+
+    async def _handle_client(self, client):
+        loop = asyncio.get_running_loop()
+        client.setblocking(False)
+        upstream = None
+        self.active += 1
+        try:
+            head, rest = await asyncio.wait_for(recv_head(loop, client), HEAD_TIMEOUT)
+            if head is None:
+                return
+            start_line, headers = parse_head(head)
+            method = start_line.split(" ", 1)[0]
+            if method != "CONNECT":
+                await self._send_error(loop, client, 405, "Method Not Allowed", [("Allow", "CONNECT")])
+                return
+
+            _, host, port, _ = request_authority(method, start_line.split(" ", 2)[1])
+            if self.bypass is not None and self.bypass.bypass(host):
+                try:
+                    upstream = await self._connect(loop, host, port)
+                except (OSError, asyncio.TimeoutError) as e:
+                    await self._send_error(loop, client, 502, "Bad Gateway", detail=f"Cannot connect to {host}:{port}: {e}")
+                    return
+                self.direct += 1
+                response_rest = b""
+                await loop.sock_sendall(client, b"HTTP/1.1 200 Connection established\r\n\r\n")
+                if rest:
+                    await loop.sock_sendall(upstream, rest)
+            else:
+                upstream, response_rest = await self._connect_through_upstream(loop, client, start_line, headers, rest)
+                if upstream is None:
+                    return
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            self.tunnels += 1
+            pump = splice_pump if self.use_splice else buffer_pump
+            up, down = await asyncio.gather(
+                self._one_way(pump, loop, client, upstream),
+                self._one_way(pump, loop, upstream, client),
+            )
+            self.bytes_up += len(rest) + up
+            self.bytes_down += len(response_rest) + down
+        except (OSError, HTTPWireError, ValueError, IndexError, asyncio.TimeoutError):
+            pass
+        finally:
+            self.active -= 1
+            client.close()
+            if upstream is not None:
+                upstream.close()
+
+    async def _connect_through_upstream(self, loop, client, start_line, headers, rest):
+        """CONNECT through the upstream; return (socket, bytes past the response head)
+
+        Errors are relayed to the client and return (None, b"").
+        """
+        forward_headers = strip_hop_by_hop(headers)
+        if self.proxy_authorization is not None:
+            forward_headers = [(key, value) for key, value in forward_headers
+                               if key.lower() != "proxy-authorization"]
+            forward_headers.append(("Proxy-Authorization", self.proxy_authorization))
+
+        try:
+            upstream = await self._connect(loop, self.upstream_host, self.upstream_port)
+        except (OSError, asyncio.TimeoutError) as e:
+            await self._send_error(loop, client, 502, "Bad Gateway", detail=f"Upstream proxy unreachable: {e}")
+            return None, b""
+
+        try:
+            await loop.sock_sendall(upstream, build_head(start_line, forward_headers) + rest)
+            response_head, response_rest = await asyncio.wait_for(recv_head(loop, upstream), HEAD_TIMEOUT)
+            if response_head is None:
+                await self._send_error(loop, client, 502, "Bad Gateway", detail="Upstream closed the connection")
+                upstream.close()
+                return None, b""
+            response_line, response_headers = parse_head(response_head)
+            status = int(response_line.split(" ", 2)[1])
+
+            await loop.sock_sendall(client, response_head + response_rest)
+            if 200 <= status < 300:
+                return upstream, response_rest
+
+            # Relay the error body (e.g. a 407 page), then drop the connection
+            framing, length = body_framing(response_headers, "CONNECT", status)
+            if framing == "length":
+                remaining = length - len(response_rest)
+                while remaining > 0:
+                    chunk = await loop.sock_recv(upstream, min(remaining, BUFFER_SIZE))
+                    if not chunk:
+                        break
+                    await loop.sock_sendall(client, chunk)
+                    remaining -= len(chunk)
+            elif framing != "none":
+                await buffer_pump(loop, upstream, client)
+        except BaseException:
+            upstream.close()
+            raise
+        upstream.close()
+        return None, b""
+
+    @staticmethod
+    async def _one_way(pump, loop, source, destination):
+        """Run a pump, then half-close the destination so the peer sees EOF"""
+        try:
+            return await pump(loop, source, destination)
+        except OSError:
+            # A reset on one side ends both directions
+            for sock in (source, destination):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            return 0
+        finally:
+            try:
+                destination.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    @staticmethod
+    async def _send_error(loop, sock, status, reason, headers=(), detail=""):
+        body = f"{status} {reason}\n{detail}\n".encode("utf-8", "replace")
+        head = build_head(f"HTTP/1.1 {status} {reason}", [
+            *headers,
+            ("Content-Type", "text/plain; charset=utf-8"),
+            ("Content-Length", str(len(body))),
+            ("Connection", "close"),
+        ])
+        try:
+            await loop.sock_sendall(sock, head + body)
+        except OSError:
+            pass
@@ -0,0 +1,51 @@
+"""
+GUI bootstrap for Proxy Manager
+
+Only imported by the ``gui`` command, so headless commands never load Tk.
+"""
+import sys
+
+try:
+    import customtkinter as ctk
+except ImportError:
+    print("Error: customtkinter no está instalado. Instala con: pip install customtkinter")
+    raise
+
+from proxy_manager.controllers.main_controller import MainController
+from proxy_manager.ui.main_window import MainWindow
+
+
+def run_gui(config_manager, proxy_model, profile=None):
+    """Build the main window and run the Tk main loop
+
+    The window is drawn before any status check runs; profile, a
+    StartupProfile, records when each stage was reached.
+    """
+    print("=== INICIANDO PROXY MANAGER ===")
+    print(f"Python version: {sys.version}")
+    print(f"CustomTkinter version: {ctk.__version__ if hasattr(ctk, '__version__') else 'desconocida'}")
+
+    # The window binds itself to the controller as soon as its Tk root exists
+    controller = MainController(config_manager, proxy_model)
+    view = MainWindow(controller)
+
+    def status_ready():
+        if profile is not None:
+            profile.mark("status shown")
+            profile.report()
+
+    if profile is not None:
+        profile.mark("window built")
+        view.on_first_paint(lambda: profile.mark("first paint"))
+    # gsettings and systemctl are only queried once the main loop runs
+    view.root.after_idle(controller.load_initial_status, status_ready)
+
+    try:
+        view.run()
+    except Exception as e:
+        print(f"Error fatal en mainloop: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        proxy_model.shutdown()
+    return 0
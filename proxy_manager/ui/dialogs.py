@@ -0,0 +1,247 @@
+"""
+Reusable dialogs for Proxy Manager
+
+Each dialog type is built once, the first time it is needed, and then
+hidden and shown again: showing a message only changes a label's text, so
+a dialog appears in one redraw instead of rebuilding a Toplevel and its
+widgets. Messages arriving while a message dialog is open replace its text
+instead of stacking windows.
+"""
+import customtkinter as ctk
+
+
+class ReusableDialog:
+    """A CTkToplevel built on first use and withdrawn instead of destroyed"""
+
+    title = ""
+    size = (500, 300)
+    # Size used to center the dialog on screen
+    center_size = (300, 150)
+
+    def __init__(self, root):
+        self.root = root
+        self.window = None
+        self.visible = False
+
+    def build(self, frame):
+        """Create the widgets inside frame; called once"""
+        raise NotImplementedError
+
+    def _ensure_built(self):
+        if self.window is not None:
+            return
+        window = ctk.CTkToplevel(self.root)
+        window.withdraw()
+        window.title(self.title)
+        width, height = self.size
+        x = (self.root.winfo_screenwidth() - self.center_size[0]) // 2
+        y = (self.root.winfo_screenheight() - self.center_size[1]) // 2
+        window.geometry(f"{width}x{height}+{x}+{y}")
+        window.transient(self.root)
+        window.protocol("WM_DELETE_WINDOW", self.hide)
+
+        frame = ctk.CTkFrame(window)
+        frame.pack(padx=20, pady=20, fill="both", expand=True)
+        self.window = window
+        self.build(frame)
+
+    def show(self):
+        self._ensure_built()
+        if not self.visible:
+            self.window.deiconify()
+            self.visible = True
+        self.window.lift()
+        self.window.grab_set()
+        self.window.focus_force()
+
+    def hide(self):
+        if self.window is None or not self.visible:
+            return
+        self.window.grab_release()
+        self.window.withdraw()
+        self.visible = False
+
+
+class MessageDialog(ReusableDialog):
+    """A message and an OK button"""
+
+    def __init__(self, root, title, color, size, center_size, font=("Arial", 12), wraplength=0,
+                 justify="center"):
+        super().__init__(root)
+        self.title = title
+        self.color = color
+        self.size = size
+        self.center_size = center_size
+        self.font = font
+        self.wraplength = wraplength
+        self.justify = justify
+        self.label = None
+        self._message = None
+        self._repeats = 0
+
+    def build(self, frame):
+        self.label = ctk.CTkLabel(frame, text="", font=self.font, text_color=self.color,
+                                  wraplength=self.wraplength, justify=self.justify)
+        self.label.pack(pady=20)
+        ctk.CTkButton(frame, text="OK", command=self.hide, fg_color=self.color, width=100).pack(pady=10)
+        self.window.bind("<Return>", lambda event: self.hide())
+
+    def show_message(self, message):
+        self._ensure_built()
+        if self.visible and message == self._message:
+            # The same error again: count it instead of opening another window
+            self._repeats += 1
+            self.label.configure(text=f"{message}\n(x{self._repeats + 1})")
+        else:
+            self._message, self._repeats = message, 0
+            self.label.configure(text=message)
+        self.show()
+
+
+class PasswordDialog(ReusableDialog):
+    """Modal prompt for the administrator password"""
+
+    title = "Contraseña de administrador"
+    size = (500, 300)
+    center_size = (350, 180)
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.entry = None
+        self._answered = None
+        self._result = None
+
+    def build(self, frame):
+        ctk.CTkLabel(frame, text="Introduce tu contraseña de administrador:",
+                     font=("Arial", 12)).pack(pady=10)
+        self.entry = ctk.CTkEntry(frame, show="*", width=300)
+        self.entry.pack(pady=10)
+        self.entry.bind("<Return>", lambda event: self._finish(self.entry.get()))
+
+        btn_frame = ctk.CTkFrame(frame)
+        btn_frame.pack(pady=10)
+        ctk.CTkButton(btn_frame, text="Aceptar", command=lambda: self._finish(self.entry.get()),
+                      fg_color="#2ecc71", width=100).pack(side="left", padx=5)
+        ctk.CTkButton(btn_frame, text="Cancelar", command=self.hide,
+                      fg_color="#e74c3c", width=100).pack(side="left", padx=5)
+        self._answered = ctk.BooleanVar(master=self.window, value=False)
+
+    def _finish(self, value):
+        self._result = value
+        self.hide()
+
+    def hide(self):
+        super().hide()
+        if self._answered is not None:
+            self._answered.set(True)
+
+    def ask(self):
+        """Show the prompt and wait for an answer; return the password or None"""
+        self._ensure_built()
+        self._result = None
+        self.entry.delete(0, "end")
+        self._answered.set(False)
+        self.show()
+        self.entry.focus()
+        self.root.wait_variable(self._answered)
+        return self._result or None
+
+
+class ConfigDialog(ReusableDialog):
+    """Proxy settings form; the controller supplies the save and test actions"""
+
+    title = "Configuración de Proxy"
+    size = (600, 550)
+    center_size = (550, 500)
+
+    fields = [
+        ("HTTP Proxy:", "http_proxy"),
+        ("HTTPS Proxy:", "https_proxy"),
+        ("FTP Proxy:", "ftp_proxy"),
+        ("No Proxy:", "no_proxy"),
+        ("APT Proxy:", "apt_proxy"),
+    ]
+
+    def __init__(self, root, on_save, on_test):
+        super().__init__(root)
+        self.on_save = on_save
+        self.on_test = on_test
+        self.entries = {}
+
+    def build(self, frame):
+        ctk.CTkLabel(frame, text="CONFIGURACIÓN DE PROXY",
+                     font=("Arial", 18, "bold")).pack(pady=10)
+
+        for label_text, key in self.fields:
+            row = ctk.CTkFrame(frame)
+            row.pack(fill="x", pady=5)
+            ctk.CTkLabel(row, text=label_text, width=100).pack(side="left", padx=5)
+            entry = ctk.CTkEntry(row, width=400)
+            entry.pack(side="left", padx=5)
+            self.entries[key] = entry
+
+        btn_frame = ctk.CTkFrame(frame)
+        btn_frame.pack(pady=20)
+        ctk.CTkButton(btn_frame, text="💾 Guardar", command=self._save,
+                      fg_color="#2ecc71", width=120).pack(side="left", padx=10)
+        ctk.CTkButton(btn_frame, text="🔍 Probar Conexion", command=lambda: self.on_test(self.values()),
+                      fg_color="#3498db", width=120).pack(side="left", padx=10)
+        ctk.CTkButton(btn_frame, text="❌ Cancelar", command=self.hide,
+                      fg_color="#e74c3c", width=120).pack(side="left", padx=10)
+
+    def _save(self):
+        values = self.values()
+        self.hide()
+        self.on_save(values)
+
+    def values(self):
+        return {key: entry.get() for key, entry in self.entries.items()}
+
+    def open(self, settings):
+        """Fill the form from settings and show it"""
+        self._ensure_built()
+        for key, entry in self.entries.items():
+            entry.delete(0, "end")
+            entry.insert(0, settings.get(key, ""))
+        self.show()
+
+
+class DialogManager:
+    """Owns the application's dialogs and builds each one on first use"""
+
+    def __init__(self, root):
+        self.root = root
+        self._dialogs = {}
+
+    def _get(self, name, factory):
+        dialog = self._dialogs.get(name)
+        if dialog is None:
+            dialog = self._dialogs[name] = factory()
+        return dialog
+
+    @property
+    def success(self):
+        return self._get("success", lambda: MessageDialog(
+            self.root, "Éxito", "#2ecc71", (500, 300), (300, 150), font=("Arial", 14, "bold")))
+
+    @property
+    def error(self):
+        return self._get("error", lambda: MessageDialog(
+            self.root, "Error", "#e74c3c", (600, 350), (400, 200), wraplength=350))
+
+    @property
+    def timings(self):
+        return self._get("timings", lambda: MessageDialog(
+            self.root, "Tiempos de la última operación", "#3498db", (950, 450), (800, 300),
+            font=("Courier", 11), justify="left"))
+
+    @property
+    def password(self):
+        return self._get("password", lambda: PasswordDialog(self.root))
+
+    def config(self, on_save, on_test):
+        return self._get("config", lambda: ConfigDialog(self.root, on_save, on_test))
+
+    def hide_all(self):
+        for dialog in self._dialogs.values():
+            dialog.hide()
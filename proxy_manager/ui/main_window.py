@@ -2,7 +2,13 @@
 Main window UI for Proxy Manager
 """
 import customtkinter as ctk
-import time
+
+from proxy_manager.ui.dialogs import DialogManager
+
+
+# Shown until the background status checks finish
+STATUS_PENDING = "{}: ⏳ COMPROBANDO..."
+STATUS_PENDING_COLOR = "#95a5a6"
 
 
 class MainWindow:
@@ -20,13 +26,17 @@ class MainWindow:
         self.root.title("Proxy Manager - Ubuntu")
         self.root.geometry("1500x1000")
         self.root.resizable(True, True)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # Dialogs are built on first use and reused afterwards
+        self.dialogs = DialogManager(self.root)
+        # Pick up configuration saved by other processes (e.g. the CLI) when the user comes back
+        self.root.bind("<FocusIn>", self._on_focus_in)
+        self.controller.attach_view(self)
         
-        # Create UI elements
+        # Create UI elements; statuses are filled in by the controller once the window is up
         self.create_widgets()
-        
-        # Initial status checks
-        self.controller.check_proxy_status()
-        self.controller.check_services_status()
+        self._first_paint_callbacks = []
+        self.root.bind("<Expose>", self._on_expose, add="+")
     
     def create_widgets(self):
         """Create the user interface"""
@@ -112,6 +122,7 @@ class MainWindow:
             fg_color="#006400",
             hover_color="#228B22",
             height=60,
+            state="disabled",
             command=self.toggle_proxy
         )
         self.proxy_btn.pack(padx=20, pady=10, fill="x")
@@ -119,9 +130,9 @@ class MainWindow:
         # Current proxy status
         self.proxy_status_label = ctk.CTkLabel(
             main_frame,
-            text="Estado Proxy: ❌ DESACTIVADO", 
+            text=STATUS_PENDING.format("Estado Proxy"),
             font=("Arial", 14, "bold"),
-            text_color="#e74c3c"
+            text_color=STATUS_PENDING_COLOR
         )
         self.proxy_status_label.pack(pady=5)
         
@@ -153,6 +164,7 @@ class MainWindow:
             fg_color="#8B0000",
             hover_color="#A0522D",
             height=65,
+            state="disabled",
             command=self.toggle_usb_services
         )
         self.usb_btn.pack(padx=20, pady=15, fill="x")
@@ -160,15 +172,18 @@ class MainWindow:
         # Current services status
         self.usb_status_label = ctk.CTkLabel(
             usb_frame,
-            text="Estado Servicios: ✅ ACTIVOS", 
+            text=STATUS_PENDING.format("Estado Servicios"),
             font=("Arial", 12, "bold"),
-            text_color="#2ecc71"
+            text_color=STATUS_PENDING_COLOR
         )
         self.usb_status_label.pack(pady=(0, 15))
         
+        tools_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        tools_frame.pack(pady=10)
+        
         # Configuration button
         config_btn = ctk.CTkButton(
-            main_frame,
+            tools_frame,
             text="⚙️ Configurar Proxy",
             font=("Arial", 12),
             fg_color="#95a5a6",
@@ -176,7 +191,19 @@ class MainWindow:
             height=30,
             command=self.open_config_window
         )
-        config_btn.pack(pady=10)
+        config_btn.pack(side="left", padx=5)
+        
+        # Per-step latency of the last operation
+        timings_btn = ctk.CTkButton(
+            tools_frame,
+            text="⏱️ Tiempos",
+            font=("Arial", 12),
+            fg_color="#95a5a6",
+            hover_color="#7f8c8d",
+            height=30,
+            command=self.controller.show_last_timings
+        )
+        timings_btn.pack(side="left", padx=5)
         
         # Sudo permissions indicator
         self.sudo_label = ctk.CTkLabel(
@@ -187,6 +214,31 @@ class MainWindow:
         )
         self.sudo_label.pack(pady=(5, 15))
     
+    def on_first_paint(self, callback):
+        """Call callback() once, when the main window is first drawn"""
+        if self._first_paint_callbacks is None:
+            callback()
+        else:
+            self._first_paint_callbacks.append(callback)
+    
+    def _on_expose(self, event):
+        if event.widget is not self.root or self._first_paint_callbacks is None:
+            return
+        callbacks, self._first_paint_callbacks = self._first_paint_callbacks, None
+        for callback in callbacks:
+            callback()
+    
+    def _on_focus_in(self, event):
+        if event.widget is self.root:
+            self.controller.refresh_config()
+    
+    def update_credentials_display(self, username, password):
+        """Show credentials changed outside the window"""
+        for entry, value in ((self.user_entry, username), (self.pass_entry, password)):
+            if entry.get() != value:
+                entry.delete(0, "end")
+                entry.insert(0, value)
+    
     def toggle_password_visibility(self):
         """Show or hide password"""
         if self.show_pass_var.get():
@@ -199,7 +251,6 @@ class MainWindow:
         username = self.user_entry.get()
         password = self.pass_entry.get()
         self.controller.save_credentials(username, password)
-        self.show_success("✅ Credenciales guardadas correctamente")
     
     def update_all_proxies_password(self):
         """Update password in all system proxies without restart"""
@@ -270,69 +321,33 @@ class MainWindow:
     def show_success(self, message):
         """Show success message"""
         try:
-            dialog = ctk.CTkToplevel(self.root)
-            dialog.title("Éxito")
-            dialog.geometry("500x300")
-            
-            # Center the dialog
-            screen_width = self.root.winfo_screenwidth()
-            screen_height = self.root.winfo_screenheight()
-            x = (screen_width - 300) // 2
-            y = (screen_height - 150) // 2
-            dialog.geometry(f"+{x}+{y}")
-            
-            dialog.update_idletasks()
-            time.sleep(0.1)
-            
-            dialog.transient(self.root)
-            dialog.grab_set()
-            dialog.focus_force()
-            
-            frame = ctk.CTkFrame(dialog)
-            frame.pack(padx=20, pady=20, fill="both", expand=True)
-            
-            ctk.CTkLabel(frame, text=message, font=("Arial", 14, "bold"),
-                        text_color="#2ecc71").pack(pady=20)
-            
-            ctk.CTkButton(frame, text="OK", command=dialog.destroy,
-                         fg_color="#2ecc71", width=100).pack(pady=10)
+            self.dialogs.success.show_message(message)
         except Exception as e:
             print(f"Error showing success message: {e}")
             print(f"✅ {message}")
     
+    def show_timings(self, text):
+        """Show the timing breakdown of the last operation"""
+        try:
+            self.dialogs.timings.show_message(text)
+        except Exception as e:
+            print(f"Error showing timings: {e}")
+            print(text)
+    
     def show_error(self, message):
         """Show error message"""
         try:
-            dialog = ctk.CTkToplevel(self.root)
-            dialog.title("Error")
-            dialog.geometry("600x350")
-            
-            # Center the dialog
-            screen_width = self.root.winfo_screenwidth()
-            screen_height = self.root.winfo_screenheight()
-            x = (screen_width - 400) // 2
-            y = (screen_height - 200) // 2
-            dialog.geometry(f"+{x}+{y}")
-            
-            dialog.update_idletasks()
-            time.sleep(0.1)
-            
-            dialog.transient(self.root)
-            dialog.grab_set()
-            dialog.focus_force()
-            
-            frame = ctk.CTkFrame(dialog)
-            frame.pack(padx=20, pady=20, fill="both", expand=True)
-            
-            ctk.CTkLabel(frame, text=message, font=("Arial", 12),
-                        text_color="#e74c3c", wraplength=350).pack(pady=20)
-            
-            ctk.CTkButton(frame, text="OK", command=dialog.destroy,
-                         fg_color="#e74c3c", width=100).pack(pady=10)
+            self.dialogs.error.show_message(message)
         except Exception as e:
             print(f"Error showing error message: {e}")
             print(f"❌ {message}")
     
+    def on_close(self):
+        """Cancel background jobs before closing the window"""
+        if self.controller is not None:
+            self.controller.shutdown()
+        self.root.destroy()
+    
     def run(self):
         """Run the application"""
         self.root.mainloop()
\ No newline at end of file
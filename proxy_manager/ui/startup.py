@@ -0,0 +1,46 @@
+"""
+Startup timing for the GUI (``--startup-profile``)
+
+Marks are measured from the start of the process when /proc tells us when
+that was, so interpreter start-up and imports are included; otherwise from
+the moment the profile is created.
+"""
+import os
+import sys
+import time
+
+
+def process_age():
+    """Seconds since this process started, or None if unknown"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the command name, which may itself contain spaces
+            fields = f.read().rpartition(")")[2].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        # starttime is field 22 of stat(5), in clock ticks since boot
+        return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    """Named timestamps from process start to the GUI being usable"""
+
+    def __init__(self):
+        age = process_age()
+        self.since_process_start = age is not None
+        self.origin = time.perf_counter() - (age or 0.0)
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, (time.perf_counter() - self.origin) * 1000))
+
+    def report(self, file=None):
+        file = file or sys.stderr
+        origin = "process start" if self.since_process_start else "profile start"
+        print(f"Startup profile (ms since {origin}):", file=file)
+        previous = 0.0
+        for name, at in self.marks:
+            print(f"  {name:<22} {at:8.1f}  (+{at - previous:.1f})", file=file)
+            previous = at
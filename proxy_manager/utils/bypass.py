@@ -0,0 +1,187 @@
+"""
+Compiled no_proxy rules for Proxy Manager
+
+The comma separated ``no_proxy`` list is compiled once into:
+
+- a suffix trie over reversed domain labels, so a host is checked in one
+  dictionary step per label whatever the size of the list;
+- sorted, merged address intervals per IP version for literal addresses
+  and CIDR ranges, searched with bisect;
+- a single regular expression for the rare patterns neither can express
+  (wildcards in the middle of a name).
+
+Entry syntax follows what curl and GNOME accept:
+
+    example.com      example.com and any subdomain
+    .example.com     same as example.com
+    *.example.com    subdomains of example.com only
+    10.0.0.0/8       addresses in the range; 127.0.0.1 is a /32
+    <local>          host names without a dot
+    *                every host
+
+A ``:port`` suffix on an entry is ignored.
+"""
+import bisect
+import fnmatch
+import ipaddress
+import re
+
+
+# Node flags, stored under the empty label (no real label is empty)
+_EXACT = 1
+_SUBTREE = 2
+_FLAGS = ""
+
+
+def parse_no_proxy(no_proxy):
+    """Split a no_proxy string into entries"""
+    return [item.strip() for item in no_proxy.replace(";", ",").split(",") if item.strip()]
+
+
+def _strip_port(entry):
+    if entry.startswith("["):
+        return entry[1:].partition("]")[0]
+    if entry.count(":") == 1:
+        host, _, port = entry.partition(":")
+        if port.isdigit():
+            return host
+    return entry
+
+
+def classify_entry(entry):
+    """Return (kind, value) for one no_proxy entry, or (None, None) if it is empty
+
+    kind is "all", "local", "network" (an ip_network), "subdomains" (a
+    domain whose subdomains match), "domain" (a domain matching itself and
+    its subdomains) or "pattern" (a shell-style wildcard).
+    """
+    entry = _strip_port(entry.strip().lower()).rstrip(".")
+    if not entry:
+        return None, None
+    if entry == "*":
+        return "all", None
+    if entry == "<local>":
+        return "local", None
+    if entry[0].isdigit() or ":" in entry:
+        try:
+            return "network", ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            pass
+    if entry.startswith("*."):
+        return "subdomains", entry[2:]
+    if "*" in entry or "?" in entry:
+        return "pattern", entry
+    return "domain", entry.lstrip(".")
+
+
+def normalize_host(host):
+    """Lower-case host without brackets, port or trailing dot"""
+    host = host.strip().lower()
+    if host.startswith("["):
+        return host[1:].partition("]")[0]
+    if host.count(":") == 1:
+        host = host.partition(":")[0]
+    return host.rstrip(".")
+
+
+def _merge(intervals):
+    """Sort and merge (start, end) intervals; return (starts, ends)"""
+    starts, ends = [], []
+    for start, end in sorted(intervals):
+        if ends and start <= ends[-1] + 1:
+            if end > ends[-1]:
+                ends[-1] = end
+            continue
+        starts.append(start)
+        ends.append(end)
+    return starts, ends
+
+
+class BypassMatcher:
+    """Answers "direct or proxy?" for a host from a compiled no_proxy list"""
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.match_all = False
+        self.local_names = False
+        self._trie = {}
+        self._pattern = None
+        intervals = {4: [], 6: []}
+        patterns = []
+
+        for raw in self.entries:
+            kind, value = classify_entry(raw)
+            if kind == "all":
+                self.match_all = True
+            elif kind == "local":
+                self.local_names = True
+            elif kind == "network":
+                intervals[value.version].append((int(value.network_address), int(value.broadcast_address)))
+            elif kind == "subdomains":
+                self._insert(value, _SUBTREE)
+            elif kind == "domain":
+                self._insert(value, _EXACT | _SUBTREE)
+            elif kind == "pattern":
+                patterns.append(fnmatch.translate(value))
+
+        self._ranges = {version: _merge(items) for version, items in intervals.items()}
+        if patterns:
+            self._pattern = re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+
+    @classmethod
+    def from_string(cls, no_proxy):
+        """Compile a comma separated no_proxy string"""
+        return cls(parse_no_proxy(no_proxy or ""))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _insert(self, domain, flags):
+        node = self._trie
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        node[_FLAGS] = node.get(_FLAGS, 0) | flags
+
+    def _match_domain(self, host):
+        labels = host.split(".")
+        remaining = len(labels)
+        node = self._trie
+        for label in reversed(labels):
+            node = node.get(label)
+            if node is None:
+                return False
+            remaining -= 1
+            if remaining and node.get(_FLAGS, 0) & _SUBTREE:
+                return True
+        return bool(node.get(_FLAGS, 0) & _EXACT)
+
+    def _match_address(self, address):
+        starts, ends = self._ranges[address.version]
+        value = int(address)
+        index = bisect.bisect_right(starts, value) - 1
+        return index >= 0 and value <= ends[index]
+
+    def bypass(self, host):
+        """True if connections to host should go direct instead of through the proxy"""
+        if self.match_all:
+            return True
+        host = normalize_host(host)
+        if not host:
+            return False
+        address = None
+        # Names end in a letter; skip the address parser for them
+        if host[-1].isdigit() or ":" in host:
+            try:
+                address = ipaddress.ip_address(host)
+            except ValueError:
+                pass
+
+        if address is not None:
+            if self._match_address(address):
+                return True
+        else:
+            if self.local_names and "." not in host:
+                return True
+            if self._match_domain(host):
+                return True
+        return self._pattern is not None and self._pattern.match(host) is not None
@@ -0,0 +1,209 @@
+"""
+Minimal HTTP/1.x wire helpers for Proxy Manager's local proxy services
+
+Only what a forwarding proxy needs: reading a message head, parsing and
+rewriting header lists, and relaying bodies framed by Content-Length,
+chunked encoding or connection close.
+"""
+import asyncio
+
+
+MAX_HEAD_SIZE = 64 * 1024
+RELAY_CHUNK_SIZE = 64 * 1024
+
+# Headers that describe a single connection and must not be forwarded.
+# Transfer-Encoding is hop-by-hop too, but bodies are relayed with their
+# original framing, so it is passed through unchanged.
+HOP_BY_HOP = frozenset({
+    "connection",
+    "keep-alive",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "upgrade",
+})
+
+
+class HTTPWireError(Exception):
+    """Malformed or oversized HTTP message"""
+
+
+async def read_head(reader):
+    """Read a message head up to the blank line; return None on clean EOF"""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise HTTPWireError("Connection closed in the middle of a message head")
+    except asyncio.LimitOverrunError:
+        raise HTTPWireError("Message head too large")
+    return head
+
+
+def parse_head(head):
+    """Split a head into (start line, [(name, value), ...])"""
+    lines = head.decode("latin-1").split("\r\n")
+    start_line = lines[0]
+    headers = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        if line[0] in " \t" and headers:
+            # Obsolete line folding: append to the previous header
+            name, value = headers[-1]
+            headers[-1] = (name, f"{value} {line.strip()}")
+            continue
+        name, sep, value = line.partition(":")
+        if not sep:
+            raise HTTPWireError(f"Malformed header line: {line!r}")
+        headers.append((name.strip(), value.strip()))
+    return start_line, headers
+
+
+def get_header(headers, name, default=None):
+    """Value of the last header called name (case insensitive)"""
+    name = name.lower()
+    for key, value in reversed(headers):
+        if key.lower() == name:
+            return value
+    return default
+
+
+def connection_tokens(headers):
+    """Lower-cased tokens of Connection and Proxy-Connection headers"""
+    tokens = set()
+    for key, value in headers:
+        if key.lower() in ("connection", "proxy-connection"):
+            tokens.update(token.strip().lower() for token in value.split(","))
+    return tokens
+
+
+def strip_hop_by_hop(headers):
+    """Drop hop-by-hop headers, including any named in Connection"""
+    listed = connection_tokens(headers)
+    return [(key, value) for key, value in headers
+            if key.lower() not in HOP_BY_HOP and key.lower() not in listed]
+
+
+def build_head(start_line, headers):
+    """Serialize a start line and header list"""
+    lines = [start_line, *(f"{key}: {value}" for key, value in headers), "", ""]
+    return "\r\n".join(lines).encode("latin-1")
+
+
+def wants_keep_alive(version, headers):
+    """Whether the peer asked to keep the connection open after this message"""
+    tokens = connection_tokens(headers)
+    if version == "HTTP/1.0":
+        return "keep-alive" in tokens
+    return "close" not in tokens
+
+
+def body_framing(headers, request_method=None, status=None):
+    """Return ("none"|"chunked"|"length"|"close", length) for a message"""
+    if request_method == "HEAD" or (status is not None and (100 <= status < 200 or status in (204, 304))):
+        return "none", 0
+    transfer_encoding = get_header(headers, "transfer-encoding", "")
+    if "chunked" in transfer_encoding.lower():
+        return "chunked", None
+    length = get_header(headers, "content-length")
+    if length is not None:
+        try:
+            return "length", int(length)
+        except ValueError:
+            raise HTTPWireError(f"Invalid Content-Length: {length!r}")
+    if status is None:
+        # Requests without framing headers have no body
+        return "none", 0
+    return "close", None
+
+
+async def relay_body(reader, writer, framing, length):
+    """Copy a message body from reader to writer using its framing"""
+    if framing == "none":
+        return
+    if framing == "length":
+        remaining = length
+        while remaining > 0:
+            data = await reader.read(min(remaining, RELAY_CHUNK_SIZE))
+            if not data:
+                raise HTTPWireError("Connection closed before the end of the body")
+            writer.write(data)
+            remaining -= len(data)
+            await writer.drain()
+        return
+    if framing == "chunked":
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            writer.write(size_line)
+            try:
+                size = int(size_line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise HTTPWireError(f"Invalid chunk size line: {size_line!r}")
+            if size == 0:
+                # Trailers, terminated by an empty line
+                while True:
+                    line = await reader.readuntil(b"\r\n")
+                    writer.write(line)
+                    if line == b"\r\n":
+                        break
+                await writer.drain()
+                return
+            await relay_body(reader, writer, "length", size + 2)
+        return
+    # Read until the peer closes the connection
+    while True:
+        data = await reader.read(RELAY_CHUNK_SIZE)
+        if not data:
+            return
+        writer.write(data)
+        await writer.drain()
+
+
+async def pipe(reader, writer):
+    """Copy bytes one way until EOF, then half-close the destination"""
+    try:
+        while True:
+            data = await reader.read(RELAY_CHUNK_SIZE)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        try:
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (OSError, RuntimeError):
+            pass
+
+
+def request_authority(method, target):
+    """Return (scheme, host, port, origin-form target) of a proxy request target
+
+    scheme is None for CONNECT; host is None for origin-form targets.
+    """
+    if method == "CONNECT":
+        authority, default_port, scheme, path = target, 443, None, target
+    else:
+        scheme, sep, rest = target.partition("://")
+        if not sep:
+            return None, None, None, target
+        scheme = scheme.lower()
+        authority, _, path = rest.partition("/")
+        path = "/" + path
+        default_port = 443 if scheme == "https" else 80
+        authority = authority.rpartition("@")[2]
+
+    if authority.startswith("["):
+        host, _, port = authority[1:].partition("]")
+        port = port.lstrip(":")
+    else:
+        host, _, port = authority.partition(":")
+    try:
+        port = int(port) if port else default_port
+    except ValueError:
+        raise HTTPWireError(f"Invalid port in request target: {target!r}")
+    return scheme, host, port, path
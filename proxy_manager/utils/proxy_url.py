@@ -0,0 +1,77 @@
+"""
+Proxy URL helpers for Proxy Manager
+"""
+import base64
+import re
+
+
+DEFAULT_PROXY_PORT = 3128
+LOCAL_PROXY_HOST = "127.0.0.1"
+
+# scheme://userinfo@ up to the last '@' of the word: passwords are not percent-encoded
+_USERINFO = re.compile(r"([a-zA-Z][a-zA-Z0-9+.-]*://)\S*@")
+
+
+def split_host_port(proxy_url, default_port=DEFAULT_PROXY_PORT):
+    """Return (host, port) from a proxy URL, ignoring any embedded credentials"""
+    # Credentials may contain '/', ':' or '#', so cut at the last '@' first
+    rest = proxy_url.split('://', 1)[-1]
+    host_port = rest.rsplit('@', 1)[-1].split('/', 1)[0]
+
+    if host_port.startswith('['):
+        host, _, port = host_port[1:].partition(']')
+        port = port.lstrip(':')
+    else:
+        host, _, port = host_port.partition(':')
+
+    try:
+        port = int(port) if port else default_port
+    except ValueError:
+        port = default_port
+
+    return host, port
+
+
+def replace_host_port(proxy_url, host, port, keep_credentials=True):
+    """Return proxy_url pointing at host:port, keeping the scheme and optionally the credentials"""
+    scheme, sep, rest = proxy_url.partition('://')
+    if not sep:
+        scheme, rest = "http", proxy_url
+    userinfo, at, _ = rest.rpartition('@')
+    if not keep_credentials:
+        userinfo, at = "", ""
+    if ':' in host:
+        host = f"[{host}]"
+    return f"{scheme}://{userinfo}{at}{host}:{port}"
+
+
+def basic_proxy_authorization(username, password):
+    """Value of a Basic Proxy-Authorization header"""
+    token = base64.b64encode(f"{username}:{password}".encode("utf-8")).decode("ascii")
+    return f"Basic {token}"
+
+
+def split_credentials(proxy_url):
+    """Return the (username, password) embedded in a proxy URL, or (None, None)"""
+    from urllib.parse import unquote
+
+    rest = proxy_url.split('://', 1)[-1]
+    userinfo, at, _ = rest.rpartition('@')
+    if not at:
+        return None, None
+    username, _, password = userinfo.partition(':')
+    return unquote(username), unquote(password)
+
+
+def with_credentials(proxy_url, username, password):
+    """Return proxy_url with username:password as its credentials (URLs without a scheme are kept)"""
+    scheme, sep, rest = proxy_url.partition('://')
+    if not sep:
+        return proxy_url
+    host_port = rest.rpartition('@')[2]
+    return f"{scheme}://{username}:{password}@{host_port}"
+
+
+def redact_credentials(text):
+    """Return text with the user information of every URL in it replaced by ***"""
+    return _USERINFO.sub(r"\1***@", text)
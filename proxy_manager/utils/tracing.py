@@ -0,0 +1,189 @@
+"""
+Timing spans for Proxy Manager operations
+
+``with tracer.span("dconf load") as span:`` times one step. Spans opened
+inside another on the same thread become its children, so enabling the
+proxy yields a tree: the operation, its numbered steps, and the
+subprocesses and privileged requests each step made. Steps that report
+success through return values record it with ``span.finish(success,
+returncode=..., error=...)``; an exception leaving the block marks the
+span as failed (or cancelled, for BaseExceptions such as JobCancelled).
+
+Work handed to other threads nests under the caller with
+``tracer.adopt(parent)``. Finished top-level spans are kept in a ring buffer of the last
+``RING_SIZE`` and, when ``log_path`` is set, appended to a JSON-lines file
+as one object per line. format_breakdown() renders a span as a per-step
+latency table for the CLI (``--timings``) and the GUI.
+"""
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from proxy_manager.utils.proxy_url import redact_credentials
+
+
+RING_SIZE = 50
+
+
+class Span:
+    """One timed step and the steps it contained"""
+
+    def __init__(self, name, attrs, operation=False):
+        self.name = redact_credentials(name)
+        self.attrs = attrs
+        self.operation = operation
+        self.children = []
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+        self.outcome = None
+        self.returncode = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self, success, returncode=None, error=None):
+        """Record the outcome of a step that reports failure by return value"""
+        self.outcome = "ok" if success else "error"
+        if returncode is not None:
+            self.returncode = returncode
+        if error and not success:
+            self.error = redact_credentials(str(error).strip())
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "operation": self.operation,
+            "started": round(self.started, 3),
+            "duration_ms": self.duration_ms,
+            "outcome": self.outcome,
+            "returncode": self.returncode,
+            "error": self.error,
+            "attrs": self.attrs,
+            "children": [child.as_dict() for child in self.children],
+        }
+
+
+class Tracer:
+    """Collects span trees per thread; keeps and optionally logs the finished ones"""
+
+    def __init__(self, size=RING_SIZE, log_path=None):
+        self.log_path = log_path
+        self._recent = deque(maxlen=size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, operation=False, **attrs):
+        """Time the block as a span named name; yields the Span"""
+        stack = self._stack()
+        span = Span(name, attrs, operation)
+        if stack:
+            stack[-1].children.append(span)
+        stack.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span.outcome = "error"
+            span.error = span.error or redact_credentials(str(e)) or type(e).__name__
+            raise
+        except BaseException:
+            span.outcome = "cancelled"
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - span._start) * 1000, 3)
+            if span.outcome is None:
+                span.outcome = "ok"
+            stack.pop()
+            if not stack:
+                self._record(span)
+
+    def current(self):
+        """The innermost open span on this thread, or None"""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def adopt(self, parent):
+        """Nest spans opened on this thread under parent, a span open on another thread"""
+        if parent is None:
+            yield
+            return
+        stack = self._stack()
+        stack.append(parent)
+        try:
+            yield
+        finally:
+            stack.remove(parent)
+
+    def operation(self, name, **attrs):
+        """A user-visible operation (enable, disable...), as picked by last_operation()"""
+        return self.span(name, operation=True, **attrs)
+
+    def _record(self, span):
+        record = span.as_dict()
+        with self._lock:
+            self._recent.append(record)
+            if not self.log_path:
+                return
+            try:
+                with open(self.log_path, "a") as log:
+                    log.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"Error writing trace log {self.log_path}: {e}")
+
+    def recent(self):
+        """Finished top-level spans, oldest first, as dicts"""
+        with self._lock:
+            return list(self._recent)
+
+    def last_operation(self):
+        """The most recent finished operation as a dict, or None"""
+        with self._lock:
+            return next((record for record in reversed(self._recent) if record["operation"]), None)
+
+
+tracer = Tracer()
+
+
+def traced(name, operation=False, false_is_failure=True):
+    """Decorator: run the function inside a span
+
+    A False return marks the span failed, unless false_is_failure is off
+    (e.g. for status checks, where False is an answer).
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name, operation=operation) as span:
+                result = fn(*args, **kwargs)
+                if false_is_failure and result is False:
+                    span.finish(False)
+                return result
+        return wrapper
+    return decorate
+
+
+def format_breakdown(record, indent=0):
+    """Lines of a per-step latency table for a span dict"""
+    label = "  " * indent + record["name"]
+    details = [record["outcome"]]
+    if record["returncode"] is not None:
+        details.append(f"exit {record['returncode']}")
+    details.extend(f"{key}={value}" for key, value in record["attrs"].items())
+    if record["error"]:
+        details.append(record["error"].splitlines()[0])
+    lines = [f"{label:<44} {record['duration_ms']:9.1f} ms  {', '.join(details)}"]
+    for child in record["children"]:
+        lines.extend(format_breakdown(child, indent + 1))
+    return lines
@@ -0,0 +1,124 @@
+"""
+BypassMatcher rules, and the same decisions from the local proxy's router
+"""
+import pytest
+
+from proxy_manager.models.local_proxy import LocalForwardingProxy
+from proxy_manager.utils.bypass import BypassMatcher, classify_entry
+
+
+NO_PROXY = ("localhost, 127.0.0.1, .localdomain.com, intranet.cu, *.corp.example, build-*.ci.example, "
+            "10.0.0.0/8, 192.168.91.0/24, 172.16.5.4, fd00::/8, ::1, registry.example:5000, <local>")
+
+# (host, goes direct)
+CASES = [
+    # Suffix trie: the domain itself and any subdomain, on label boundaries only
+    ("intranet.cu", True),
+    ("wiki.intranet.cu", True),
+    ("a.b.c.intranet.cu", True),
+    ("notintranet.cu", False),
+    ("intranet.cu.example.com", False),
+    ("example.cu", False),
+    ("localdomain.com", True),
+    ("x.localdomain.com", True),
+    ("INTRANET.CU.", True),
+    ("registry.example:5000", True),
+    ("registry.example:443", True),
+    # *.domain: subdomains only
+    ("git.corp.example", True),
+    ("corp.example", False),
+    # Wildcards inside a name
+    ("build-42.ci.example", True),
+    ("build.ci.example", False),
+    # IPv4 literals and CIDR
+    ("127.0.0.1", True),
+    ("127.0.0.2", False),
+    ("10.255.255.255", True),
+    ("11.0.0.0", False),
+    ("192.168.91.200:8080", True),
+    ("192.168.92.1", False),
+    ("172.16.5.4", True),
+    ("172.16.5.5", False),
+    # IPv6 literals and CIDR, with or without brackets
+    ("fd00::5", True),
+    ("[fd12:3456::1]:8080", True),
+    ("::1", True),
+    ("[::1]", True),
+    ("2001:db8::1", False),
+    ("[fe80::1]", False),
+    # <local>: names without a dot, never addresses
+    ("printer", True),
+    ("localhost", True),
+    ("github.com", False),
+    ("", False),
+]
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return BypassMatcher.from_string(NO_PROXY)
+
+
+@pytest.mark.parametrize("host, direct", CASES)
+def test_bypass(matcher, host, direct):
+    assert matcher.bypass(host) is direct
+
+
+def test_match_all():
+    matcher = BypassMatcher.from_string("example.com, *")
+    assert matcher.bypass("github.com") and matcher.bypass("10.1.2.3") and matcher.bypass("[2001:db8::1]")
+
+
+def test_empty_list_bypasses_nothing():
+    for no_proxy in ("", None, " , ;"):
+        matcher = BypassMatcher.from_string(no_proxy)
+        assert len(matcher) == 0
+        assert not matcher.bypass("localhost")
+
+
+def test_local_without_dots_only():
+    matcher = BypassMatcher.from_string("<local>")
+    assert matcher.bypass("printer")
+    assert not matcher.bypass("printer.lan")
+    assert not matcher.bypass("::1")
+
+
+def test_overlapping_ranges_are_merged():
+    matcher = BypassMatcher.from_string("10.0.0.0/16, 10.0.128.0/17, 10.1.0.0/16, 10.3.0.0/16")
+    assert matcher._ranges[4][0] == [int.from_bytes(bytes([10, 0, 0, 0]), "big"),
+                                     int.from_bytes(bytes([10, 3, 0, 0]), "big")]
+    assert matcher.bypass("10.1.255.255")
+    assert not matcher.bypass("10.2.0.1")
+    assert matcher.bypass("10.3.0.1")
+
+
+@pytest.mark.parametrize("entry, kind", [
+    ("*", "all"),
+    ("<local>", "local"),
+    ("10.0.0.0/8", "network"),
+    ("[fd00::]:3128", "network"),
+    ("*.corp.example", "subdomains"),
+    ("build-?.ci.example", "pattern"),
+    (".example.com", "domain"),
+    ("example.com.", "domain"),
+    ("  ", None),
+])
+def test_classify_entry(entry, kind):
+    assert classify_entry(entry)[0] == kind
+
+
+def with_port(host):
+    """host as a request authority with a port: brackets around IPv6, 443 unless one is given"""
+    if host.count(":") > 1 and not host.startswith("["):
+        host = f"[{host}]"
+    return host if host.rpartition("]")[2].count(":") == 1 else f"{host}:443"
+
+
+@pytest.mark.parametrize("host, direct", [case for case in CASES if case[0]])
+def test_local_proxy_routes_like_the_matcher(matcher, host, direct):
+    proxy = LocalForwardingProxy("upstream.example", 3128, bypass=matcher)
+    authority = with_port(host)
+    assert (proxy._direct_route("CONNECT", authority) is not None) is direct
+    assert (proxy._direct_route("GET", f"http://{authority}/index.html") is not None) is direct
+    # Only plain HTTP can be sent to the origin directly; other schemes always go upstream
+    assert proxy._direct_route("GET", f"ftp://{authority}/") is None
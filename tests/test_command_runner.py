@@ -0,0 +1,131 @@
+"""
+CommandRunner cache, invalidation, timeouts and concurrency, with FakeBackend instead of processes
+"""
+import threading
+import time
+
+import pytest
+
+from proxy_manager.models import command_runner
+from proxy_manager.models.command_runner import CommandRunner, FakeBackend
+
+
+GET_MODE = ["gsettings", "get", "org.gnome.system.proxy", "mode"]
+IS_ACTIVE = ["systemctl", "is-active", "docker.service"]
+
+
+@pytest.fixture
+def backend():
+    return (FakeBackend()
+            .on(["gsettings", "get"], stdout="'manual'\n")
+            .on(["systemctl", "is-active"], stdout="inactive\n", returncode=3))
+
+
+@pytest.fixture
+def runner(backend):
+    runner = CommandRunner(backend)
+    yield runner
+    runner.shutdown()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic of the runner, moved by hand"""
+    now = [1000.0]
+    monkeypatch.setattr(command_runner.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_cached_result_is_reused_until_ttl(runner, backend, clock):
+    first = runner.run(GET_MODE, cache=True)
+    second = runner.run(GET_MODE, cache=True)
+    assert (first.stdout, first.cached) == ("'manual'\n", False)
+    assert (second.stdout, second.cached) == ("'manual'\n", True)
+    assert backend.calls == [GET_MODE]
+
+    clock[0] += runner.cache_ttl + 0.1
+    assert not runner.run(GET_MODE, cache=True).cached
+    assert backend.calls == [GET_MODE, GET_MODE]
+
+
+def test_uncached_and_failed_commands_run_every_time(runner, backend):
+    runner.run(GET_MODE)
+    runner.run(GET_MODE)
+    # Commands that could not run are not cached
+    backend.on(["dconf"], error="dconf: not found")
+    runner.run(["dconf", "read", "/system/proxy/mode"], cache=True)
+    runner.run(["dconf", "read", "/system/proxy/mode"], cache=True)
+    assert backend.calls == [GET_MODE, GET_MODE] + [["dconf", "read", "/system/proxy/mode"]] * 2
+
+
+def test_invalidate_prefix_keeps_other_entries(runner, backend):
+    runner.run(GET_MODE, cache=True)
+    runner.run(IS_ACTIVE, cache=True)
+    runner.invalidate(["gsettings", "get"])
+    assert not runner.run(GET_MODE, cache=True).cached
+    assert runner.run(IS_ACTIVE, cache=True).cached
+
+    runner.invalidate()
+    assert not runner.run(IS_ACTIVE, cache=True).cached
+    assert backend.calls == [GET_MODE, IS_ACTIVE, GET_MODE, IS_ACTIVE]
+
+
+def test_concurrent_identical_queries_share_one_process(backend):
+    backend.on(["gsettings", "get"], stdout="'auto'\n", delay=0.1)
+    runner = CommandRunner(backend)
+    try:
+        results = runner.gather(*[lambda: runner.run(GET_MODE, cache=True)] * 4)
+    finally:
+        runner.shutdown()
+    assert backend.calls == [GET_MODE]
+    assert [result.stdout for result in results] == ["'auto'\n"] * 4
+    assert sorted(result.cached for result in results) == [False, True, True, True]
+
+
+def test_timeout(runner, backend):
+    backend.on(["systemctl", "restart"], delay=5)
+    result = runner.run(["systemctl", "restart", "docker"], timeout=0.05)
+    assert not result.ok
+    assert result.error == "timed out after 0.1 s"
+    assert result.message == result.error
+
+
+def test_run_many_shares_one_deadline(runner, backend):
+    backend.on(["sleep"], delay=0.2)
+    start = time.monotonic()
+    results = runner.run_many([["sleep", "a"], ["sleep", "b"], ["sleep", "c"], ["sleep", "d"], ["sleep", "e"]],
+                              timeout=0.3)
+    # Four run at once within the deadline; the fifth only gets what is left of it
+    assert [result.ok for result in results] == [True, True, True, True, False]
+    assert results[4].error.startswith("timed out after") or results[4].error == "deadline exceeded"
+    assert time.monotonic() - start < 0.5
+
+
+def test_expired_deadline_does_not_run(runner, backend):
+    result = runner.run(GET_MODE, deadline=command_runner.Deadline(0))
+    assert result.error == "deadline exceeded"
+    assert backend.calls == []
+
+
+def test_gather_returns_results_in_call_order(runner):
+    finished = []
+    lock = threading.Lock()
+
+    def call(name, delay):
+        def fn():
+            time.sleep(delay)
+            with lock:
+                finished.append(name)
+            return name
+        return fn
+
+    results = runner.gather(call("slow", 0.15), call("medium", 0.08), call("fast", 0.01))
+    assert results == ["slow", "medium", "fast"]
+    assert finished == ["fast", "medium", "slow"]
+
+
+def test_run_many_results_follow_command_order(runner, backend):
+    backend.on(["echo", "1"], stdout="1\n", delay=0.1).on(["echo", "2"], stdout="2\n")
+    results = runner.run_many([["echo", "1"], ["echo", "2"], ["missing"]])
+    assert [result.stdout for result in results] == ["1\n", "2\n", ""]
+    assert results[2].returncode == 127 and results[2].stderr == "missing: command not found"
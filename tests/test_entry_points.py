@@ -0,0 +1,51 @@
+"""
+proxy.py and python -m proxy_manager run the same command line
+
+Both are run as separate processes against the stub system tools, with
+HOME in a temporary directory, and must print the same and exit the same.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from benchmarks._common import write_system_stubs
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COMMANDS = [
+    ["--version"],
+    ["status"],
+    ["status", "--json"],
+    ["services", "status"],
+    ["route", "localhost", "intranet.cu", "github.com"],
+    ["route", "--pac", "localhost", "intranet.cu", "github.com"],
+]
+
+
+@pytest.fixture(scope="module")
+def env(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("entry_points")
+    home = workdir / "home"
+    home.mkdir()
+    path = os.environ["PATH"]
+    try:
+        bin_dir = write_system_stubs(str(workdir))
+    finally:
+        os.environ["PATH"] = path
+    return dict(os.environ, HOME=str(home), PATH=bin_dir + os.pathsep + path, PYTHONPATH=str(ROOT))
+
+
+def run(env, *argv):
+    return subprocess.run([sys.executable, *argv], cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+
+
+@pytest.mark.parametrize("args", COMMANDS, ids=" ".join)
+def test_same_output_and_exit_code(env, args):
+    launcher = run(env, "proxy.py", *args)
+    module = run(env, "-m", "proxy_manager", *args)
+    assert launcher.stdout
+    assert (launcher.stdout, launcher.returncode) == (module.stdout, module.returncode)
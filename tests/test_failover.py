@@ -0,0 +1,111 @@
+"""
+UpstreamScorer hysteresis and the FailoverMonitor switch path, with probe results made up
+"""
+import asyncio
+import threading
+from unittest import mock
+
+from proxy_manager.models import failover
+from proxy_manager.models.failover import FailoverMonitor, UpstreamScorer
+
+
+PRIMARY = "proxy-a.example.cu:3128"
+FALLBACK = "proxy-b.example.cu:3128"
+RANKED = [PRIMARY, FALLBACK]
+
+
+def round_(scorer, **latencies):
+    """Record one probe of each upstream (None: failed) and select"""
+    for address, latency in zip(RANKED, (latencies.get("a"), latencies.get("b"))):
+        scorer.record(address, latency)
+    return scorer.select(RANKED)
+
+
+def test_clearly_better_upstream_wins_after_enough_rounds():
+    scorer = UpstreamScorer(PRIMARY)
+    assert round_(scorer, a=100, b=60) == PRIMARY
+    assert round_(scorer, a=100, b=60) == FALLBACK
+
+
+def test_similar_latency_does_not_flap():
+    scorer = UpstreamScorer(PRIMARY)
+    for _ in range(10):
+        # 10% better is inside the switch margin
+        assert round_(scorer, a=100, b=90) == PRIMARY
+
+
+def test_streak_restarts_when_the_challenger_falls_back():
+    scorer = UpstreamScorer(PRIMARY, alpha=1.0)
+    assert round_(scorer, a=100, b=60) == PRIMARY
+    assert round_(scorer, a=100, b=95) == PRIMARY
+    assert round_(scorer, a=100, b=60) == PRIMARY
+    assert round_(scorer, a=100, b=60) == FALLBACK
+
+
+def test_failing_active_upstream_is_replaced_at_once():
+    scorer = UpstreamScorer(PRIMARY, alpha=1.0)
+    assert round_(scorer, a=50, b=100) == PRIMARY
+    assert round_(scorer, a=None, b=100) == FALLBACK
+    assert not scorer.stats[PRIMARY].healthy
+
+
+def test_active_upstream_kept_when_nothing_is_healthy():
+    scorer = UpstreamScorer(FALLBACK)
+    assert round_(scorer) == FALLBACK
+
+
+def test_ties_go_to_the_better_rank():
+    scorer = UpstreamScorer("gone.example.cu:3128")
+    assert round_(scorer, a=80, b=80) == PRIMARY
+
+
+def result(address, latency_ms):
+    stats = None if latency_ms is None else {"p50_ms": latency_ms}
+    return {"proxy": address, "ok": latency_ms is not None, "tunnel_setup": stats, "first_response": stats}
+
+
+class FakeProber:
+    """Stands in for ProxyProber, answering with the latencies queued in rounds"""
+
+    rounds = []
+
+    def __init__(self, targets, samples):
+        self.targets = targets
+
+    async def probe_all(self):
+        latencies = self.rounds.pop(0)
+        return [result(target.address, latencies[target.address]) for target in self.targets]
+
+
+def test_monitor_switches_and_reports_the_target(monkeypatch):
+    monkeypatch.setattr(failover, "ProxyProber", FakeProber)
+    FakeProber.rounds = [{PRIMARY: 100, FALLBACK: 50}, {PRIMARY: 100, FALLBACK: 50}]
+    settings = {"http_proxy": f"http://{PRIMARY}", "fallback_proxies": [f"http://{FALLBACK}"]}
+    switched = []
+    monitor = FailoverMonitor(lambda: (settings, {}), switched.append)
+
+    assert asyncio.run(monitor.run_round()) is None
+    target = asyncio.run(monitor.run_round())
+    assert target.address == FALLBACK and target.names == ["fallback_proxies[0]"]
+    assert switched == [target]
+    assert monitor.scorer.active == FALLBACK
+
+
+def test_apply_upstream_waits_for_a_running_settings_change():
+    from proxy_manager.models.proxy_manager import ProxyModel
+
+    config = mock.MagicMock()
+    config.proxy_settings = {"http_proxy": f"http://{PRIMARY}"}
+    model = ProxyModel(config)
+    model.check_proxy_status = mock.Mock(return_value=False)
+    try:
+        with model._settings_lock:
+            switch = threading.Thread(target=model.apply_upstream, args=(FALLBACK,))
+            switch.start()
+            switch.join(0.1)
+            assert switch.is_alive()
+            assert "active_upstream" not in config.proxy_settings
+        switch.join(5)
+        assert config.proxy_settings["active_upstream"] == FALLBACK
+    finally:
+        model.shutdown()
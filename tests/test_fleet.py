@@ -0,0 +1,122 @@
+"""
+FleetRunner retries, concurrency limit and reports, with FakeExecutor standing in for ssh
+"""
+import asyncio
+
+import pytest
+
+from proxy_manager.models import fleet
+from proxy_manager.models.fleet import FakeExecutor, FleetRunner, format_summary, summarize
+
+
+ENABLED = "=== PROXY ACTIVATED SUCCESSFULLY ===\n"
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """Backoff sleeps the runner asked for, without waiting and without jitter"""
+    sleeps = []
+    sleep = asyncio.sleep
+
+    async def record(delay, *args, **kwargs):
+        if delay:
+            sleeps.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(fleet.random, "uniform", lambda low, high: 1.0)
+    monkeypatch.setattr(fleet.asyncio, "sleep", record)
+    return sleeps
+
+
+def test_unreachable_host_is_retried_with_exponential_backoff(backoffs):
+    executor = FakeExecutor().on("lab-1", stdout=ENABLED, unreachable=2)
+    [result] = FleetRunner(executor, retries=2, backoff=0.5).run(["lab-1"], ["enable"], ["secret"])
+    assert result["ok"] and result["attempts"] == 3
+    assert result["output"] == "=== PROXY ACTIVATED SUCCESSFULLY ==="
+    assert backoffs == [0.5, 1.0]
+    assert executor.calls == [("lab-1", ["--password-stdin", "enable"], "secret\n")] * 3
+
+
+def test_retries_run_out(backoffs):
+    executor = FakeExecutor().on("lab-1", unreachable=5)
+    [result] = FleetRunner(executor, retries=2, backoff=0.5).run(["lab-1"], ["enable"])
+    assert not result["ok"]
+    assert (result["returncode"], result["attempts"]) == (255, 3)
+    assert result["error"] == "ssh: connect to host lab-1 port 22: Connection refused"
+    assert backoffs == [0.5, 1.0]
+
+
+def test_timeout_is_retried():
+    executor = FakeExecutor().on("lab-1", delay=60)
+    [result] = FleetRunner(executor, timeout=0.05, retries=1, backoff=0.01).run(["lab-1"], ["enable"])
+    assert not result["ok"]
+    assert (result["returncode"], result["attempts"]) == (None, 2)
+    assert result["error"] == "no answer within 0.05 s"
+
+
+def test_command_failure_is_not_retried(backoffs):
+    executor = FakeExecutor().on("lab-1", returncode=1, stderr="sudo: 1 incorrect password attempt\n")
+    [result] = FleetRunner(executor, retries=3).run(["lab-1"], ["disable"], ["wrong"])
+    assert not result["ok"]
+    assert (result["returncode"], result["attempts"]) == (1, 1)
+    assert result["error"] == "sudo: 1 incorrect password attempt"
+    assert backoffs == []
+
+
+def test_set_password_sends_every_secret_on_stdin():
+    executor = FakeExecutor().on("*")
+    FleetRunner(executor).run(["lab-1"], ["set-password", "jdoe"], ["admin", "n3w"])
+    assert executor.calls == [("lab-1", ["--password-stdin", "set-password", "jdoe"], "admin\nn3w\n")]
+
+
+class CountingExecutor(FakeExecutor):
+    """FakeExecutor that records how many hosts were in progress at once"""
+
+    def __init__(self):
+        super().__init__()
+        self.running = 0
+        self.peak = 0
+
+    async def run(self, host, args, input, timeout):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            return await super().run(host, args, input, timeout)
+        finally:
+            self.running -= 1
+
+
+@pytest.mark.parametrize("concurrency", [1, 3, 8])
+def test_concurrency_limit(concurrency):
+    executor = CountingExecutor().on("*", stdout=ENABLED, delay=0.01)
+    hosts = [f"lab-{index}" for index in range(20)]
+    results = FleetRunner(executor, concurrency=concurrency).run(hosts, ["enable"])
+    assert all(result["ok"] for result in results)
+    assert executor.peak == concurrency
+
+
+def test_partial_failure_report(backoffs):
+    executor = (FakeExecutor()
+                .on("lab-*", stdout=ENABLED)
+                .on("lab-2", returncode=1, stderr="sudo: 1 incorrect password attempt\n")
+                .on("lab-3", stdout=ENABLED, unreachable=1))
+    hosts = ["lab-1", "lab-2", "lab-3", "gone"]
+    reported = []
+    results = FleetRunner(executor, retries=1, on_result=reported.append).run(hosts, ["enable"])
+
+    assert [result["host"] for result in results] == hosts
+    assert sorted(result["host"] for result in reported) == sorted(hosts)
+    assert [result["ok"] for result in results] == [True, False, True, False]
+
+    summary = summarize(results, elapsed=1.234)
+    assert {key: summary[key] for key in ("hosts", "succeeded", "failed", "retried", "elapsed_s")} == {
+        "hosts": 4, "succeeded": 2, "failed": 2, "retried": 2, "elapsed_s": 1.23,
+    }
+    assert summary["failures"] == {
+        "lab-2": "sudo: 1 incorrect password attempt",
+        "gone": "ssh: Could not resolve hostname gone",
+    }
+    report = format_summary(summary).splitlines()
+    assert report[0] == "2/4 hosts succeeded, 2 failed, 2 needed retries (1.23 s)"
+    assert report[-2:] == ["❌ lab-2: sudo: 1 incorrect password attempt",
+                           "❌ gone: ssh: Could not resolve hostname gone"]
@@ -0,0 +1,96 @@
+"""
+GSettingsBackend write paths: one dconf changeset, and GSettings bindings that roll back
+"""
+import os
+
+import pytest
+
+from benchmarks._common import write_stub
+from proxy_manager.models.gsettings_backend import GSettingsBackend
+
+
+CHANGES = {
+    "org.gnome.system.proxy": {"mode": "manual", "ignore-hosts": ["localhost", "127.0.0.1"]},
+    "org.gnome.system.proxy.http": {"host": "proxy.example.cu", "port": 3128},
+    "org.gnome.system.proxy.https": {"host": "proxy.example.cu", "port": 3128},
+}
+
+
+def test_dconf_load_is_one_changeset_with_root_last(tmp_path, monkeypatch):
+    log = tmp_path / "dconf.log"
+    write_stub(str(tmp_path), "dconf", f'echo "$@" >> {log}\ncat > {tmp_path}/keyfile\n')
+    monkeypatch.setenv("PATH", f"{tmp_path}:{os.environ['PATH']}")
+    backend = GSettingsBackend()
+    # dconf comes first even when the bindings are there
+    backend._gio_checked, backend._gio = True, object()
+    monkeypatch.setattr(backend, "_apply_gio", lambda changes: pytest.fail("GSettings bindings used"))
+
+    assert backend.apply(CHANGES) == (True, "")
+    assert log.read_text() == "load /system/proxy/\n"
+    assert (tmp_path / "keyfile").read_text() == (
+        "[http]\nhost='proxy.example.cu'\nport=3128\n\n"
+        "[https]\nhost='proxy.example.cu'\nport=3128\n\n"
+        "[/]\nmode='manual'\nignore-hosts=['localhost', '127.0.0.1']\n"
+    )
+
+
+class FakeGio:
+    """Gio.Settings over a dict, failing to apply one schema"""
+
+    def __init__(self, store, failing):
+        self.store = store
+        self.failing = failing
+        fake = self
+
+        class Settings:
+            def __init__(self, schema):
+                self.schema = schema
+                self.pending = {}
+
+            @staticmethod
+            def new(schema):
+                return Settings(schema)
+
+            @staticmethod
+            def sync():
+                pass
+
+            def get_value(self, key):
+                return fake.store[self.schema].get(key)
+
+            def delay(self):
+                pass
+
+            def set_value(self, key, value):
+                self.pending[key] = value
+
+            def apply(self):
+                if self.schema == fake.failing:
+                    raise RuntimeError(f"{self.schema} is not writable")
+                fake.store[self.schema].update(self.pending)
+                self.pending = {}
+
+        self.Settings = Settings
+
+
+class FakeGLib:
+    @staticmethod
+    def Variant(type_string, value):
+        return value
+
+
+def test_gio_failure_restores_committed_schemas(monkeypatch, capsys):
+    monkeypatch.setattr("shutil.which", lambda name: None)
+    before = {
+        "org.gnome.system.proxy": {"mode": "none", "ignore-hosts": []},
+        "org.gnome.system.proxy.http": {"host": "", "port": 8080},
+        "org.gnome.system.proxy.https": {"host": "", "port": 0},
+    }
+    store = {schema: dict(keys) for schema, keys in before.items()}
+    backend = GSettingsBackend()
+    backend._gio_checked, backend._gio = True, (FakeGio(store, "org.gnome.system.proxy.https"), FakeGLib)
+    monkeypatch.setattr(backend, "_apply_gsettings", lambda changes: (False, "no gsettings"))
+
+    assert backend.apply(CHANGES) == (False, "no gsettings")
+    assert store == before
+    assert "org.gnome.system.proxy.https is not writable" in capsys.readouterr().out
@@ -0,0 +1,63 @@
+"""
+Proxy and services buttons around the admin password prompt, with a mock view
+"""
+from unittest import mock
+
+import pytest
+
+from proxy_manager.controllers.main_controller import MainController
+
+
+@pytest.fixture
+def controller():
+    controller = MainController(mock.MagicMock(), mock.MagicMock())
+    controller.view = mock.MagicMock()
+    controller.executor = mock.MagicMock()
+    controller.executor.is_running.return_value = False
+    return controller
+
+
+JOBS = [
+    (MainController.disable_proxy, "proxy_btn"),
+    (MainController.stop_usb_services, "usb_btn"),
+]
+
+
+def states(button):
+    return [call.kwargs["state"] for call in button.configure.call_args_list if "state" in call.kwargs]
+
+
+@pytest.mark.parametrize("start, button", JOBS)
+def test_cancelled_prompt_leaves_button_enabled(controller, start, button):
+    controller.ask_sudo_password = mock.Mock(return_value=None)
+    start(controller)
+    assert states(getattr(controller.view, button)) == []
+    # Only the status refresh that restores the labels
+    assert [call.kwargs["name"] for call in controller.executor.submit.call_args_list] in ([], ["status"])
+
+
+@pytest.mark.parametrize("start, button", JOBS)
+def test_button_disabled_after_password_until_job_finishes(controller, start, button):
+    widget = getattr(controller.view, button)
+    during_prompt = []
+
+    def ask():
+        during_prompt.extend(states(widget))
+        return "secret"
+
+    controller.ask_sudo_password = ask
+    start(controller)
+    # Still usable while the password dialog was open
+    assert during_prompt == []
+    assert states(widget) == ["disabled"]
+    controller.executor.submit.call_args.kwargs["on_finally"]()
+    assert states(widget) == ["disabled", "normal"]
+
+
+@pytest.mark.parametrize("start, button", JOBS)
+def test_button_enabled_again_when_job_cannot_start(controller, start, button):
+    controller.ask_sudo_password = mock.Mock(return_value="secret")
+    controller.executor.submit.side_effect = RuntimeError("Executor is shut down")
+    with pytest.raises(RuntimeError):
+        start(controller)
+    assert states(getattr(controller.view, button)) == ["disabled", "normal"]
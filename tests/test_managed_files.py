@@ -0,0 +1,48 @@
+"""
+ManagedBlockFile.render keeps everything outside Proxy Manager's block
+"""
+from proxy_manager.models.managed_files import BLOCK_BEGIN, BLOCK_END, LEGACY_ENVIRONMENT_LINE, ManagedBlockFile
+
+
+ENVIRONMENT = ManagedBlockFile("/etc/environment", legacy_line=LEGACY_ENVIRONMENT_LINE)
+BLOCK = 'http_proxy="http://proxy:3128"\nHTTP_PROXY="http://proxy:3128"\n'
+MANAGED = f'{BLOCK_BEGIN}\nhttp_proxy="http://proxy:3128"\nHTTP_PROXY="http://proxy:3128"\n{BLOCK_END}\n'
+
+
+def test_unrelated_lines_round_trip():
+    current = 'PATH="/usr/local/bin:/usr/bin"\n# site settings\nLANG=es_CU.UTF-8\n'
+    content = ENVIRONMENT.render(current, BLOCK)
+    assert content == current + MANAGED
+    assert ENVIRONMENT.render(content, None) == current
+
+
+def test_block_is_replaced_where_it_was():
+    current = f'PATH="/usr/bin"\n{BLOCK_BEGIN}\nhttp_proxy="http://old:8080"\n{BLOCK_END}\nLANG=C\n'
+    assert ENVIRONMENT.render(current, BLOCK) == 'PATH="/usr/bin"\n' + MANAGED + "LANG=C\n"
+
+
+def test_legacy_lines_are_removed():
+    current = ('PATH="/usr/bin"\n'
+               "# Proxy Settings - Actualizado por Proxy Manager\n"
+               'http_proxy="http://old:8080"\nHTTPS_PROXY="http://old:8080"\n  no_proxy=localhost\n')
+    assert ENVIRONMENT.render(current, BLOCK) == 'PATH="/usr/bin"\n' + MANAGED
+    assert ENVIRONMENT.render(current, None) == 'PATH="/usr/bin"\n'
+
+
+def test_no_change_renders_the_same_content():
+    current = 'PATH="/usr/bin"\n' + MANAGED
+    assert ENVIRONMENT.render(current, BLOCK) == current
+    assert ENVIRONMENT.render(None, None) is None
+
+
+def test_disable_removes_only_the_managed_block():
+    current = f'PATH="/usr/bin"\n\n{MANAGED}\n# keep me\nLANG=C\n'
+    assert ENVIRONMENT.render(current, None) == 'PATH="/usr/bin"\n\n\n# keep me\nLANG=C\n'
+    assert ENVIRONMENT.render(MANAGED, None) == ""
+
+
+def test_whole_file():
+    apt = ManagedBlockFile("/etc/apt/apt.conf.d/99proxy", whole_file=True)
+    assert apt.render("anything\n", "Acquire::http::proxy \"http://proxy:3128/\";\n") == \
+        "Acquire::http::proxy \"http://proxy:3128/\";\n"
+    assert apt.render("anything\n", None) is None
@@ -0,0 +1,109 @@
+"""
+ProxyProber results against stub upstreams on localhost
+"""
+import asyncio
+
+import pytest
+
+from proxy_manager.models.prober import ProbeTarget, ProxyProber, _percentiles
+from proxy_manager.utils.http_wire import parse_head, read_head
+from proxy_manager.utils.proxy_url import basic_proxy_authorization
+
+
+AUTHORIZATION = basic_proxy_authorization("jdoe", "secret")
+PERCENTILE_KEYS = {"p50_ms", "p90_ms", "max_ms", "mean_ms"}
+
+
+async def start_stub(delay=0.0, answer=True):
+    """Upstream that wants AUTHORIZATION, answering after delay, or never without answer"""
+    async def handle(reader, writer):
+        try:
+            head = await read_head(reader)
+            if head is None:
+                return
+            start_line, headers = parse_head(head)
+            if not answer:
+                await reader.read()
+                return
+            await asyncio.sleep(delay)
+            if ("Proxy-Authorization", AUTHORIZATION) not in headers:
+                writer.write(b"HTTP/1.1 407 Proxy Authentication Required\r\n"
+                             b"Proxy-Authenticate: Basic realm=\"stub\"\r\nContent-Length: 0\r\n\r\n")
+            elif start_line.startswith("CONNECT "):
+                writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            else:
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def probe(authorization=AUTHORIZATION, samples=3, timeout=5, **stub):
+    async def run():
+        server = await start_stub(**stub)
+        try:
+            target = ProbeTarget("127.0.0.1", server.sockets[0].getsockname()[1], ["http_proxy"], authorization)
+            [result] = await ProxyProber([target], samples=samples, timeout=timeout).probe_all()
+            return result
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(run())
+
+
+def check_percentiles(stats, at_least_ms=0.0):
+    assert set(stats) == PERCENTILE_KEYS
+    assert at_least_ms <= stats["p50_ms"] <= stats["p90_ms"] <= stats["max_ms"]
+    assert stats["mean_ms"] <= stats["max_ms"]
+
+
+def test_healthy_proxy():
+    result = probe(delay=0.02)
+    assert result["ok"] and result["reachable"]
+    assert result["status"] == 200
+    assert not result["auth_required"]
+    assert (result["samples"], result["failures"], result["error"]) == (3, 0, None)
+    check_percentiles(result["tcp_connect"])
+    check_percentiles(result["first_response"], at_least_ms=20)
+    check_percentiles(result["tunnel_setup"], at_least_ms=20)
+
+
+def test_proxy_requiring_authentication_is_reachable_but_not_ok():
+    result = probe(authorization=None)
+    assert result["reachable"] and not result["ok"]
+    assert result["status"] == 407
+    assert result["auth_required"]
+    assert result["failures"] == 3
+    assert result["error"] == "CONNECT answered 407"
+    check_percentiles(result["first_response"])
+    assert result["tunnel_setup"] is None
+
+
+def test_proxy_that_never_answers():
+    result = probe(answer=False, samples=2, timeout=0.2)
+    assert not result["reachable"] and not result["ok"]
+    assert result["status"] is None
+    assert result["failures"] == 2
+    assert result["error"] == "no answer within 0.2 s"
+    assert result["tcp_connect"] is result["first_response"] is result["tunnel_setup"] is None
+
+
+def test_unreachable_proxy():
+    prober = ProxyProber([ProbeTarget("127.0.0.1", 1, ["http_proxy"])], samples=1, timeout=2)
+    [result] = prober.run()
+    assert not result["reachable"] and not result["ok"]
+    assert result["status"] is None and result["error"]
+
+
+@pytest.mark.parametrize("samples, expected", [
+    ([], None),
+    ([0.004], {"p50_ms": 4.0, "p90_ms": 4.0, "max_ms": 4.0, "mean_ms": 4.0}),
+    ([0.010, 0.001, 0.002, 0.003, 0.004, 0.005, 0.006, 0.007, 0.008, 0.009],
+     {"p50_ms": 5.0, "p90_ms": 9.0, "max_ms": 10.0, "mean_ms": 5.5}),
+    ([0.001, 0.002, 0.100], {"p50_ms": 2.0, "p90_ms": 100.0, "max_ms": 100.0, "mean_ms": 34.33}),
+])
+def test_percentiles(samples, expected):
+    assert _percentiles(samples) == expected
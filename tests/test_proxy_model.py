@@ -0,0 +1,55 @@
+"""
+ProxyModel settings lock: password, proxy and failover changes do not interleave
+"""
+import threading
+from unittest import mock
+
+import pytest
+
+from proxy_manager.models.proxy_manager import ProxyModel
+
+
+@pytest.fixture
+def model():
+    config = mock.MagicMock()
+    config.credentials = {}
+    config.proxy_settings = {"http_proxy": "http://proxy.example.cu:3128", "https_proxy": "", "ftp_proxy": "",
+                             "apt_proxy": "", "no_proxy": "localhost"}
+    model = ProxyModel(config)
+    yield model
+    model.shutdown()
+
+
+def blocking_sync(model):
+    """Start sync_consumers on a thread and return the event that lets it finish"""
+    entered, release = threading.Event(), threading.Event()
+
+    def apply(*args, **kwargs):
+        entered.set()
+        release.wait(5)
+        return []
+
+    model._consumers = mock.Mock(apply=apply)
+    thread = threading.Thread(target=model.sync_consumers, args=("secret",))
+    thread.start()
+    assert entered.wait(5)
+    return release, thread
+
+
+@pytest.mark.parametrize("change", [
+    lambda model: model.update_proxy_settings_with_credentials("jdoe", "n3w"),
+    lambda model: model.save_credentials("jdoe", "n3w"),
+    lambda model: model.save_proxy_settings({"no_proxy": "localhost,.example.cu"}),
+])
+def test_settings_changes_wait_for_a_running_sync(model, change):
+    release, sync = blocking_sync(model)
+    changer = threading.Thread(target=change, args=(model,))
+    changer.start()
+    changer.join(0.1)
+    assert changer.is_alive()
+    assert not model.config.save_config.called and not model.config.save_credentials.called
+
+    release.set()
+    sync.join(5)
+    changer.join(5)
+    assert model.config.save_config.called or model.config.save_credentials.called
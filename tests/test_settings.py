@@ -0,0 +1,110 @@
+"""
+JsonFileStore debounce, refresh on inode/mtime/size changes and atomic writes
+"""
+import json
+import os
+import time
+
+import pytest
+
+from proxy_manager.config import settings
+from proxy_manager.config.settings import JsonFileStore
+
+
+DEFAULTS = {"no_proxy": "localhost", "usb_services": ["klnagent64"]}
+DEBOUNCE = 0.05
+
+
+@pytest.fixture
+def replaces(monkeypatch):
+    """Paths the store renamed a staged file onto"""
+    calls = []
+    replace = os.replace
+
+    def record(src, dst):
+        calls.append(str(dst))
+        replace(src, dst)
+
+    monkeypatch.setattr(settings.os, "replace", record)
+    return calls
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JsonFileStore(tmp_path / "config.json", DEFAULTS, mode=0o600, merge_defaults=True, debounce=DEBOUNCE)
+    store.load()
+    return store
+
+
+def read(store):
+    return json.loads(store.path.read_text())
+
+
+def test_missing_file_gets_the_defaults(store):
+    assert read(store) == DEFAULTS
+    assert store.path.stat().st_mode & 0o777 == 0o600
+
+
+def test_defaults_are_not_shared_with_the_data(tmp_path):
+    for name in ("missing.json", "existing.json"):
+        if name == "existing.json":
+            (tmp_path / name).write_text("{}")
+        store = JsonFileStore(tmp_path / name, DEFAULTS, merge_defaults=True)
+        store.load()["usb_services"].append("auditd")
+        assert DEFAULTS["usb_services"] == ["klnagent64"]
+
+
+def test_saves_are_debounced_into_one_write(store, replaces):
+    for index in range(5):
+        assert store.save(dict(DEFAULTS, no_proxy=f"localhost,host-{index}"))
+    # Memory changes at once, the disk after the debounce
+    assert store.data["no_proxy"] == "localhost,host-4"
+    assert read(store) == DEFAULTS
+    time.sleep(DEBOUNCE * 5)
+    assert read(store)["no_proxy"] == "localhost,host-4"
+    assert replaces == [str(store.path)]
+
+
+def test_unchanged_save_writes_nothing(store, replaces):
+    assert not store.save(dict(DEFAULTS))
+    store.flush()
+    assert replaces == []
+
+
+def test_refresh_after_replace_by_another_process(store):
+    assert not store.refresh()
+    staged = store.path.with_name("other.json")
+    staged.write_text(json.dumps(dict(DEFAULTS, no_proxy="localhost,.cu")))
+    os.replace(staged, store.path)
+    assert store.refresh()
+    assert store.data["no_proxy"] == "localhost,.cu"
+    assert not store.refresh()
+
+
+def test_refresh_after_in_place_edit_of_the_same_size(store):
+    before = store.path.stat()
+    store.path.write_text(store.path.read_text().replace("localhost", "LOCALHOST"))
+    os.utime(store.path, ns=(before.st_atime_ns, before.st_mtime_ns + 1_000_000))
+    assert os.stat(store.path).st_ino == before.st_ino
+    assert store.refresh()
+    assert store.data["no_proxy"] == "LOCALHOST"
+
+
+def test_unsaved_changes_win_over_the_file(store):
+    store.save(dict(DEFAULTS, no_proxy="mine"))
+    store.path.write_text(json.dumps(dict(DEFAULTS, no_proxy="theirs")))
+    assert not store.refresh()
+    store.flush()
+    assert read(store)["no_proxy"] == "mine"
+
+
+def test_failed_write_keeps_the_previous_file(store, monkeypatch, capsys):
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(settings.os, "replace", fail)
+    store.save(dict(DEFAULTS, no_proxy="new"))
+    store.flush()
+    assert read(store) == DEFAULTS
+    assert os.listdir(store.path.parent) == ["config.json"]
+    assert "disk full" in capsys.readouterr().out
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Reproducible builds of Proxy Manager
+
+    python tools/build.py onedir    # dist/ProxyManageR/ProxyManageR (PyInstaller, default)
+    python tools/build.py onefile   # dist/ProxyManageR (PyInstaller, for comparison)
+    python tools/build.py zipapp    # dist/proxy-manager.pyz
+
+Every build pins PYTHONHASHSEED and SOURCE_DATE_EPOCH (the last commit's
+time), so building the same commit twice with the same Python gives the
+same files.
+
+One-dir is the recommended target: a one-file executable unpacks the
+interpreter and libraries to a temporary directory on every launch.
+
+The zipapp holds only the proxy_manager package, compiled with -OO and
+without sources. It must run on the Python version it was built with, and
+it uses the customtkinter installed on the system. It is the smallest
+option when Python is already installed.
+
+``python -m benchmarks.bench_packaging`` compares launch times of whatever
+has been built.
+"""
+import argparse
+import os
+import py_compile
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+DIST = ROOT / "dist"
+SPEC = ROOT / "ProxyManageR.spec"
+ZIPAPP = DIST / "proxy-manager.pyz"
+# zip cannot store dates before 1980
+MIN_ZIP_EPOCH = 315532800
+
+ZIPAPP_MAIN = '''import sys
+
+from proxy_manager.cli import main
+
+sys.exit(main())
+'''
+
+
+def source_date_epoch():
+    """SOURCE_DATE_EPOCH from the environment, else the last commit's time"""
+    if os.environ.get("SOURCE_DATE_EPOCH"):
+        return int(os.environ["SOURCE_DATE_EPOCH"])
+    try:
+        result = subprocess.run(["git", "log", "-1", "--format=%ct"], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        return int(result.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return MIN_ZIP_EPOCH
+
+
+def build_env(epoch):
+    return dict(os.environ, PYTHONHASHSEED="0", SOURCE_DATE_EPOCH=str(epoch))
+
+
+def build_pyinstaller(onefile, epoch):
+    env = build_env(epoch)
+    env["PROXY_MANAGER_ONEFILE"] = "1" if onefile else "0"
+    command = [sys.executable, "-m", "PyInstaller", "--noconfirm", "--clean",
+               "--distpath", str(DIST), str(SPEC)]
+    print(f"Running {' '.join(command)}")
+    return subprocess.run(command, cwd=ROOT, env=env).returncode
+
+
+def _zip_entry(name, epoch):
+    info = zipfile.ZipInfo(name, time.gmtime(max(epoch, MIN_ZIP_EPOCH))[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = (stat.S_IFREG | 0o644) << 16
+    return info
+
+
+def build_zipapp(epoch, output=ZIPAPP):
+    """Write the zipapp with entries in a fixed order and with fixed dates and modes"""
+    package = ROOT / "proxy_manager"
+    sources = sorted(path for path in package.rglob("*.py") if "__pycache__" not in path.parts)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as staging:
+        staged = output.with_name(output.name + ".tmp")
+        with open(staged, "wb") as f:
+            f.write(b"#!/usr/bin/env python3\n")
+            with zipfile.ZipFile(f, "w") as archive:
+                archive.writestr(_zip_entry("__main__.py", epoch), ZIPAPP_MAIN)
+                for source in sources:
+                    name = source.relative_to(ROOT).with_suffix(".pyc").as_posix()
+                    compiled = Path(staging) / name
+                    compiled.parent.mkdir(parents=True, exist_ok=True)
+                    # Hash-based pyc files carry no timestamp; zipimport never rechecks them
+                    py_compile.compile(str(source), cfile=str(compiled), dfile=name[:-1], doraise=True,
+                                       optimize=2,
+                                       invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+                    archive.writestr(_zip_entry(name, epoch), compiled.read_bytes())
+        os.chmod(staged, 0o755)
+        os.replace(staged, output)
+    print(f"✓ {output} ({output.stat().st_size / 1024:.0f} KiB, Python {sys.version_info[0]}.{sys.version_info[1]})")
+    return 0
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("target", nargs="?", choices=["onedir", "onefile", "zipapp"], default="onedir")
+    args = p.parse_args(argv)
+
+    epoch = source_date_epoch()
+    if args.target == "zipapp":
+        return build_zipapp(epoch)
+    return build_pyinstaller(args.target == "onefile", epoch)
+
+
+if __name__ == "__main__":
+    sys.exit(main())